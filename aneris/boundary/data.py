@@ -15,20 +15,30 @@ import abc
 import sys
 import glob
 import pickle
+import shutil
+import hashlib
+import tempfile
+import threading
 import datetime as dt
 from types import NoneType
 from numbers import Number
 
+import numpy as np
 import pandas as pd
 import pandas.core.indexes 
 
 from polite.paths import object_dir, UserDataDirectory
 
 from ..utilities.files import yaml_to_py
+from ..utilities.compression import get_extension, open_compressed
 
 # Compatibility for old pandas versions
 sys.modules['pandas.indexes'] = pandas.core.indexes
 
+# Saved files which could not be removed, as they were memory mapped
+_stale_paths = set()
+_stale_lock = threading.Lock()
+
 
 class DataDefinition(object):
 
@@ -62,15 +72,21 @@ class DataDefinition(object):
 
     def get_metadef_lists(self):
 
-        for abs_yaml_path in self._get_yaml_local_paths():
+        for abs_yaml_path in self.get_yaml_paths():
 
             yield yaml_to_py(abs_yaml_path)
 
-        for abs_yaml_path in self._get_yaml_user_paths():
+        return
 
-            yield yaml_to_py(abs_yaml_path)
+    def get_yaml_paths(self):
 
-        return
+        '''Get the paths of the yaml files read by get_metadef_lists, in
+        the order they are read'''
+
+        yaml_paths = self._get_yaml_local_paths() + \
+                                                self._get_yaml_user_paths()
+
+        return yaml_paths
 
     def _get_yaml_paths(self, yaml_dir):
 
@@ -114,10 +130,26 @@ class Structure(object):
     
     '''Boundary class to define creation and and access to Data objects. Also 
     contains methods used for automatic interfaces associated to the Structure
-    class'''
+    class.
+    
+    If memory_map is True, numeric numpy arrays and pandas objects holding a
+    single numeric dtype are saved in .npy format, and are loaded memory
+    mapped and read-only. The files must then exist for as long as the data
+    is in use.
+    
+    If codec is set to one of the codecs of aneris.utilities.compression,
+    pickled values are streamed through it when saved to file.
+    
+    Data with different digests is considered unequal without calling the
+    equals method. If confirm_digest is True, data with matching digests is
+    also compared using equals.'''
     
     __metaclass__ = abc.ABCMeta
     
+    memory_map = False
+    codec = None
+    confirm_digest = False
+    
     @abc.abstractmethod
     def get_data(self, raw, meta_data):
         
@@ -130,13 +162,38 @@ class Structure(object):
         
         return
     
-    def save_value(self, data, root_path):
+    def save_value(self, data, root_path, checksum=None):
+        
+        """Save the value of the data to a file with the given root path
+        and return the path of the file. If checksum is given, it is a
+        hashlib object which is updated with the bytes of the file as they
+        are written, or with the relative paths and bytes of the files it
+        contains, in sorted order, if a directory is saved."""
         
-        file_path = "{}.pkl".format(root_path)
         data_value = self.get_value(data)
         
+        if self.memory_map:
+            
+            file_path = _save_array(data_value, root_path, checksum)
+            if file_path is not None: return file_path
+        
+        file_path = "{}.pkl".format(root_path)
+        
+        if self.codec is not None:
+            file_path += get_extension(self.codec)
+        
         with open(file_path, "wb") as fstream:
-            pickle.dump(data_value, fstream, -1)
+            
+            out_stream = _hashed(fstream, checksum)
+            
+            if self.codec is None:
+                pickle.dump(data_value, out_stream, -1)
+            else:
+                with open_compressed(file_path,
+                                     "wb",
+                                     self.codec,
+                                     out_stream) as zstream:
+                    pickle.dump(data_value, zstream, -1)
         
         return file_path
     
@@ -146,22 +203,81 @@ class Structure(object):
         # call it for loading from other file types. In some cases unpickling
         # is unique, such as opening old versions of pandas dataframes.
         
+        if file_path.endswith(".npy"):
+            return np.load(file_path, mmap_mode="r")
+        
+        if file_path.endswith(".npyd"):
+            return _load_pandas_array(file_path)
+        
         try:
                 
-            with open(file_path, "rb") as fstream:
+            with open_compressed(file_path, "rb") as fstream:
                 data = pickle.load(fstream)
         
         except ImportError:
             
+            # The compression type is inferred from the file extension
             data = pd.read_pickle(file_path)
         
         return data
     
+    def dump_value(self, data):
+        
+        """Returns the value of the data serialised as a string, for storage
+        in pack files. Structures which override save_value should also
+        override this method and load_value. Values are always pickled, as
+        pack files can not be memory mapped by numpy."""
+        
+        data_value = self.get_value(data)
+        payload = pickle.dumps(data_value, -1)
+        
+        return payload
+    
+    def load_value(self, payload):
+        
+        """Returns data from a string created by dump_value"""
+        
+        try:
+            
+            data = pickle.loads(payload)
+        
+        except ImportError:
+            
+            # pd.read_pickle requires a file
+            fd, temp_path = tempfile.mkstemp(suffix=".pkl")
+            
+            try:
+                with os.fdopen(fd, "wb") as fstream:
+                    fstream.write(payload)
+                data = pd.read_pickle(temp_path)
+            finally:
+                os.remove(temp_path)
+        
+        return data
+    
     @classmethod
     def equals(cls, left, right): 
         
         return left == right
     
+    def get_digest(self, data):
+        
+        """Returns a hex digest of the given data which is used to identify
+        identical content in DataPool objects. Structures which store data
+        that does not pickle consistently should override this method.
+        
+        The data is pickled into the hash, rather than to a string, and the
+        buffers of numpy arrays without objects are hashed directly."""
+        
+        checksum = hashlib.sha1()
+        
+        if _is_buffer_array(data):
+            _update_array_checksum(checksum, data)
+        else:
+            pickle.Pickler(_HashingWriter(checksum), -1).dump(data)
+        
+        return checksum.hexdigest()
+    
     def __call__(self, data):
         
         value = self.get_value(data)
@@ -199,3 +315,250 @@ class SerialBox(object):
         
         return
 
+
+class _HashingWriter(object):
+    
+    """Write only file object which updates a hashlib object with the bytes
+    written through it, before passing them on to fstream, if given."""
+    
+    def __init__(self, checksum, fstream=None):
+        
+        self._checksum = checksum
+        self._fstream = fstream
+        
+        return
+    
+    def write(self, data):
+        
+        self._checksum.update(data)
+        if self._fstream is not None: self._fstream.write(data)
+        
+        return
+    
+    def flush(self):
+        
+        if self._fstream is not None: self._fstream.flush()
+        
+        return
+
+
+def _hashed(fstream, checksum=None):
+    
+    if checksum is None: return fstream
+    
+    return _HashingWriter(checksum, fstream)
+
+
+def _is_buffer_array(value):
+    
+    return (type(value) in (np.ndarray, np.memmap) and
+            not value.dtype.hasobject)
+
+
+def _update_array_checksum(checksum, value):
+    
+    """Update a hashlib object with the dtype, shape and buffer of an
+    array, in C order."""
+    
+    header = "numpy.ndarray:{}:{}:".format(value.dtype.descr, value.shape)
+    
+    checksum.update(header)
+    checksum.update(np.ascontiguousarray(value).data)
+    
+    return
+
+
+def _is_numeric_dtype(dtype):
+    
+    return dtype.kind in "biufc"
+
+
+def _save_array(value, root_path, checksum=None):
+    
+    """Save a numeric array to a .npy file, or a pandas Series or DataFrame
+    with a single numeric dtype to a directory holding its values in a .npy
+    file and its index and labels in a header. Returns the path saved to or
+    None if the value is not supported.
+    
+    Values are never written over existing files, as these may be memory
+    mapped by loaded values. If a file was saved before with the same root
+    path, the value is saved to a new file with a unique name, and the old
+    files are removed, unless they can not be removed while mapped, in which
+    case their removal is retried by later saves. If checksum is given, it
+    is updated as described in Structure.save_value."""
+    
+    save_dir = os.path.dirname(os.path.abspath(root_path))
+    save_prefix = "{}.".format(os.path.basename(root_path))
+    
+    _remove_stale_paths()
+    
+    if isinstance(value, np.ndarray) and not isinstance(value, np.matrix):
+        
+        if not _is_numeric_dtype(value.dtype): return None
+        
+        file_path = "{}.npy".format(root_path)
+        old_paths = _get_saved_paths(root_path, ".npy")
+        fd, temp_path = tempfile.mkstemp(prefix=save_prefix,
+                                         suffix=".npy",
+                                         dir=save_dir)
+        
+        try:
+            with os.fdopen(fd, "wb") as fstream:
+                np.lib.format.write_array(_hashed(fstream, checksum),
+                                          value,
+                                          allow_pickle=False)
+        except:
+            os.remove(temp_path)
+            raise
+        
+        return _commit_path(temp_path, file_path, old_paths)
+    
+    if type(value) is pd.Series:
+        
+        if not _is_numeric_dtype(value.dtype): return None
+        
+        header = {"type": "series",
+                  "index": value.index,
+                  "name": value.name}
+    
+    elif type(value) is pd.DataFrame:
+        
+        dtypes = set(value.dtypes)
+        
+        if len(dtypes) != 1 or not _is_numeric_dtype(dtypes.pop()):
+            return None
+        
+        header = {"type": "frame",
+                  "index": value.index,
+                  "columns": value.columns}
+    
+    else:
+        
+        return None
+    
+    dir_path = "{}.npyd".format(root_path)
+    old_paths = _get_saved_paths(root_path, ".npyd")
+    temp_path = tempfile.mkdtemp(prefix=save_prefix,
+                                 suffix=".npyd",
+                                 dir=save_dir)
+    
+    try:
+        
+        # Files are written in sorted order, to match directory checksums
+        if checksum is not None: checksum.update("header.pkl")
+        
+        with open(os.path.join(temp_path, "header.pkl"), "wb") as fstream:
+            pickle.dump(header, _hashed(fstream, checksum), -1)
+        
+        if checksum is not None: checksum.update("values.npy")
+        
+        with open(os.path.join(temp_path, "values.npy"), "wb") as fstream:
+            np.lib.format.write_array(_hashed(fstream, checksum),
+                                      value.values,
+                                      allow_pickle=False)
+    
+    except:
+        
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    
+    return _commit_path(temp_path, dir_path, old_paths)
+
+
+def _get_saved_paths(root_path, extension):
+    
+    """Return the paths of the files or directories previously saved by
+    _save_array with the given root path and extension, including those
+    with unique names."""
+    
+    save_dir = os.path.dirname(os.path.abspath(root_path))
+    save_prefix = "{}.".format(os.path.basename(root_path))
+    
+    saved_paths = [os.path.join(os.path.dirname(root_path), file_name)
+                        for file_name in sorted(os.listdir(save_dir))
+                            if file_name.startswith(save_prefix) and
+                               file_name.endswith(extension)]
+    
+    return saved_paths
+
+
+def _commit_path(temp_path, file_path, old_paths):
+    
+    """Move a newly saved file or directory to file_path, if nothing is
+    saved there, or otherwise keep its unique name. Returns the path of the
+    saved value, after removing the old paths."""
+    
+    if not os.path.exists(file_path):
+        os.rename(temp_path, file_path)
+        save_path = file_path
+    else:
+        save_path = os.path.join(os.path.dirname(file_path),
+                                 os.path.basename(temp_path))
+    
+    for old_path in old_paths:
+        if old_path != save_path: _remove_stale_path(old_path)
+    
+    return save_path
+
+
+def _remove_stale_path(path):
+    
+    """Remove a file or directory which is no longer referred to. If it can
+    not be removed, for instance as it is memory mapped on Windows, it is
+    removed by a later call to _remove_stale_paths."""
+    
+    path = os.path.abspath(path)
+    
+    with _stale_lock:
+        
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        except (IOError, OSError):
+            _stale_paths.add(path)
+        else:
+            _stale_paths.discard(path)
+    
+    return
+
+
+def _remove_stale_paths():
+    
+    """Retry removing the files and directories that could not be removed
+    by _remove_stale_path."""
+    
+    with _stale_lock:
+        stale_paths = list(_stale_paths)
+    
+    for path in stale_paths: _remove_stale_path(path)
+    
+    return
+
+
+def _load_pandas_array(dir_path):
+    
+    """Load a pandas object saved by _save_array, with its values memory
+    mapped."""
+    
+    with open(os.path.join(dir_path, "header.pkl"), "rb") as fstream:
+        header = pickle.load(fstream)
+    
+    values = np.load(os.path.join(dir_path, "values.npy"), mmap_mode="r")
+    
+    if header["type"] == "series":
+        
+        data = pd.Series(values,
+                         index=header["index"],
+                         name=header["name"],
+                         copy=False)
+    
+    else:
+        
+        data = pd.DataFrame(values,
+                            index=header["index"],
+                            columns=header["columns"],
+                            copy=False)
+    
+    return data
@@ -9,15 +9,36 @@ import logging
 module_logger = logging.getLogger(__name__)
 
 import os
+import shutil
+import time
+import hashlib
+import Queue
+import cPickle
+import weakref
+import threading
 import traceback
+import multiprocessing
 from copy import deepcopy
+from itertools import imap, izip
+from collections import deque, namedtuple
+from contextlib import contextmanager, closing
+from multiprocessing.pool import ThreadPool
 
 from ..entity.data import Data, DataPool, DataState, MetaData
-from ..boundary.data import SerialBox
+from ..boundary.data import DataDefinition, SerialBox, Structure
+from ..utilities.files import yaml_to_py
+from ..utilities.pack import (PackWriter,
+                               PackReader,
+                               PackReaderCache,
+                               read_payload)
 from ..utilities.plugins import (Plugin,
                                  create_object_list)
 
 
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+CATALOG_CACHE_VERSION = 1
+
+
 class DataValidation(Plugin):
 
     '''Class to validate data'''
@@ -30,39 +51,146 @@ class DataValidation(Plugin):
 
     def update_data_catalog_from_definitions(self, data_catalog,
                                                    package,
-                                                   super_cls='DataDefinition'):
+                                                   super_cls='DataDefinition',
+                                                   cache_path=None,
+                                                   workers=None):
 
         '''Create a data catalog searching for DataDefinition classes in the
-        given package directory'''
+        given package directory.
+
+        If cache_path is given, the validated metadata is stored there and
+        reused on later calls, for as long as the paths, modification times
+        and sizes of the yaml files read are unchanged. The cache is rebuilt
+        automatically if any of them differ. Definitions that override
+        get_metadef_lists are always read directly and disable the cache.
+
+        If workers is greater than one the yaml files are parsed concurrently
+        using a pool of processes. The catalog is updated in the same order
+        as when parsing serially, so that later definitions still replace
+        earlier definitions of the same variable.'''
 
         # Discover the available classes and load the instances
         cls_map = self._discover_plugins(package, super_cls)
         def_list = create_object_list(cls_map)
 
-        for definition in def_list:
+        cache_key = None
+
+        if cache_path is not None:
+            cache_key = self._get_catalog_cache_key(def_list)
+
+        if cache_key is not None:
+
+            all_objs = _load_catalog_cache(cache_path, cache_key)
 
-            for metadef_list in definition.get_metadef_lists():
+            if all_objs is not None:
+
+                data_catalog.variable_map_from_objects(all_objs)
+
+                return
+
+        all_objs = []
+
+        for metadef_list in self._iter_metadef_lists(def_list, workers):
                 
-                if metadef_list is None: continue
+            if metadef_list is None: continue
+
+            obj_list = self.obj_list_from_metadef_list(metadef_list)
+
+            data_catalog.variable_map_from_objects(obj_list)
+            all_objs.extend(obj_list)
+
+        if cache_key is not None:
+            _save_catalog_cache(cache_path, cache_key, all_objs)
+
+        return
+
+    def _iter_metadef_lists(self, def_list, workers=None):
+
+        '''Yield the metadata definition lists of the given definitions, in
+        order. If workers is greater than one, the yaml files of definitions
+        which do not override get_metadef_lists are parsed ahead of time by a
+        pool of processes.'''
+
+        if workers is None or workers < 2:
+
+            for definition in def_list:
+                for metadef_list in definition.get_metadef_lists():
+                    yield metadef_list
+
+            return
+
+        def_paths = []
+        yaml_paths = []
+
+        for definition in def_list:
+
+            if _is_yaml_definition(definition):
+                paths = definition.get_yaml_paths()
+                yaml_paths.extend(paths)
+            else:
+                paths = None
+
+            def_paths.append(paths)
+
+        with _task_results(yaml_to_py,
+                           yaml_paths,
+                           workers,
+                           use_processes=True) as parsed_lists:
+
+            for definition, paths in izip(def_list, def_paths):
+
+                if paths is None:
 
-                obj_list = self.obj_list_from_metadef_list(metadef_list)
+                    for metadef_list in definition.get_metadef_lists():
+                        yield metadef_list
 
-                data_catalog.variable_map_from_objects(obj_list)
+                    continue
+
+                for _ in paths:
+                    yield next(parsed_lists)
 
         return
 
+    def _get_catalog_cache_key(self, def_list):
+
+        '''Return a key identifying the yaml files read by the given
+        definitions and the class used to validate them, or None if the
+        definitions can not be cached.'''
+
+        sources = []
+
+        for definition in def_list:
+
+            if not _is_yaml_definition(definition):
+
+                logMsg = ("Definition {} does not read yaml files directly. "
+                          "The data catalog will not be "
+                          "cached").format(type(definition).__name__)
+                module_logger.debug(logMsg)
+
+                return None
+
+            for yaml_path in definition.get_yaml_paths():
+
+                abs_path = os.path.abspath(yaml_path)
+                sources.append((abs_path,) + _get_path_stamp(abs_path))
+
+        meta_cls_name = "{}.{}".format(self._meta_cls.__module__,
+                                       self._meta_cls.__name__)
+        cache_key = (CATALOG_CACHE_VERSION, meta_cls_name, sources)
+
+        return cache_key
+
     def get_valid_variables(self, data_catalog, variables):
 
         '''Return all valid variables in the given data catalog from variables
         list.
         '''
 
-        compare_vars = set(variables)
-        catalog_vars = set(data_catalog.get_variable_identifiers())
+        valid_vars = [var_id for var_id in set(variables)
+                                        if data_catalog.has_variable(var_id)]
 
-        valid_vars = compare_vars & catalog_vars
-
-        return list(valid_vars)
+        return valid_vars
 
     def obj_list_from_metadef_list(self, metadef_list):
 
@@ -109,8 +237,24 @@ class DataStorage(Plugin):
 
         self._structures = self._init_structures(definition_module,
                                                  super_cls)
+        self._lazy_pools = weakref.WeakKeyDictionary()
 
         return
+    
+    def __getstate__(self):
+        
+        # Lazy pools are not copied or pickled with the storage
+        state = dict(self.__dict__)
+        state.pop("_lazy_pools", None)
+        
+        return state
+    
+    def __setstate__(self, state):
+        
+        self.__dict__.update(state)
+        self._lazy_pools = weakref.WeakKeyDictionary()
+        
+        return
         
     def _init_structures(self,  definition_module, super_cls="Structure"):
         
@@ -184,35 +328,24 @@ class DataStorage(Plugin):
             dst_contains_data = False
             dst_structure_name = None
             
-            src_data = src_pool.get(data_index)
+            src_data = self._get_pool_data(src_pool, data_index)
             src_structure_name = src_data.get_structure_name()
             
             # Check for matching indexes and data
             if data_index in dst_pool:
                 
-                dst_data = dst_pool.get(data_index)
+                dst_data = self._get_pool_data(dst_pool, data_index)
                 dst_structure_name = dst_data.get_structure_name()
             
             if (dst_structure_name is not None and
                 dst_structure_name == src_structure_name):
-            
-                dst_structure = self.get_structure(dst_structure_name)
-                
-                src_value = self._get_value(src_data)
-                dst_value = self._get_value(dst_data)
                 
-                try:
-                    if dst_structure.equals(src_value, dst_value):
-                        dst_contains_data = True
-                except Exception:
-                    msgStr = ("Comparison of data with identifier {} failed "
-                              "with an unexpected error:"
-                              "\n{}").format(data_identifier,
-                                             traceback.format_exc())
-                    raise Exception(msgStr)
+                dst_contains_data = self._is_equal_data(src_data,
+                                                        dst_data,
+                                                        data_identifier)
             
             if not dst_contains_data:
-                data_index = dst_pool.add(src_data)
+                data_index = self._add_to_pool(dst_pool, src_data)
             
             dst_pool.link(data_index)
             new_datastate.add_index(data_identifier, data_index)
@@ -239,7 +372,7 @@ class DataStorage(Plugin):
         
         else:
             
-            data_index = pool.add(data_obj)
+            data_index = self._add_to_pool(pool, data_obj)
             pool.link(data_index)
             
             log_msg = ('New "{}" data stored with index '
@@ -397,7 +530,16 @@ class DataStorage(Plugin):
                                           data_index)
         module_logger.debug(log_msg)
         
-        data_obj = data_pool.get(data_index)
+        value = self.get_index_value(data_pool, data_index)
+        
+        return value
+        
+    def get_index_value(self, data_pool, data_index):
+        
+        '''Return the value of the data stored in the pool with the given
+        index'''
+        
+        data_obj = self._get_pool_data(data_pool, data_index)
         value = self._get_value(data_obj)
         
         return value
@@ -411,7 +553,7 @@ class DataStorage(Plugin):
             raise ValueError(errStr)
         
         data_index = datastate.get_index(data_identifier)
-        data_obj = data_pool.get(data_index)
+        data_obj = self._get_pool_data(data_pool, data_index)
         meta_data = data_obj.get_meta_data()
         
         return meta_data
@@ -420,14 +562,161 @@ class DataStorage(Plugin):
                              data_indexes,
                              data_dir="data",
                              root_dir=None,
-                             warn_save=True):
-
+                             warn_save=True,
+                             workers=None,
+                             use_processes=False,
+                             pack_name=None,
+                             incremental=False,
+                             progress_callback=None,
+                             queue_size=None):
+        
+        '''Convert the data with the given indexes to SerialBox objects,
+        saving their values in data_dir. If pack_name is given, the values
+        are appended to a single pack file of that name in data_dir, rather
+        than saved to a file per index. Values of structures which save to
+        or load from their own file formats, or are memory mapped or
+        compressed, are still saved to a file per index.
+        
+        Unless incremental is True, the pack file is replaced. Values in the
+        old pack file which are still referred to by SerialBox objects in
+        the pool, but are not saved again, are copied into the new pack
+        file, and unsaved data that was loaded from the old pack file is
+        marked as changed.
+        
+        If workers is greater than one the values are prepared concurrently
+        using a pool of threads, or processes if use_processes is True. The
+        pool is updated in the order of data_indexes in either case.
+        
+        If incremental is True, only data added or replaced since it was last
+        serialised to data_dir is saved again, and the files of data popped
+        from the pool since the last save are removed from data_dir. Values
+        stored in pack files are not removed, and neither are the files of
+        data popped before a save which was not incremental.
+        
+        If queue_size is given, values are serialised into buffers which are
+        written to disk by a separate thread, so that serialisation and
+        writing overlap. At most queue_size buffers, counting those being
+        serialised, waiting to be written and being written, are held in
+        memory at once, and queue_size must be at least one. Structures
+        which save to their own file formats still write their files as they
+        are serialised.
+        
+        If progress_callback is given, it is called with a SaveProgress
+        object after each value is saved.'''
+        
+        if queue_size is not None and queue_size < 1:
+            
+            errStr = ("Argument queue_size must be at least one, but "
+                      "{} was given").format(queue_size)
+            raise ValueError(errStr)
+        
+        data_indexes = list(data_indexes)
+        target_dir = os.path.abspath(data_dir)
+        reuse_records = {}
+        
+        if data_pool in self._lazy_pools:
+            reuse_records = self._release_lazy_pool(data_pool,
+                                                    data_indexes,
+                                                    target_dir,
+                                                    incremental)
+        
+        if not incremental:
+            
+            # Records of popped data only apply to the next incremental save
+            data_pool.pop_removed_records()
+        
+        else:
+            
+            self._remove_popped_files(data_pool, target_dir)
+            
+            for data_index in data_indexes:
+                
+                serial_record = data_pool.get_serial_record(data_index)
+                if serial_record is None: continue
+                
+                _, file_path = serial_record
+                
+                if os.path.dirname(file_path) == target_dir:
+                    reuse_records[data_index] = serial_record
+        
+        save_indexes = []
+        save_tasks = []
+        
         for data_index in data_indexes:
-            self._convert_data_to_box(data_pool,
-                                      data_index,
-                                      data_dir,
-                                      root_dir,
-                                      warn_save)
+            
+            if data_index in reuse_records:
+                self._restore_box(data_pool,
+                                  data_index,
+                                  reuse_records[data_index],
+                                  root_dir)
+                continue
+            
+            save_task = self._get_save_task(data_pool, data_index, data_dir)
+            if save_task is None: continue
+            
+            save_indexes.append(data_index)
+            save_tasks.append(save_task)
+        
+        progress = _ProgressReporter(progress_callback, len(save_indexes))
+        
+        if pack_name is None:
+            
+            pack_writer = None
+        
+        else:
+            
+            pack_writer = PackWriter(os.path.join(data_dir, pack_name),
+                                     truncate=not incremental)
+            
+            if not incremental:
+                
+                try:
+                    self._copy_pack_values(data_pool,
+                                           save_indexes,
+                                           pack_writer,
+                                           root_dir)
+                except:
+                    pack_writer.discard()
+                    raise
+        
+        if queue_size is None:
+            save_results = _iter_save_results(save_indexes,
+                                              save_tasks,
+                                              workers,
+                                              use_processes,
+                                              pack_writer)
+        else:
+            save_results = _iter_pipeline_results(save_indexes,
+                                                  save_tasks,
+                                                  workers,
+                                                  use_processes,
+                                                  pack_writer,
+                                                  queue_size)
+        
+        try:
+            
+            with closing(save_results):
+                
+                for data_index, save_result in save_results:
+                    
+                    (file_path,
+                     error,
+                     pack_range,
+                     nbytes,
+                     checksum) = save_result
+                    
+                    self._store_box(data_pool,
+                                    data_index,
+                                    (file_path, error),
+                                    root_dir,
+                                    warn_save,
+                                    pack_range,
+                                    checksum)
+                    progress.update(nbytes)
+        
+        finally:
+            
+            if pack_writer is not None: pack_writer.close()
 
         return
         
@@ -436,28 +725,69 @@ class DataStorage(Plugin):
                                data_indexes,
                                root_dir=None,
                                warn_missing=False,
-                               warn_unpickle=False):
-
+                               warn_unpickle=False,
+                               workers=None,
+                               use_processes=False):
+        
+        '''Convert the SerialBox objects with the given indexes back to
+        Data objects, loading their values from files or pack files. If
+        workers is greater than one the values are loaded concurrently using
+        a pool of threads, or processes if use_processes is True. The pool is
+        updated in the order of data_indexes in either case.'''
+        
+        load_indexes = []
+        load_tasks = []
+        pack_readers = PackReaderCache()
+        
         for data_index in data_indexes:
-            self._convert_box_to_data(data_catalog,
-                                      data_pool,
-                                      data_index,
-                                      root_dir,
-                                      warn_missing=warn_missing,
-                                      warn_unpickle=warn_unpickle)
+            
+            load_task = self._get_load_task(data_pool,
+                                            data_index,
+                                            root_dir,
+                                            pack_readers)
+            if load_task is None: continue
+            
+            load_indexes.append(data_index)
+            load_tasks.append(load_task)
+        
+        with pack_readers, _task_results(_load_value,
+                                         load_tasks,
+                                         workers,
+                                         use_processes) as load_results:
+        
+            for data_index, load_result in izip(load_indexes, load_results):
+                self._store_data(data_catalog,
+                                 data_pool,
+                                 data_index,
+                                 load_result,
+                                 root_dir,
+                                 warn_missing=warn_missing,
+                                 warn_unpickle=warn_unpickle)
 
         return
         
     def serialise_pool(self, data_pool,
                              data_dir="data",
                              root_dir=None,
-                             warn_save=True):
+                             warn_save=True,
+                             workers=None,
+                             use_processes=False,
+                             pack_name=None,
+                             incremental=False,
+                             progress_callback=None,
+                             queue_size=None):
                                                                   
         self.serialise_data(data_pool,
                             data_pool,
                             data_dir,
                             root_dir,
-                            warn_save)
+                            warn_save,
+                            workers,
+                            use_processes,
+                            pack_name,
+                            incremental,
+                            progress_callback,
+                            queue_size)
 
         return
         
@@ -465,20 +795,150 @@ class DataStorage(Plugin):
                                data_pool,
                                root_dir=None,
                                warn_missing=False,
-                               warn_unpickle=False):
+                               warn_unpickle=False,
+                               workers=None,
+                               use_processes=False,
+                               lazy=False):
+        
+        '''Convert all the SerialBox objects in the pool back to Data
+        objects. If lazy is True, the SerialBox objects are kept in the pool
+        and each value is loaded when first accessed through this
+        DataStorage object. All the values of a lazy pool are loaded before
+        it is deep copied.'''
+        
+        if lazy:
+            
+            if data_pool in self._lazy_pools:
+                _stop_prefetch(self._lazy_pools[data_pool])
+            
+            self._lazy_pools[data_pool] = {"data_catalog": data_catalog,
+                                           "root_dir": root_dir,
+                                           "warn_missing": warn_missing,
+                                           "warn_unpickle": warn_unpickle,
+                                           "lock": threading.RLock(),
+                                           "stop": threading.Event(),
+                                           "threads": []}
+            data_pool.set_copy_callback(_LazyHydrator(self))
+            
+            return
                                                                   
         self.deserialise_data(data_catalog,
                               data_pool,
                               data_pool,
                               root_dir,
                               warn_missing=warn_missing,
-                              warn_unpickle=warn_unpickle)
+                              warn_unpickle=warn_unpickle,
+                              workers=workers,
+                              use_processes=use_processes)
 
         return
     
+    def verify_data(self, data_pool,
+                          data_indexes,
+                          root_dir=None,
+                          workers=None,
+                          use_processes=False):
+        
+        '''Check the saved values of the SerialBox objects with the given
+        indexes against the checksums recorded when they were saved, without
+        loading them. Values saved without a checksum are only checked for
+        existence. If workers is greater than one the values are checked
+        concurrently using a pool of threads, or processes if use_processes
+        is True.
+        
+        Returns lists of the missing indexes and the corrupt indexes, in the
+        order of data_indexes.'''
+        
+        if root_dir is None and data_pool in self._lazy_pools:
+            root_dir = self._lazy_pools[data_pool]["root_dir"]
+        
+        verify_indexes = []
+        verify_tasks = []
+        
+        for data_index in data_indexes:
+            
+            data_box = data_pool.get(data_index)
+            if not isinstance(data_box, SerialBox): continue
+            
+            load_path, pack_range = _get_load_location(data_box, root_dir)
+            checksum = data_box.load_dict.get("checksum")
+            
+            verify_indexes.append(data_index)
+            verify_tasks.append((load_path, pack_range, checksum))
+        
+        missing_indexes = []
+        corrupt_indexes = []
+        
+        with _task_results(_verify_value,
+                           verify_tasks,
+                           workers,
+                           use_processes) as verify_results:
+            
+            for data_index, status in izip(verify_indexes, verify_results):
+                
+                if status == "missing":
+                    missing_indexes.append(data_index)
+                elif status == "corrupt":
+                    corrupt_indexes.append(data_index)
+        
+        return missing_indexes, corrupt_indexes
+    
+    def verify_pool(self, data_pool,
+                          root_dir=None,
+                          workers=None,
+                          use_processes=False):
+        
+        return self.verify_data(data_pool,
+                                data_pool,
+                                root_dir,
+                                workers,
+                                use_processes)
+    
+    def is_lazy(self, data_pool):
+        
+        '''Return True if the pool was lazily deserialised by this
+        DataStorage object.'''
+        
+        return data_pool in self._lazy_pools
+    
+    def hydrate_data(self, data_pool, data_indexes=None):
+        
+        '''Load the values of the given indexes of a lazily deserialised
+        pool, or all its values if data_indexes is None.'''
+        
+        if data_pool not in self._lazy_pools: return
+        if data_indexes is None: data_indexes = list(data_pool)
+        
+        for data_index in data_indexes:
+            self._hydrate_index(data_pool, data_index)
+        
+        return
+    
+    def prefetch_data(self, data_pool, data_indexes):
+        
+        '''Load the values of the given indexes of a lazily deserialised
+        pool in a background thread. Returns the thread, or None if the pool
+        is not lazy. The thread is stopped when the pool is serialised.'''
+        
+        if data_pool not in self._lazy_pools: return None
+        
+        lazy_context = self._lazy_pools[data_pool]
+        thread = threading.Thread(target=self._prefetch_data,
+                                  args=(data_pool,
+                                        list(data_indexes),
+                                        lazy_context))
+        thread.daemon = True
+        
+        lazy_context["threads"] = [x for x in lazy_context["threads"]
+                                                            if x.is_alive()]
+        lazy_context["threads"].append(thread)
+        thread.start()
+        
+        return thread
+    
     def create_pool_subset(self, data_pool, datastate):
         
-        new_pool = DataPool()
+        new_pool = DataPool(data_pool.is_content_addressed())
         new_datastate = DataState()
         
         var_ids = datastate.get_identifiers()
@@ -486,7 +946,7 @@ class DataStorage(Plugin):
         for var_id in var_ids:
             
             data_index = datastate.get_index(var_id)
-            data_obj = data_pool.get(data_index)
+            data_obj = self._get_pool_data(data_pool, data_index)
             new_data_obj = deepcopy(data_obj)
             
             self.add_data_to_state(new_pool,
@@ -502,12 +962,41 @@ class DataStorage(Plugin):
         '''Return true if variable in the given data catalog.
         '''
 
-        result = False
-        catalog_vars = data_catalog.get_variable_identifiers()
-
-        if variable_id in catalog_vars: result = True
+        result = data_catalog.has_variable(variable_id)
 
         return result
+
+    @classmethod
+    def get_invalid_variables(cls, data_catalog, variable_ids):
+
+        '''Return the variables which are not in the given data catalog, in
+        the order given and without duplicates.
+        '''
+
+        invalid_ids = data_catalog.get_missing_variables(variable_ids)
+
+        return invalid_ids
+
+    @classmethod
+    def check_valid_variables(cls, data_catalog, variable_ids):
+
+        '''Raise ValueError, listing all of the variables which are not in
+        the given data catalog, if any are found.
+        '''
+
+        invalid_ids = cls.get_invalid_variables(data_catalog, variable_ids)
+
+        if not invalid_ids: return
+
+        if len(invalid_ids) == 1:
+            errStr = ('Variable ID "{}" is not contained in the data '
+                      'catalog.').format(invalid_ids[0])
+        else:
+            id_str = ", ".join('"{}"'.format(x) for x in invalid_ids)
+            errStr = ('Variable IDs {} are not contained in the data '
+                      'catalog.').format(id_str)
+
+        raise ValueError(errStr)
     
     def _copy_datastate_meta(self, datastate,
                                    level=None):
@@ -519,6 +1008,186 @@ class DataStorage(Plugin):
         
         return new_datastate
     
+    def _get_pool_data(self, data_pool, data_index):
+        
+        data_obj = data_pool.get(data_index)
+        
+        if (isinstance(data_obj, SerialBox) and
+            data_pool in self._lazy_pools):
+            
+            self._hydrate_index(data_pool, data_index)
+            data_obj = data_pool.get(data_index)
+        
+        return data_obj
+    
+    def _hydrate_index(self, data_pool, data_index):
+        
+        lazy_context = self._lazy_pools.get(data_pool)
+        if lazy_context is None: return
+        
+        with lazy_context["lock"]:
+            
+            # The pool may have been released while waiting for the lock,
+            # after which its boxes must not be loaded
+            if self._lazy_pools.get(data_pool) is not lazy_context: return
+            
+            self._convert_box_to_data(
+                                lazy_context["data_catalog"],
+                                data_pool,
+                                data_index,
+                                lazy_context["root_dir"],
+                                warn_missing=lazy_context["warn_missing"],
+                                warn_unpickle=lazy_context["warn_unpickle"])
+        
+        return
+    
+    def _release_lazy_pool(self, data_pool,
+                                 data_indexes,
+                                 target_dir,
+                                 incremental=False):
+        
+        '''Stop lazily deserialising the pool before it is serialised.
+        Boxes of lazy pools refer to the files they were loaded from, so
+        their values are loaded, unless incremental is True and the files
+        are already in target_dir. The SerialBox objects and file paths of
+        the latter are returned, keyed by index.
+        
+        Prefetching threads are stopped first, and the pool is released
+        while holding its lock, so that no value is loaded into the pool
+        once it starts to be serialised.'''
+        
+        lazy_context = self._lazy_pools[data_pool]
+        reuse_indexes = set(data_indexes) if incremental else set()
+        reuse_records = {}
+        
+        _stop_prefetch(lazy_context)
+        
+        with lazy_context["lock"]:
+            
+            for data_index in list(data_pool):
+                
+                data_box = data_pool.get(data_index)
+                if not isinstance(data_box, SerialBox): continue
+                
+                if data_index in reuse_indexes:
+                    
+                    _, load_path, _, _ = self._get_load_task(
+                                                    data_pool,
+                                                    data_index,
+                                                    lazy_context["root_dir"])
+                    file_path = os.path.abspath(load_path)
+                    
+                    if os.path.dirname(file_path) == target_dir:
+                        reuse_records[data_index] = (data_box, file_path)
+                        continue
+                
+                self._hydrate_index(data_pool, data_index)
+            
+            del self._lazy_pools[data_pool]
+            data_pool.set_copy_callback(None)
+        
+        return reuse_records
+    
+    def _remove_popped_files(self, data_pool, target_dir):
+        
+        removed_records = data_pool.pop_removed_records()
+        
+        for data_box, file_path in removed_records.itervalues():
+            
+            if "offset" in data_box.load_dict: continue
+            if os.path.dirname(file_path) != target_dir: continue
+            
+            if os.path.isdir(file_path):
+                shutil.rmtree(file_path)
+            elif os.path.isfile(file_path):
+                os.remove(file_path)
+        
+        return
+    
+    def _copy_pack_values(self, data_pool,
+                                save_indexes,
+                                pack_writer,
+                                root_dir=None):
+        
+        '''Copy the payloads of the SerialBox objects in the pool which
+        refer to the pack file of pack_writer, other than those of
+        save_indexes, to the writer. The boxes are replaced by boxes which
+        refer to the copies. Unsaved data which was loaded from the pack file
+        is marked as changed, as its payload is not copied.'''
+        
+        pack_path = os.path.abspath(pack_writer.file_path)
+        
+        if not os.path.isfile(pack_path): return
+        
+        save_indexes = set(save_indexes)
+        copy_boxes = {}
+        
+        for data_index in data_pool:
+            
+            if data_index in save_indexes: continue
+            
+            data_box = data_pool.get(data_index)
+            
+            if not isinstance(data_box, SerialBox):
+                
+                serial_record = data_pool.get_serial_record(data_index)
+                
+                if (serial_record is not None and
+                    "offset" in serial_record[0].load_dict and
+                    os.path.abspath(serial_record[1]) == pack_path):
+                    data_pool.replace(data_index, data_box)
+                
+                continue
+            
+            if "offset" not in data_box.load_dict: continue
+            
+            load_path, pack_range = _get_load_location(data_box, root_dir)
+            
+            if os.path.abspath(load_path) != pack_path: continue
+            
+            copy_boxes[data_index] = (data_box, pack_range)
+        
+        if not copy_boxes: return
+        
+        copy_ranges = {}
+        
+        with PackReader(pack_path) as reader:
+            
+            for data_index in sorted(copy_boxes):
+                
+                _, pack_range = copy_boxes[data_index]
+                payload = reader.read(*pack_range)
+                copy_ranges[data_index] = pack_writer.append(data_index,
+                                                             payload)
+        
+        for data_index, (data_box, _) in copy_boxes.iteritems():
+            
+            load_dict = dict(data_box.load_dict)
+            load_dict["offset"], load_dict["length"] = copy_ranges[data_index]
+            
+            data_box = SerialBox(data_box.identifier, load_dict)
+            data_pool.set_serialised(data_index, data_box, pack_path)
+        
+        return
+    
+    def _prefetch_data(self, data_pool, data_indexes, lazy_context):
+        
+        for data_index in data_indexes:
+            
+            if lazy_context["stop"].is_set(): break
+            
+            # Errors are raised again when the value is accessed
+            try:
+                self._hydrate_index(data_pool, data_index)
+            except Exception:
+                msgStr = ("Prefetching of data with index {} failed with an "
+                          "unexpected error:\n{}").format(
+                                                    data_index,
+                                                    traceback.format_exc())
+                module_logger.debug(msgStr)
+        
+        return
+    
     def _get_value(self, data_obj):
         
         data_structure = self.get_structure(data_obj.get_structure_name())
@@ -526,6 +1195,92 @@ class DataStorage(Plugin):
         
         return value
     
+    def _add_to_pool(self, pool, data_obj):
+        
+        '''Add a Data object to the pool, providing a digest of its content
+        if the pool is content addressed.'''
+        
+        digest = None
+        
+        if pool.is_content_addressed():
+            digest = self._get_digest(data_obj)
+        
+        data_index = pool.add(data_obj, digest)
+        
+        return data_index
+    
+    def _is_equal_data(self, src_data, dst_data, data_identifier):
+        
+        '''Compare two Data objects with the same structure. Data with
+        different content digests is unequal, and data with matching digests
+        is equal unless the structure requires confirmation. Otherwise, or if
+        either digest is unavailable, the values are compared using the
+        structure.'''
+        
+        structure = self.get_structure(src_data.get_structure_name())
+        
+        src_digest = self._get_content_digest(src_data)
+        dst_digest = self._get_content_digest(dst_data)
+        
+        if src_digest is not None and dst_digest is not None:
+            if src_digest != dst_digest: return False
+            if not structure.confirm_digest: return True
+        
+        src_value = self._get_value(src_data)
+        dst_value = self._get_value(dst_data)
+        
+        try:
+            result = structure.equals(src_value, dst_value)
+        except Exception:
+            msgStr = ("Comparison of data with identifier {} failed "
+                      "with an unexpected error:"
+                      "\n{}").format(data_identifier,
+                                     traceback.format_exc())
+            raise Exception(msgStr)
+        
+        return bool(result)
+    
+    def _get_content_digest(self, data_obj):
+        
+        '''Return the digest of the content of a Data object, calculating
+        it using its structure and caching it on the object if necessary.
+        Returns None if the data can not be fingerprinted.'''
+        
+        content_digest = data_obj.get_digest()
+        if content_digest is not None: return content_digest
+        
+        data_structure = self.get_structure(data_obj.get_structure_name())
+        
+        try:
+            content_digest = data_structure.get_digest(data_obj._data)
+        except Exception:
+            msgStr = ("Fingerprinting of data with identifier {} failed "
+                      "with an unexpected error:\n{}").format(
+                                                    data_obj.get_id(),
+                                                    traceback.format_exc())
+            module_logger.debug(msgStr)
+            return None
+        
+        data_obj.set_digest(content_digest)
+        
+        return content_digest
+    
+    def _get_digest(self, data_obj):
+        
+        '''Fingerprint a Data object using its structure. The identifier and
+        structure name are included, so that indexes are only shared between
+        equivalent Data objects. Returns None if the data can not be
+        fingerprinted.'''
+        
+        content_digest = self._get_content_digest(data_obj)
+        if content_digest is None: return None
+        
+        digest = "{}:{}:{}".format(data_obj.get_id(),
+                                   data_obj.get_structure_name(),
+                                   content_digest)
+        
+        return digest
+    
     def _get_data_obj(self, metadata, raw):
         
         data_structure = self.get_structure(metadata.structure)
@@ -549,26 +1304,32 @@ class DataStorage(Plugin):
         
         return data_obj
 
-    def _convert_data_to_box(self, data_pool,
-                                   data_index,
-                                   data_dir,
-                                   root_dir=None,
-                                   warn_save=True):
-                                  
+    def _get_save_task(self, data_pool, data_index, data_dir):
+        
         data_obj = data_pool.get(data_index)
         
-        if isinstance(data_obj, SerialBox): return
+        if isinstance(data_obj, SerialBox): return None
         
         structure_name = data_obj.get_structure_name()
         data_structure = self.get_structure(structure_name)
 
         root_path = os.path.join(data_dir, data_index)
         
-        try:
-            file_path = data_structure.save_value(data_obj._data, root_path)
-        except Exception:
+        return data_structure, data_obj._data, root_path
+    
+    def _store_box(self, data_pool,
+                         data_index,
+                         save_result,
+                         root_dir=None,
+                         warn_save=True,
+                         pack_range=None,
+                         checksum=None):
+        
+        file_path, error = save_result
+        
+        if error is not None:
             msgStr = ("Saving of data with index {} failed with an unexpected "
-                      "error:\n{}").format(data_index, traceback.format_exc())
+                      "error:\n{}").format(data_index, error)
             if warn_save:
                 module_logger.warn(msgStr)
                 return
@@ -580,15 +1341,49 @@ class DataStorage(Plugin):
         else:
             remove_root = os.path.join(os.path.normpath(root_dir), "")
             store_path = file_path.replace(remove_root, "")
-                
+        
+        data_obj = data_pool.get(data_index)
         identifier = data_obj.get_id()
         load_dict = {"file_path": store_path,
-                     "structure_name": structure_name}
+                     "structure_name": data_obj.get_structure_name()}
+        
+        # Keep cached digests, as loaded values may not pickle identically
+        if data_obj.get_digest() is not None:
+            load_dict["digest"] = data_obj.get_digest()
+        
+        if pack_range is not None:
+            load_dict["offset"], load_dict["length"] = pack_range
+        
+        if checksum is not None: load_dict["checksum"] = checksum
 
         data_box = SerialBox(identifier, load_dict)
-        data_pool.replace(data_index, data_box)
+        data_pool.set_serialised(data_index,
+                                 data_box,
+                                 os.path.abspath(file_path))
 
         return
+    
+    def _restore_box(self, data_pool, data_index, serial_record, root_dir=None):
+        
+        '''Replace the data at the given index with a copy of the SerialBox
+        it was last serialised to, without saving it again. The stored file
+        path is made relative to root_dir.'''
+        
+        data_box, file_path = serial_record
+        
+        if root_dir is None:
+            store_path = file_path
+        else:
+            remove_root = os.path.join(os.path.abspath(root_dir), "")
+            store_path = file_path.replace(remove_root, "")
+        
+        load_dict = dict(data_box.load_dict)
+        load_dict["file_path"] = store_path
+        
+        data_box = SerialBox(data_box.identifier, load_dict)
+        data_pool.set_serialised(data_index, data_box, file_path)
+        
+        return
         
     def _convert_box_to_data(self, data_catalog,
                                    data_pool,
@@ -596,27 +1391,54 @@ class DataStorage(Plugin):
                                    root_dir=None,
                                    warn_missing=False,
                                    warn_unpickle=False):
+        
+        load_task = self._get_load_task(data_pool, data_index, root_dir)
+        if load_task is None: return
+        
+        load_result = _load_value(load_task)
+        self._store_data(data_catalog,
+                         data_pool,
+                         data_index,
+                         load_result,
+                         root_dir,
+                         warn_missing=warn_missing,
+                         warn_unpickle=warn_unpickle)
+
+        return
+    
+    def _get_load_task(self, data_pool,
+                             data_index,
+                             root_dir=None,
+                             pack_readers=None):
                                   
         data_box = data_pool.get(data_index)
         
-        if not isinstance(data_box, SerialBox): return
+        if not isinstance(data_box, SerialBox): return None
             
-        file_path = data_box.load_dict["file_path"]
         structure_name = data_box.load_dict["structure_name"]
-
-        if root_dir is None:
-            load_path = file_path
-        else:
-            load_path = os.path.join(root_dir, file_path)
-            
         data_structure = self.get_structure(structure_name)
         
-        try:
-            data = data_structure.load_data(load_path)
-        except Exception:
+        load_path, pack_range = _get_load_location(data_box, root_dir)
+        
+        return data_structure, load_path, pack_range, pack_readers
+    
+    def _store_data(self, data_catalog,
+                          data_pool,
+                          data_index,
+                          load_result,
+                          root_dir=None,
+                          warn_missing=False,
+                          warn_unpickle=False):
+        
+        data_box = data_pool.get(data_index)
+        file_path = data_box.load_dict["file_path"]
+        structure_name = data_box.load_dict["structure_name"]
+        data, error = load_result
+        
+        if error is not None:
             msgStr = ("Unpickling of data with id {} failed with an "
                       "unexpected error:\n{}").format(data_box.identifier,
-                                                      traceback.format_exc())
+                                                      error)
             if warn_unpickle:
                 module_logger.warn(msgStr)
                 data = None
@@ -638,8 +1460,18 @@ class DataStorage(Plugin):
             data_obj = Data(data_box.identifier,
                             structure_name,
                             None)
-       
-        data_pool.replace(data_index, data_obj)
+        
+        elif (error is None and
+              "digest" in data_box.load_dict and
+              data_obj.get_structure_name() == structure_name):
+            
+            data_obj.set_digest(data_box.load_dict["digest"])
+        
+        if root_dir is not None: file_path = os.path.join(root_dir, file_path)
+        
+        data_pool.set_deserialised(data_index,
+                                   data_obj,
+                                   os.path.abspath(file_path))
 
         return
 
@@ -670,6 +1502,631 @@ class DataStorage(Plugin):
         return data_obj
 
 
+class SaveProgress(namedtuple("SaveProgress", ["completed",
+                                               "total",
+                                               "nbytes",
+                                               "elapsed"])):
+    
+    '''Progress of saving a pool, giving the number of values completed
+    out of the total, the number of bytes written and the seconds elapsed.'''
+    
+    __slots__ = ()
+    
+    @property
+    def throughput(self):
+        
+        '''Bytes written per second.'''
+        
+        if self.elapsed <= 0: return 0.
+        
+        return self.nbytes / self.elapsed
+
+
+class _ProgressReporter(object):
+    
+    def __init__(self, callback, total):
+        
+        self._callback = callback
+        self._total = total
+        self._completed = 0
+        self._nbytes = 0
+        self._start = time.time()
+        
+        return
+    
+    def update(self, nbytes):
+        
+        self._completed += 1
+        self._nbytes += nbytes
+        
+        if self._callback is None: return
+        
+        progress = SaveProgress(self._completed,
+                                self._total,
+                                self._nbytes,
+                                time.time() - self._start)
+        self._callback(progress)
+        
+        return
+
+
+class _LazyHydrator(object):
+    
+    '''Copy callback for lazily deserialised pools, which loads all of
+    their values before they are copied, as the copies are not registered
+    as lazy and their SerialBox objects could not be loaded otherwise.'''
+    
+    def __init__(self, data_storage):
+        
+        self._storage_ref = weakref.ref(data_storage)
+        
+        return
+    
+    def __call__(self, data_pool):
+        
+        data_storage = self._storage_ref()
+        if data_storage is None: return
+        
+        data_storage.hydrate_data(data_pool)
+        
+        return
+
+
+class _WriterThread(threading.Thread):
+    
+    '''Write buffered values to files, or to a pack file, in the order they
+    are queued. Queued items are the data index followed by the results of
+    _buffer_value, where payload is None if the value was already written.
+    The results are (data_index, (file_path, error, pack_range, nbytes,
+    checksum)) tuples. A slot is released to the given semaphore once each
+    item has been written and discarded.'''
+    
+    def __init__(self, slots, pack_writer=None):
+        
+        super(_WriterThread, self).__init__()
+        self.daemon = True
+        
+        self._slots = slots
+        self._in_queue = Queue.Queue()
+        self._out_queue = Queue.Queue()
+        self._pack_writer = pack_writer
+        self._stopped = threading.Event()
+        
+        return
+    
+    def put(self, item):
+        
+        self._in_queue.put(item)
+        
+        return
+    
+    def get_results(self):
+        
+        '''Yield the results available without blocking.'''
+        
+        while True:
+            
+            try:
+                result = self._out_queue.get_nowait()
+            except Queue.Empty:
+                return
+            
+            yield result
+    
+    def finish(self):
+        
+        '''Write the remaining items and wait for the thread to end.'''
+        
+        self._in_queue.put(None)
+        self.join()
+        
+        return
+    
+    def stop(self):
+        
+        '''Discard the remaining items and wait for the thread to end.'''
+        
+        if not self.is_alive(): return
+        
+        self._stopped.set()
+        self._in_queue.put(None)
+        self.join()
+        
+        return
+    
+    def run(self):
+        
+        while True:
+            
+            item = self._in_queue.get()
+            
+            if item is None: break
+            
+            if self._stopped.is_set():
+                del item
+                self._slots.release()
+                continue
+            
+            data_index, file_path, payload, nbytes, checksum, error = item
+            del item
+            pack_range = None
+            
+            if error is None and payload is not None:
+                
+                try:
+                    file_path, pack_range = self._write(data_index,
+                                                        file_path,
+                                                        payload)
+                except Exception:
+                    file_path = None
+                    error = traceback.format_exc()
+            
+            del payload
+            self._slots.release()
+            
+            self._out_queue.put((data_index,
+                                 (file_path,
+                                  error,
+                                  pack_range,
+                                  nbytes,
+                                  checksum)))
+        
+        return
+    
+    def _write(self, data_index, file_path, payload):
+        
+        '''Write a payload, returning the path written to and the payload
+        range if it was appended to a pack file.'''
+        
+        if self._pack_writer is None:
+            
+            with open(file_path, "wb") as fstream:
+                fstream.write(payload)
+            
+            return file_path, None
+        
+        pack_range = self._pack_writer.append(data_index, payload)
+        
+        return self._pack_writer.file_path, pack_range
+
+
+def _iter_save_results(save_indexes,
+                       save_tasks,
+                       workers=None,
+                       use_processes=False,
+                       pack_writer=None):
+    
+    '''Save the values of the tasks, yielding the results of the writes in
+    the order of save_indexes.'''
+    
+    if pack_writer is None:
+        
+        with _task_results(_save_value,
+                           save_tasks,
+                           workers,
+                           use_processes) as save_results:
+            
+            for data_index, save_result in izip(save_indexes, save_results):
+                
+                file_path, nbytes, checksum, error = save_result
+                
+                yield data_index, (file_path, error, None, nbytes, checksum)
+        
+        return
+    
+    with _task_results(_buffer_pack_value,
+                       save_tasks,
+                       workers,
+                       use_processes) as buffer_results:
+        
+        for data_index, buffer_result in izip(save_indexes, buffer_results):
+            
+            file_path, payload, nbytes, checksum, error = buffer_result
+            pack_range = None
+            
+            if error is None and payload is not None:
+                pack_range = pack_writer.append(data_index, payload)
+                file_path = pack_writer.file_path
+            
+            yield data_index, (file_path, error, pack_range, nbytes, checksum)
+    
+    return
+
+
+def _iter_pipeline_results(save_indexes,
+                           save_tasks,
+                           workers=None,
+                           use_processes=False,
+                           pack_writer=None,
+                           queue_size=1):
+    
+    '''Serialise the values of the tasks into buffers which are written by
+    a _WriterThread, yielding the results of the writes in the order of
+    save_indexes. A slot is taken before each value is serialised and is
+    released by the writer, so no more than queue_size buffers exist at
+    once.'''
+    
+    if pack_writer is None:
+        buffer_func = _buffer_value
+    else:
+        buffer_func = _buffer_pack_value
+    
+    slots = threading.BoundedSemaphore(queue_size)
+    writer = _WriterThread(slots, pack_writer)
+    writer.start()
+    
+    try:
+        
+        with _task_results(buffer_func,
+                           save_tasks,
+                           workers,
+                           use_processes,
+                           slots) as buffer_results:
+            
+            index_iter = iter(save_indexes)
+            
+            # Buffers are not bound to any loop variable after being queued,
+            # so that they are released as soon as they are written
+            for buffer_result in buffer_results:
+                
+                writer.put((next(index_iter),) + buffer_result)
+                del buffer_result
+                
+                for result in writer.get_results():
+                    yield result
+        
+        writer.finish()
+        
+        for result in writer.get_results():
+            yield result
+    
+    finally:
+        
+        writer.stop()
+    
+    return
+
+
+def _save_value(save_task):
+    
+    '''Save the value of a task, returning a (file_path, nbytes, checksum,
+    error) tuple. The checksum is calculated as the file is written, unless
+    the structure overrides save_value, in which case the saved file is read
+    back.'''
+    
+    data_structure, data, root_path = save_task
+    
+    try:
+        
+        if _has_default_save(data_structure):
+            
+            checksum = hashlib.sha1()
+            file_path = data_structure.save_value(data, root_path, checksum)
+            nbytes = _get_path_size(file_path)
+            checksum = checksum.hexdigest()
+        
+        else:
+            
+            file_path = data_structure.save_value(data, root_path)
+            nbytes, checksum = _get_path_checksum(file_path)
+    
+    except Exception:
+        
+        return None, 0, None, traceback.format_exc()
+    
+    return file_path, nbytes, checksum, None
+
+
+def _dump_value(save_task):
+    
+    data_structure, data, _ = save_task
+    
+    try:
+        payload = data_structure.dump_value(data)
+        checksum = hashlib.sha1(payload).hexdigest()
+    except Exception:
+        return None, None, traceback.format_exc()
+    
+    return payload, checksum, None
+
+
+def _buffer_value(save_task):
+    
+    '''Serialise the value of a task for writing to file by a
+    _WriterThread. Values of structures which save to their own file formats
+    are saved immediately. Returns a (file_path, payload, nbytes, checksum,
+    error) tuple.'''
+    
+    data_structure, data, root_path = save_task
+    
+    if not _is_pickled(data_structure):
+        
+        file_path, nbytes, checksum, error = _save_value(save_task)
+        
+        return file_path, None, nbytes, checksum, error
+    
+    file_path = "{}.pkl".format(root_path)
+    payload, checksum, error = _dump_value(save_task)
+    
+    if error is not None: return None, None, 0, None, error
+    
+    return file_path, payload, len(payload), checksum, None
+
+
+def _buffer_pack_value(save_task):
+    
+    '''Serialise the value of a task for appending to a pack file. Values
+    of structures which are not pickled are saved to their own files, as
+    by _buffer_value.'''
+    
+    data_structure, _, _ = save_task
+    
+    if not _is_pickled(data_structure):
+        
+        file_path, nbytes, checksum, error = _save_value(save_task)
+        
+        return file_path, None, nbytes, checksum, error
+    
+    payload, checksum, error = _dump_value(save_task)
+    
+    if error is not None: return None, None, 0, None, error
+    
+    return None, payload, len(payload), checksum, None
+
+
+def _is_pickled(data_structure):
+    
+    '''Return True if the structure saves values as uncompressed pickles
+    and loads them without changes, so that they can be serialised by
+    dump_value and loaded by load_value instead.'''
+    
+    if not _has_default_save(data_structure): return False
+    if not _has_default_load(data_structure): return False
+    if data_structure.memory_map or data_structure.codec is not None:
+        return False
+    
+    return True
+
+
+def _has_default_save(data_structure):
+    
+    save_value = type(data_structure).save_value.__func__
+    
+    return save_value is Structure.save_value.__func__
+
+
+def _has_default_load(data_structure):
+    
+    load_data = type(data_structure).load_data.__func__
+    
+    return load_data is Structure.load_data.__func__
+
+
+def _get_load_location(data_box, root_dir=None):
+    
+    '''Return the path of the file holding the value of a SerialBox and
+    the (offset, length) of the value if it is in a pack file, or None.'''
+    
+    file_path = data_box.load_dict["file_path"]
+
+    if root_dir is None:
+        load_path = file_path
+    else:
+        load_path = os.path.join(root_dir, file_path)
+    
+    if "offset" in data_box.load_dict:
+        pack_range = (data_box.load_dict["offset"],
+                      data_box.load_dict["length"])
+    else:
+        pack_range = None
+    
+    return load_path, pack_range
+
+
+def _get_path_checksum(path):
+    
+    '''Return the size and SHA-1 checksum of a file, or of the files in a
+    directory and their relative paths, reading them in chunks.'''
+    
+    checksum = hashlib.sha1()
+    
+    if os.path.isfile(path):
+        file_paths = [path]
+    else:
+        file_paths = [os.path.join(dir_path, file_name)
+                            for dir_path, _, file_names in os.walk(path)
+                                for file_name in file_names]
+        file_paths.sort()
+    
+    nbytes = 0
+    
+    for file_path in file_paths:
+        
+        if file_path != path:
+            rel_path = os.path.relpath(file_path, path)
+            checksum.update(rel_path.replace(os.sep, "/"))
+        
+        with open(file_path, "rb") as fstream:
+            for chunk in iter(lambda: fstream.read(CHECKSUM_CHUNK_SIZE), b""):
+                checksum.update(chunk)
+                nbytes += len(chunk)
+    
+    return nbytes, checksum.hexdigest()
+
+
+def _get_path_size(path):
+    
+    '''Return the size of a file, or the total size of the files in a
+    directory.'''
+    
+    if os.path.isfile(path): return os.path.getsize(path)
+    
+    nbytes = sum(os.path.getsize(os.path.join(dir_path, file_name))
+                        for dir_path, _, file_names in os.walk(path)
+                                            for file_name in file_names)
+    
+    return nbytes
+
+
+def _get_payload_checksum(load_path, offset, length):
+    
+    '''Return the SHA-1 checksum of a payload in a pack file, reading it
+    in chunks.'''
+    
+    checksum = hashlib.sha1()
+    
+    with PackReader(load_path) as reader:
+        
+        end = offset + length
+        
+        while offset < end:
+            chunk_size = min(CHECKSUM_CHUNK_SIZE, end - offset)
+            checksum.update(reader.read(offset, chunk_size))
+            offset += chunk_size
+    
+    return checksum.hexdigest()
+
+
+def _verify_value(verify_task):
+    
+    '''Return "ok", "missing" or "corrupt" for the file or pack payload of
+    a task, or "unchecked" if no checksum was recorded.'''
+    
+    load_path, pack_range, expected = verify_task
+    
+    if not os.path.exists(load_path): return "missing"
+    if expected is None: return "unchecked"
+    
+    try:
+        
+        if pack_range is None:
+            _, checksum = _get_path_checksum(load_path)
+        else:
+            checksum = _get_payload_checksum(load_path, *pack_range)
+    
+    except Exception:
+        
+        return "corrupt"
+    
+    if checksum != expected: return "corrupt"
+    
+    return "ok"
+
+
+def _load_value(load_task):
+    
+    data_structure, load_path, pack_range, pack_readers = load_task
+    
+    try:
+        
+        if pack_range is None:
+            data = data_structure.load_data(load_path)
+        elif pack_readers is None:
+            payload = read_payload(load_path, *pack_range)
+            data = data_structure.load_value(payload)
+        else:
+            payload = pack_readers.read(load_path, *pack_range)
+            data = data_structure.load_value(payload)
+            
+    except Exception:
+        return None, traceback.format_exc()
+    
+    return data, None
+
+
+@contextmanager
+def _task_results(func,
+                  tasks,
+                  workers=None,
+                  use_processes=False,
+                  slots=None):
+    
+    '''Yield an iterator over the results of calling func on each task, in
+    order. The tasks are processed by a pool of threads or processes if
+    workers is greater than one. If slots is given, a slot is acquired from
+    the semaphore before each task is started, and the consumer of the
+    results must release it once the result is discarded.'''
+    
+    if workers is None or workers < 2 or not tasks:
+        if slots is None:
+            yield imap(func, tasks)
+        else:
+            yield _iter_slotted(func, tasks, slots)
+        return
+    
+    if use_processes:
+        worker_pool = multiprocessing.Pool(workers)
+    else:
+        worker_pool = ThreadPool(workers)
+    
+    if slots is None:
+        results = worker_pool.imap(func, tasks, chunksize=1)
+    else:
+        results = _iter_bounded(worker_pool, func, tasks, slots)
+    
+    try:
+        yield results
+    except:
+        worker_pool.terminate()
+        raise
+    else:
+        worker_pool.close()
+    finally:
+        worker_pool.join()
+    
+    return
+
+
+def _iter_slotted(func, tasks, slots):
+    
+    for task in tasks:
+        slots.acquire()
+        yield func(task)
+    
+    return
+
+
+def _iter_bounded(worker_pool, func, tasks, slots):
+    
+    '''Submit the tasks to the pool as slots become available. If no slot
+    is free, the oldest pending result is yielded first, so that the
+    consumer can release its slot.'''
+    
+    pending = deque()
+    
+    for task in tasks:
+        
+        while not slots.acquire(False):
+            
+            if pending:
+                yield pending.popleft().get()
+            else:
+                slots.acquire()
+                break
+        
+        pending.append(worker_pool.apply_async(func, (task,)))
+    
+    while pending:
+        yield pending.popleft().get()
+    
+    return
+
+
+def _stop_prefetch(lazy_context):
+    
+    '''Signal the prefetching threads of a lazy pool to stop and wait for
+    them to finish loading their current value.'''
+    
+    lazy_context["stop"].set()
+    
+    for thread in lazy_context["threads"]:
+        if thread is not threading.current_thread(): thread.join()
+    
+    lazy_context["threads"] = []
+    
+    return
+
+
 def _check_valid_datastate(datastate):
     
     if not hasattr(datastate, "add_index"):
@@ -679,3 +2136,81 @@ def _check_valid_datastate(datastate):
         raise ValueError(errStr)
     
     return
+
+
+def _is_yaml_definition(definition):
+
+    '''Return True if the given definition reads its metadata from the
+    yaml files returned by get_yaml_paths.'''
+
+    default_func = DataDefinition.get_metadef_lists.__func__
+    def_func = type(definition).get_metadef_lists.__func__
+
+    return def_func is default_func
+
+
+def _get_path_stamp(path):
+
+    '''Return the modification time and size of the given path.'''
+
+    stat = os.stat(path)
+
+    return (stat.st_mtime, stat.st_size)
+
+
+def _load_catalog_cache(cache_path, cache_key):
+
+    '''Return the list of metadata objects stored in the catalog cache, or
+    None if the cache is missing, unreadable or its key does not match.'''
+
+    if not os.path.isfile(cache_path): return None
+
+    try:
+
+        with open(cache_path, "rb") as fstream:
+            cached_key, obj_list = cPickle.load(fstream)
+
+    except Exception as e:
+
+        logMsg = ("Data catalog cache {} could not be read and will be "
+                  "rebuilt: {}").format(cache_path, e)
+        module_logger.warning(logMsg)
+
+        return None
+
+    if cached_key != cache_key:
+
+        logMsg = ("Data catalog cache {} is out of date and will be "
+                  "rebuilt").format(cache_path)
+        module_logger.info(logMsg)
+
+        return None
+
+    return obj_list
+
+
+def _save_catalog_cache(cache_path, cache_key, obj_list):
+
+    '''Store the list of metadata objects in the catalog cache. The cache
+    is written to a temporary file first, so that an interrupted write does
+    not leave a truncated cache behind.'''
+
+    temp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+
+    try:
+
+        with open(temp_path, "wb") as fstream:
+            cPickle.dump((cache_key, obj_list), fstream, -1)
+
+        if os.path.isfile(cache_path): os.remove(cache_path)
+        os.rename(temp_path, cache_path)
+
+    except (IOError, OSError) as e:
+
+        if os.path.isfile(temp_path): os.remove(temp_path)
+
+        logMsg = ("Data catalog cache {} could not be written: "
+                  "{}").format(cache_path, e)
+        module_logger.warning(logMsg)
+
+    return
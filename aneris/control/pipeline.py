@@ -28,6 +28,7 @@ class Sequencer(object):
         self._sockets = self._init_sockets(interface_types,
                                            interface_module,
                                            warn_import)
+        self._registry = {}
                 
         return
         
@@ -55,28 +56,14 @@ class Sequencer(object):
     @property
     def _names(self):
         
-        """Create a socket classes to locate and communicate with the chosen
-        interface class. Store name mappings.
+        """Name maps of the interfaces of each socket, keyed by interface
+        type.
         """
         
         socket_names = {}
         
-        for cls_name, socket_obj in self._sockets.iteritems():
-        
-            names_map = socket_obj.get_interface_names(
-                                            sort_weighted=self._sort_weighted)
-            
-            dupes = names_map.values()
-            for x in set(names_map.values()): dupes.remove(x)
-            
-            if dupes:
-                
-                dupes_str = ", ".join(dupes)
-                errStr = ("Duplicate interfaces names found: "
-                          "{}").format(dupes_str)
-                raise ValueError(errStr)
-
-            socket_names[cls_name] = names_map
+        for cls_name in self._sockets:
+            socket_names[cls_name] = self._get_names_map(cls_name)
         
         return socket_names
         
@@ -129,7 +116,7 @@ class Sequencer(object):
 
         """Return all the interface names found as plugins"""
 
-        names_dict = self._names[hub.interface_type]
+        names_dict = self._get_names_map(hub.interface_type)
         names = names_dict.keys()
 
         return names
@@ -165,9 +152,7 @@ class Sequencer(object):
 
         else:
 
-            interface_list = self._filter_names(hub,
-                                                [interface_cls_name])                                                
-            interface_name = interface_list[0]
+            interface_name = self.get_interface_name(hub, interface_cls_name)
 
         return interface_name
     
@@ -195,7 +180,7 @@ class Sequencer(object):
         
         result = False
 
-        names_dict = self._names[hub.interface_type]
+        names_dict = self._get_names_map(hub.interface_type)
         if interface_name in names_dict: result = True
 
         return result
@@ -205,11 +190,21 @@ class Sequencer(object):
         if not self.is_available(hub, interface_name): return None
         
         # Get the interface class name from the module name
-        names_dict = self._names[hub.interface_type]
+        names_dict = self._get_names_map(hub.interface_type)
         interface_cls_name = names_dict[interface_name]
 
         return interface_cls_name
         
+    def get_interface_name(self, hub, interface_cls_name):
+        
+        """Get the interface name from the interface class name, or None if
+        not available."""
+        
+        cls_names_map = self._get_cls_names_map(hub.interface_type)
+        interface_name = cls_names_map.get(interface_cls_name)
+        
+        return interface_name
+        
     def get_weight(self, hub, interface_name):
     
         '''Get the weighting of the interface if set'''
@@ -240,7 +235,7 @@ class Sequencer(object):
         if not self.is_available(hub, interface_name): return result
 
         interface_cls_name = self.get_cls_name(hub, interface_name)        
-        if interface_cls_name in hub.get_interface_map(): result = True
+        if interface_cls_name in hub.get_sequenced_cls_names(): result = True
             
         return result
 
@@ -300,11 +295,62 @@ class Sequencer(object):
         
     def _filter_names(self, hub, value_list):
         
-        names_dict = self._names[hub.interface_type]
-        result = [k for k, v in names_dict.items() if v in value_list]
+        names_dict = self._get_names_map(hub.interface_type)
+        value_set = set(value_list)
+        result = [k for k, v in names_dict.iteritems() if v in value_set]
 
         return result
     
+    def _get_names_map(self, interface_type):
+        
+        names_map, _ = self._get_registry(interface_type)
+        
+        return names_map
+    
+    def _get_cls_names_map(self, interface_type):
+        
+        _, cls_names_map = self._get_registry(interface_type)
+        
+        return cls_names_map
+    
+    def _get_registry(self, interface_type):
+        
+        """Get the maps from interface names to class names, and back, for
+        the given socket. The maps are only rebuilt when the interfaces of 
+        the socket change.
+        """
+        
+        socket_obj = self._sockets[interface_type]
+        revision = socket_obj.get_revision()
+        
+        if interface_type in self._registry:
+            
+            (registry_revision,
+             names_map,
+             cls_names_map) = self._registry[interface_type]
+            
+            if registry_revision == revision:
+                return names_map, cls_names_map
+        
+        names_map = socket_obj.get_interface_names(
+                                        sort_weighted=self._sort_weighted)
+        
+        dupes = names_map.values()
+        for x in set(names_map.values()): dupes.remove(x)
+        
+        if dupes:
+            
+            dupes_str = ", ".join(dupes)
+            errStr = ("Duplicate interfaces names found: "
+                      "{}").format(dupes_str)
+            raise ValueError(errStr)
+        
+        cls_names_map = {v: k for k, v in names_map.iteritems()}
+        
+        self._registry[interface_type] = (revision, names_map, cls_names_map)
+        
+        return names_map, cls_names_map
+    
     def _get_interface(self, hub, interface_name):
         
         socket = self.get_socket(hub.interface_type)
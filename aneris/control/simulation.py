@@ -16,6 +16,7 @@ module_logger = logging.getLogger(__name__)
 
 import os
 import json
+import weakref
 from copy import deepcopy
 from collections import OrderedDict
 
@@ -23,7 +24,8 @@ from ..boundary.data import SerialBox
 from ..boundary.interface import MaskVariable
 from ..entity.data import BaseState, PseudoState, DataState # Used by eval
 from ..utilities.identity import get_unique_id
-from ..utilities.misc import OrderedSet
+from ..utilities.pack import PackWriter, read_payload
+from ..utilities.journal import JournalWriter, read_journal
 
 
 class Loader(object):
@@ -36,6 +38,22 @@ class Loader(object):
     def __init__(self, datastore):
         
         self._store = datastore
+        self._active_inputs_cache = weakref.WeakKeyDictionary()
+        
+        return
+    
+    def __getstate__(self):
+        
+        # The active inputs cache is not copied or pickled with the loader
+        state = dict(self.__dict__)
+        state.pop("_active_inputs_cache", None)
+        
+        return state
+    
+    def __setstate__(self, state):
+        
+        self.__dict__.update(state)
+        self._active_inputs_cache = weakref.WeakKeyDictionary()
         
         return
         
@@ -68,15 +86,13 @@ class Loader(object):
                               simulation,
                               interface,
                               check_id):
-                                  
-        input_declaration, _ = interface.get_inputs()
         
-        active_inputs = self._get_active_inputs(pool,
-                                                simulation,
-                                                input_declaration)
+        input_indexes = self._resolve_input_indexes(pool,
+                                                   simulation,
+                                                   interface)
         
         result = False
-        if check_id in active_inputs: result = True 
+        if check_id in input_indexes: result = True 
 
         return result
         
@@ -84,49 +100,64 @@ class Loader(object):
                        simulation,
                        interface):
                            
-        input_declaration, optional_inputs = interface.get_inputs()
+        _, optional_inputs = interface.get_inputs()
+        input_indexes = self._resolve_input_indexes(pool,
+                                                   simulation,
+                                                   interface)
         
-        active_inputs = self._get_active_inputs(pool,
-                                                simulation,
-                                                input_declaration)
-                                                      
-        merged_state = self.create_merged_state(simulation)
-        
-        if merged_state is None:
-            state_data_ids = set()
-        else:
-            state_data_ids = set(merged_state.get_identifiers())
-                                                                
-        required_inputs = set(active_inputs) - set(optional_inputs)
+        result = True
         
-        if required_inputs <= state_data_ids:
-            result = True
-        else:
-            result = False
+        for input_id, data_index in input_indexes.iteritems():
+            
+            if data_index is None and input_id not in optional_inputs:
+                result = False
+                break
             
         return result
-        
-    def load_interface(self, pool,
+    
+    def resolve_inputs(self, pool,
                              simulation,
                              interface,
                              skip_vars=None):
-                                 
-        input_declaration, optional_inputs = interface.get_inputs()
         
-        active_inputs = self._get_active_inputs(pool,
-                                                simulation,
-                                                input_declaration)
+        '''Return an ordered mapping of the active inputs of the interface to
+        their values, or None if no data is available. The input masks and
+        merged state are evaluated once for all inputs.'''
+        
+        input_indexes = self._resolve_input_indexes(pool,
+                                                   simulation,
+                                                   interface)
+        
+        if skip_vars is None: skip_vars = []
         
-        if skip_vars is not None:
-            remaining_inputs = set(active_inputs) - set(skip_vars)
-            active_inputs = list(remaining_inputs)
+        input_values = OrderedDict()
         
-        for putvar in active_inputs:
+        for input_id, data_index in input_indexes.iteritems():
             
-            if self.has_data(simulation, putvar):
-                data_value = self.get_data_value(pool, simulation, putvar)
-            else:
+            if input_id in skip_vars: continue
+            
+            if data_index is None:
                 data_value = None
+            else:
+                data_value = self._store.get_index_value(pool, data_index)
+            
+            input_values[input_id] = data_value
+        
+        return input_values
+        
+    def load_interface(self, pool,
+                             simulation,
+                             interface,
+                             skip_vars=None):
+                                 
+        _, optional_inputs = interface.get_inputs()
+        
+        input_values = self.resolve_inputs(pool,
+                                           simulation,
+                                           interface,
+                                           skip_vars)
+        
+        for putvar, data_value in input_values.iteritems():
             
             # Allow None values from optional inputs
             if data_value is None and putvar not in optional_inputs:
@@ -163,15 +194,12 @@ class Loader(object):
             errStr = "A DataCatelog must be provided to add data"
             raise ValueError(errStr)
         
+        # Test that all the variables are in the data catalog
+        if data_list:
+            self._store.check_valid_variables(data_catalog,
+                                              [x for x, _ in data_list])
+        
         for ident, data in data_list:
-
-            # Test that the variable is in the data catalog
-            if not self._store.is_valid(data_catalog, ident):
-    
-                errStr = ('Variable ID "{}" is not contained in the data '
-                          'catalog.').format(ident)
-    
-                raise ValueError(errStr)
     
             # Get the meta data from the catalog
             metadata = data_catalog.get_metadata(ident)
@@ -247,9 +275,108 @@ class Loader(object):
             
         return merged_state
         
+    def prefetch_merged_state(self, pool, simulation):
+        
+        '''Load the values of the merged state of the simulation in the
+        background, if the pool was lazily deserialised. Returns the
+        prefetching thread or None.'''
+        
+        merged_state = self.create_merged_state(simulation)
+        if merged_state is None: return None
+        
+        data_indexes = [data_index for data_index in
+                                    merged_state.mirror_map().itervalues()
+                                                if data_index is not None]
+        
+        thread = self._store.prefetch_data(pool, data_indexes)
+        
+        return thread
+        
     def serialise_states(self, simulation,
                                state_dir="states",
-                               root_dir=None):
+                               root_dir=None,
+                               pack_name=None,
+                               journal_name=None):
+        
+        '''Convert the states of the simulation to SerialBox objects,
+        saving them as JSON files in state_dir. If pack_name is given, the
+        states are appended to a single pack file of that name in
+        state_dir, rather than saved to a file per state. If journal_name is
+        given, the states are saved to a single delta encoded journal of
+        that name in state_dir instead.'''
+        
+        if pack_name is not None and journal_name is not None:
+            
+            errStr = "Only one of pack_name and journal_name may be given"
+            raise ValueError(errStr)
+        
+        if pack_name is None:
+            pack_writer = None
+        else:
+            pack_writer = PackWriter(os.path.join(state_dir, pack_name))
+        
+        if journal_name is None:
+            journal_writer = None
+        else:
+            journal_writer = JournalWriter(os.path.join(state_dir,
+                                                        journal_name))
+        
+        try:
+            self._serialise_states(simulation,
+                                   state_dir,
+                                   root_dir,
+                                   pack_writer,
+                                   journal_writer)
+        finally:
+            if pack_writer is not None: pack_writer.close()
+            if journal_writer is not None: journal_writer.close()
+            
+        return
+        
+    def deserialise_states(self, simulation,
+                                 root_dir=None):
+        
+        # Journals are decoded once and shared by their states
+        journal_cache = {}
+                
+        active_boxes = simulation._active_states
+        active_states = []
+        
+        for serial_box in active_boxes:
+        
+            state = self._convert_box_to_state(serial_box,
+                                               root_dir,
+                                               journal_cache)
+            active_states.append(state)
+            
+        redo_boxes = simulation._redo_states
+        redo_states = []
+        
+        for serial_box in redo_boxes:
+        
+            state = self._convert_box_to_state(serial_box,
+                                               root_dir,
+                                               journal_cache)
+            redo_states.append(state)
+            
+        simulation._active_states = active_states
+        simulation._redo_states = redo_states
+        simulation.reset_merged_index()
+        
+        if simulation._merged_state is not None:
+            
+            state = self._convert_box_to_state(simulation._merged_state,
+                                               root_dir,
+                                               journal_cache)
+            simulation._merged_state = state
+        
+        return
+        
+    def _serialise_states(self, simulation,
+                                state_dir,
+                                root_dir=None,
+                                pack_writer=None,
+                                journal_writer=None):
         
         used_identifiers = []
         
@@ -262,7 +389,9 @@ class Loader(object):
             state_box = self._convert_state_to_box(state,
                                                    safe_id,
                                                    state_dir,
-                                                   root_dir)
+                                                   root_dir,
+                                                   pack_writer,
+                                                   journal_writer)
             active_boxes.append(state_box)
             
         redo_states = simulation._redo_states
@@ -274,11 +403,14 @@ class Loader(object):
             state_box = self._convert_state_to_box(state,
                                                    safe_id,
                                                    state_dir,
-                                                   root_dir)
+                                                   root_dir,
+                                                   pack_writer,
+                                                   journal_writer)
             redo_boxes.append(state_box)
 
         simulation._active_states = active_boxes
         simulation._redo_states = redo_boxes
+        simulation.reset_merged_index()
         
         if simulation._merged_state is not None:
             
@@ -286,48 +418,126 @@ class Loader(object):
             state_box = self._convert_state_to_box(simulation._merged_state,
                                                    safe_id,
                                                    state_dir,
-                                                   root_dir)
+                                                   root_dir,
+                                                   pack_writer,
+                                                   journal_writer)
             simulation._merged_state = state_box
             
         return
         
-    def deserialise_states(self, simulation,
-                                 root_dir=None):
-                
-        active_boxes = simulation._active_states
-        active_states = []
+    def _resolve_input_indexes(self, pool, simulation, interface):
         
-        for serial_box in active_boxes:
+        '''Return an ordered mapping of the active inputs of the interface
+        to their data indexes in the merged state, or None if not
+        available.'''
         
-            state = self._convert_box_to_state(serial_box, root_dir)
-            active_states.append(state)
-            
-        redo_boxes = simulation._redo_states
-        redo_states = []
+        input_declaration, _ = interface.get_inputs()
+        merged_state = self.create_merged_state(simulation)
         
-        for serial_box in redo_boxes:
+        active_inputs = self._get_active_inputs(pool,
+                                                simulation,
+                                                input_declaration,
+                                                merged_state,
+                                                _get_interface_cls(interface))
         
-            state = self._convert_box_to_state(serial_box, root_dir)
-            redo_states.append(state)
-            
-        simulation._active_states = active_states
-        simulation._redo_states = redo_states
+        input_indexes = OrderedDict()
         
-        if simulation._merged_state is not None:
+        for input_id in active_inputs:
             
-            state = self._convert_box_to_state(simulation._merged_state,
-                                               root_dir)
-            simulation._merged_state = state
+            data_index = None
+            
+            if self._store.has_data(merged_state, input_id):
+                data_index = merged_state.get_index(input_id)
+            
+            input_indexes[input_id] = data_index
         
-        return
+        return input_indexes
         
     def _get_active_inputs(self, pool,
                                  simulation,
-                                 input_declaration):
+                                 input_declaration,
+                                 merged_state=None,
+                                 interface_cls=None):
+        
+        '''Return the identifiers of the declared inputs which are not
+        masked. The merged state of the simulation is used if not given.
+        
+        If interface_cls is given, the result is cached per pool and
+        interface class and only recalculated when the data index of one of
+        the unmask variables changes in the merged state.'''
                     
+        if input_declaration is None: return []
+        
+        if merged_state is None:
+            merged_state = self.create_merged_state(simulation)
+        
+        if interface_cls is None or pool is None:
+            
+            input_ids = self._evaluate_active_inputs(pool,
+                                                     input_declaration,
+                                                     merged_state)
+            
+            return input_ids
+        
+        unmask_indexes = self._get_unmask_indexes(input_declaration,
+                                                  merged_state)
+        
+        pool_cache = self._active_inputs_cache.setdefault(pool, {})
+        
+        if interface_cls in pool_cache:
+            
+            cached_indexes, cached_ids = pool_cache[interface_cls]
+            
+            if cached_indexes == unmask_indexes:
+                
+                log_msg = ('Using cached active inputs for interface class '
+                           '"{}".').format(interface_cls.__name__)
+                module_logger.debug(log_msg)
+                
+                return cached_ids[:]
+        
+        input_ids = self._evaluate_active_inputs(pool,
+                                                 input_declaration,
+                                                 merged_state)
+        
+        pool_cache[interface_cls] = (unmask_indexes, input_ids[:])
+        
+        return input_ids
+    
+    def _get_unmask_indexes(self, input_declaration, merged_state):
+        
+        '''Return the data indexes of the unmask variables of the input
+        declaration in the merged state, or None if not set.'''
+        
+        unmask_indexes = []
+        
+        for declared_input in input_declaration:
+            
+            if not isinstance(declared_input, MaskVariable): continue
+            if declared_input.unmask_variable is None: continue
+            
+            unmask_variable = declared_input.unmask_variable
+            data_index = None
+            
+            if (merged_state is not None and
+                merged_state.has_index(unmask_variable)):
+                data_index = merged_state.get_index(unmask_variable)
+                
+            unmask_indexes.append((unmask_variable, data_index))
+        
+        return tuple(unmask_indexes)
+    
+    def _evaluate_active_inputs(self, pool,
+                                      input_declaration,
+                                      merged_state):
+        
+        '''Evaluate the masks of the input declaration against the given
+        merged state. The value of each unmask variable is only retrieved
+        once.'''
+        
         input_ids = []
         
-        if input_declaration is None: return input_ids
+        unmask_data = {}
         
         for declared_input in input_declaration:
             
@@ -346,8 +556,6 @@ class Loader(object):
                     input_ids.append(declared_input.variable_id)
                     continue
                 
-                merged_state = self.create_merged_state(simulation)
-                
                 if merged_state is None: continue
                     
                 if merged_state.has_index(declared_input.unmask_variable):
@@ -356,11 +564,16 @@ class Loader(object):
                         
                         input_ids.append(declared_input.variable_id)
                         continue
-                
-                    data_value = self.get_data_value(
-                                            pool,
-                                            simulation,
-                                            declared_input.unmask_variable)
+                    
+                    unmask_variable = declared_input.unmask_variable
+                    
+                    if unmask_variable not in unmask_data:
+                        
+                        data_index = merged_state.get_index(unmask_variable)
+                        unmask_data[unmask_variable] = \
+                                self._store.get_index_value(pool, data_index)
+                    
+                    data_value = unmask_data[unmask_variable]
                                             
                     for unmask_value in declared_input.unmask_values:
                                             
@@ -383,28 +596,35 @@ class Loader(object):
         '''Combine all the datastates into one datastate. If the datastate is
         masked then ignore it. If remove_none_keys is True then should a 
         variable have None value when merging a state it should be deleted
-        from the final output.'''
+        from the final output.
         
-        active_states = simulation.mirror_active_states()
+        When removing None keys, the merged map is taken from the merged index
+        maintained by the simulation, otherwise it is rebuilt from copies of
+        the active states.'''
         
         log_msg = 'Merging active DataStates.'
         module_logger.debug(log_msg)
         
-        if not active_states:
+        if not simulation.count_active_states(): return None
+        
+        if remove_none_keys:
             
-            return None
+            merged_map = simulation.mirror_merged_map()
             
-        merged_map = {}
-        
-        for state in active_states:
-
-            # Loop if the state is masked.
-            if state.ismasked(): continue
+        else:
             
-            data_map = state.mirror_map()
-            merged_map = self._update_dict(merged_map,
-                                           data_map,
-                                           remove_none_keys)
+            active_states = simulation.mirror_active_states()
+            merged_map = {}
+            
+            for state in active_states:
+    
+                # Loop if the state is masked.
+                if state.ismasked(): continue
+                
+                data_map = state.mirror_map()
+                merged_map = self._update_dict(merged_map,
+                                               data_map,
+                                               remove_none_keys)
                                            
         merged_state = PseudoState(merged_map, level)
 
@@ -415,7 +635,7 @@ class Loader(object):
         if remove_none_keys:
         
             add_data = {k: v for k, v in new_dict.items() if v is not None}
-            remove_keys = [k for k, v in new_dict.items() if v is None]
+            remove_keys = set(k for k, v in new_dict.items() if v is None)
             
             final_dict = {k: old_dict[k] for k in old_dict
                                                     if k not in remove_keys}
@@ -431,7 +651,9 @@ class Loader(object):
     def _convert_state_to_box(self, state,
                                     identifier,
                                     save_dir,
-                                    root_dir=None):
+                                    root_dir=None,
+                                    pack_writer=None,
+                                    journal_writer=None):
         
         if not isinstance(state, (BaseState, PseudoState, DataState)):
             
@@ -440,8 +662,13 @@ class Loader(object):
                       "{}").format(type(state).__name__)
             raise ValueError(errStr)
                 
-        file_name = "datastate_{}.json".format(identifier)
-        file_path = os.path.join(save_dir, file_name)
+        if pack_writer is not None:
+            file_path = pack_writer.file_path
+        elif journal_writer is not None:
+            file_path = journal_writer.file_path
+        else:
+            file_name = "datastate_{}.json".format(identifier)
+            file_path = os.path.join(save_dir, file_name)
         
         if root_dir is None:
             store_path = file_path
@@ -450,18 +677,30 @@ class Loader(object):
             store_path = file_path.replace(remove_root, "")
         
         state_dict = state.dump()
-        
-        with open(file_path, 'wb') as json_file:
-            json.dump(state_dict, json_file)
-                        
         load_dict = {"file_path": store_path}
+        
+        if pack_writer is not None:
+            
+            payload = json.dumps(state_dict)
+            (load_dict["offset"],
+             load_dict["length"]) = pack_writer.append(identifier, payload)
+        
+        elif journal_writer is not None:
+            
+            load_dict["entry"] = journal_writer.append(state_dict)
+        
+        else:
+            
+            with open(file_path, 'wb') as json_file:
+                json.dump(state_dict, json_file)
 
         data_box = SerialBox(identifier, load_dict)
             
         return data_box
         
     def _convert_box_to_state(self, serial_box,
-                                    root_dir=None):
+                                    root_dir=None,
+                                    journal_cache=None):
         
         if not isinstance(serial_box, SerialBox):
             
@@ -477,8 +716,26 @@ class Loader(object):
         else:
             load_path = os.path.join(root_dir, file_path)
                         
-        with open(load_path, 'rb') as json_file:
-            dump_dict = json.load(json_file)
+        if "offset" in serial_box.load_dict:
+            
+            payload = read_payload(load_path,
+                                   serial_box.load_dict["offset"],
+                                   serial_box.load_dict["length"])
+            dump_dict = json.loads(payload)
+        
+        elif "entry" in serial_box.load_dict:
+            
+            if journal_cache is None: journal_cache = {}
+            
+            if load_path not in journal_cache:
+                journal_cache[load_path] = read_journal(load_path)
+            
+            dump_dict = journal_cache[load_path][serial_box.load_dict["entry"]]
+        
+        else:
+                        
+            with open(load_path, 'rb') as json_file:
+                dump_dict = json.load(json_file)
             
         state_type = dump_dict["type"]
         state_level = dump_dict["level"]
@@ -732,6 +989,21 @@ class Controller(Loader):
         
         return interface_obj
     
+    def get_interface_cls(self, simulation,
+                                hub_id,
+                                interface_name):
+        
+        """Get the class of a sequenced interface without copying the
+        interface object, for read-only queries of its declarations."""
+          
+        hub = simulation.get_hub(hub_id)
+        interface_cls_name = self.get_interface_cls_name(simulation,
+                                                         hub_id,
+                                                         interface_name)
+        interface_cls = hub.get_interface_cls(interface_cls_name)
+        
+        return interface_cls
+    
     def mask_states(self, simulation,
                           search_str=None,
                           mask_after=None,
@@ -811,15 +1083,16 @@ class Controller(Loader):
         interface_cls_name = self.get_interface_cls_name(simulation,
                                                          hub_id,
                                                          interface_name)
-        interface_obj = self.get_interface_obj(simulation,
+        interface_cls = self.get_interface_cls(simulation,
                                                hub_id,
                                                interface_name)
         (input_declaration,
-         optional_inputs) = interface_obj.get_inputs()
+         optional_inputs) = interface_cls.get_inputs()
 
         all_inputs = self._get_active_inputs(pool,
                                              simulation,
-                                             input_declaration)           
+                                             input_declaration,
+                                             interface_cls=interface_cls)
 
         # Check if the interface has been completed already
         if hub.force_completed or hub.is_completed(interface_cls_name):
@@ -833,7 +1106,7 @@ class Controller(Loader):
             # Need to interate through any interfaces before the given one
             # in the interface map of the hub, excluding the completed
             # ones.
-            preceeding_interfaces = hub.get_preceding_interfaces(
+            preceeding_classes = hub.get_preceding_cls_map(
                                                         interface_cls_name,
                                                         ignore_completed=True)
 
@@ -841,64 +1114,28 @@ class Controller(Loader):
             # Get all the outputs provided for the proceeding items
             if all_overwritten is None: all_overwritten = []
 
-            for interface_obj in preceeding_interfaces.itervalues():
+            for prec_cls in preceeding_classes.itervalues():
                 
-                prec_input_declaration, _ = interface_obj.get_inputs()
-                prec_inputs = self._get_active_inputs(pool,
-                                                      simulation,
-                                                      prec_input_declaration)
+                prec_input_declaration, _ = prec_cls.get_inputs()
+                prec_inputs = self._get_active_inputs(
+                                                pool,
+                                                simulation,
+                                                prec_input_declaration,
+                                                interface_cls=prec_cls)
                 
                 all_overwritten.extend(prec_inputs)
 
-                outputs = interface_obj.get_outputs()
+                outputs = prec_cls.get_outputs()
                 all_overwritten.extend(outputs)
 
-            # Inputs are required unless optional
-            input_status = {}
-
-            for input_id in all_inputs:
-                
-                if input_id in optional_inputs:
-                    
-                    input_status[input_id] = "optional"
-                    
-                else:
-
-                    input_status[input_id] = "required"
-
-            for var_id in all_overwritten:
-
-                if var_id in input_status.keys():
-                    
-                    if var_id in optional_inputs:
-                    
-                        input_status[var_id] = "overwritten_option"
-                    
-                    else:
-                    
-                        input_status[var_id] = "overwritten"
-
-            # Update the input and output status if the data is in the data
-            # state                
+            # Update the input status if the data is in the data state
             merged_state = self.create_merged_state(simulation)
-                
-            if merged_state is None:
-                return input_status
-
-            state_data_ids = merged_state.get_identifiers()
-            new_input_status = input_status.copy()
-    
-            for data_id, status in input_status.iteritems():
-                
-                new_input_status[data_id] = input_status[data_id]
-    
-                if data_id in state_data_ids:
-                    
-                    # If the variable is satisfied if in the datastate and 
-                    # its marked as required or optional
-                    if status == "required" or status == "optional":
-                        
-                        new_input_status[data_id] = "satisfied"
+            state_data_ids = _get_state_data_ids(merged_state)
+            
+            new_input_status = _get_input_status(all_inputs,
+                                                 optional_inputs,
+                                                 all_overwritten,
+                                                 state_data_ids)
 
         return new_input_status
 
@@ -920,10 +1157,10 @@ class Controller(Loader):
         interface_cls_name = self.get_interface_cls_name(simulation,
                                                          hub_id,
                                                          interface_name)
-        interface_obj = self.get_interface_obj(simulation,
+        interface_cls = self.get_interface_cls(simulation,
                                                hub_id,
                                                interface_name)
-        output_declaration = interface_obj.get_outputs()
+        output_declaration = interface_cls.get_outputs()
 
         # Get all the outputs provided by the interface
         output_status = {output_id: "unavailable"
@@ -993,24 +1230,122 @@ class Controller(Loader):
             # return all outputs as unavailable
             return output_status
 
-        state_data_ids = merged_state.get_identifiers()
-        new_output_status = output_status.copy()
-                     
-        for data_id, status in output_status.iteritems():
-            
-            new_output_status[data_id] = output_status[data_id]
-
-            if data_id in state_data_ids:
-                
-                if data_id in exectuted_outputs:
-                    
-                    new_output_status[data_id] = "overwritten"
-                    
-                else:
-                        
-                    new_output_status[data_id] = "satisfied"
+        state_data_ids = _get_state_data_ids(merged_state)
+        new_output_status = _get_output_status(output_declaration,
+                                               exectuted_outputs,
+                                               state_data_ids)
 
         return new_output_status
+    
+    def get_hub_status(self, pool,
+                             simulation,
+                             hub_id):
+        
+        """Get the input and output status of every interface in a hub,
+        walking the hub once. The status rules are the same as for
+        get_input_status and get_output_status.
+        
+        Returns:
+          tuple: input status and output status dictionaries for each
+            interface, keyed by interface name in sequenced order
+        
+        """
+        
+        log_msg = 'Getting status for hub "{}".'.format(hub_id)
+        module_logger.debug(log_msg)
+        
+        hub = simulation.get_hub(hub_id)
+        interface_cls_map = hub.get_interface_cls_map()
+        
+        merged_state = self.create_merged_state(simulation)
+        state_data_ids = _get_state_data_ids(merged_state)
+        
+        all_input_status = {}
+        all_output_status = {}
+        
+        # Inputs and outputs of preceding scheduled interfaces are
+        # overwritten
+        all_overwritten = set()
+        
+        for interface_cls_name in hub.get_scheduled_cls_names():
+            
+            interface_cls = interface_cls_map[interface_cls_name]
+            (input_declaration,
+             optional_inputs) = interface_cls.get_inputs()
+            output_declaration = interface_cls.get_outputs()
+            
+            all_inputs = self._get_active_inputs(pool,
+                                                 simulation,
+                                                 input_declaration,
+                                                 merged_state,
+                                                 interface_cls)
+            
+            if hub.force_completed:
+                input_status = {input_id: "unavailable" for
+                                                    input_id in all_inputs}
+            else:
+                input_status = _get_input_status(all_inputs,
+                                                 optional_inputs,
+                                                 all_overwritten,
+                                                 state_data_ids)
+            
+            # Outputs of interfaces yet to be completed in an ordered hub
+            # are unavailable
+            if hub.has_order:
+                
+                output_status = _get_output_status(output_declaration)
+                
+                all_overwritten.update(all_inputs)
+                all_overwritten.update(output_declaration)
+                
+            else:
+                
+                output_status = _get_output_status(output_declaration,
+                                                   None,
+                                                   state_data_ids)
+                
+            all_input_status[interface_cls_name] = input_status
+            all_output_status[interface_cls_name] = output_status
+        
+        # Outputs of later completed interfaces are executed outputs
+        exectuted_outputs = set()
+        
+        for interface_cls_name in reversed(hub.get_completed_cls_names()):
+            
+            interface_cls = interface_cls_map[interface_cls_name]
+            input_declaration, _ = interface_cls.get_inputs()
+            output_declaration = interface_cls.get_outputs()
+            
+            all_inputs = self._get_active_inputs(pool,
+                                                 simulation,
+                                                 input_declaration,
+                                                 merged_state,
+                                                 interface_cls)
+            
+            input_status = {input_id: "unavailable" for
+                                                    input_id in all_inputs}
+            output_status = _get_output_status(output_declaration,
+                                               exectuted_outputs,
+                                               state_data_ids)
+            
+            exectuted_outputs.update(output_declaration)
+            
+            all_input_status[interface_cls_name] = input_status
+            all_output_status[interface_cls_name] = output_status
+        
+        hub_input_status = OrderedDict()
+        hub_output_status = OrderedDict()
+        
+        for interface_cls_name, interface_cls in interface_cls_map.iteritems():
+            
+            interface_name = interface_cls.get_name()
+            
+            hub_input_status[interface_name] = \
+                                        all_input_status[interface_cls_name]
+            hub_output_status[interface_name] = \
+                                        all_output_status[interface_cls_name]
+        
+        return hub_input_status, hub_output_status
         
     def get_data_value(self, pool,
                              simulation,
@@ -1018,20 +1353,30 @@ class Controller(Loader):
                              level=None,
                              check_identity=False):        
 
-        if level is not None:
-            read_simulation = deepcopy(simulation)
-            self._mask_after_level(read_simulation,
-                                   level)
-        else:
-            read_simulation = simulation
-                                                       
+        if level is None:
+            
+            if (check_identity and
+                not self.has_data(simulation, data_identity)): return None
+            
+            data_value = super(Controller, self).get_data_value(pool,
+                                                                simulation,
+                                                                data_identity)
+            
+            return data_value
+        
+        log_msg = ('Retrieving data with identity "{}" at level '
+                   '"{}".').format(data_identity, level)
+        module_logger.debug(log_msg)
+        
+        level_view = simulation.get_level_view(level)
+        
         if (check_identity and
-            not self.has_data(read_simulation, data_identity)): return None
-                        
-        data_value = super(Controller, self).get_data_value(pool,
-                                                            read_simulation,
-                                                            data_identity)
-                                                            
+            not self._store.has_data(level_view, data_identity)): return None
+        
+        data_value = self._store.get_data_value(pool,
+                                                level_view,
+                                                data_identity)
+        
         return data_value
         
     def get_level_values(self, pool,
@@ -1040,30 +1385,46 @@ class Controller(Loader):
                                levels=None,
                                force_masks=None):
         
-        simulation_copy = deepcopy(simulation)
+        '''Return an ordered mapping of level to the value of the given
+        identifier, as found after masking all states following each level.
+        Levels with no data available are not included.'''
         
-        if levels is None: levels = OrderedSet(simulation.get_active_levels())
-                                                        
-        level_results = OrderedDict()
-                                                        
-        for level_key in levels:
+        bulk_values = self.get_bulk_level_values(pool,
+                                                 simulation,
+                                                 [data_identity],
+                                                 levels,
+                                                 force_masks)
+        
+        return bulk_values[data_identity]
+    
+    def get_bulk_level_values(self, pool,
+                                    simulation,
+                                    data_identities,
+                                    levels=None,
+                                    force_masks=None):
+        
+        '''Return an ordered mapping of identifier to the result of
+        get_level_values for each of the given identifiers. The level history
+        of the simulation is indexed once for all identifiers.'''
+        
+        level_history = simulation.get_level_history(force_masks)
+        bulk_indexes = level_history.get_bulk_indexes(data_identities,
+                                                      levels)
+        
+        bulk_values = OrderedDict()
+        
+        for data_identity, level_indexes in bulk_indexes.iteritems():
             
-            self._mask_after_level(simulation_copy,
-                                   level_key,
-                                   force_masks)
+            level_results = OrderedDict()
             
-            if not self.has_data(simulation_copy,
-                                 data_identity):
-                                     
-                continue
-                                
-            level_value = self.get_data_value(pool,
-                                              simulation_copy,
-                                              data_identity)
-                                              
-            level_results[level_key] = level_value
+            for level_key, data_index in level_indexes.iteritems():
+                
+                level_value = self._store.get_index_value(pool, data_index)
+                level_results[level_key] = level_value
+            
+            bulk_values[data_identity] = level_results
         
-        return level_results
+        return bulk_values
         
     def input_available(self, pool,
                               simulation,
@@ -1071,13 +1432,13 @@ class Controller(Loader):
                               interface_name,
                               check_id):
                                   
-        interface_obj = self.get_interface_obj(simulation,
+        interface_cls = self.get_interface_cls(simulation,
                                                hub_id,
                                                interface_name)
                                   
         result = super(Controller, self).input_available(pool,
                                                          simulation,
-                                                         interface_obj,
+                                                         interface_cls,
                                                          check_id)
 
         return result
@@ -1087,13 +1448,13 @@ class Controller(Loader):
                        hub_id,
                        interface_name):
                            
-        interface_obj = self.get_interface_obj(simulation,
+        interface_cls = self.get_interface_cls(simulation,
                                                hub_id,
                                                interface_name)
         
         result = super(Controller, self).can_load(pool,
                                                   simulation,
-                                                  interface_obj)
+                                                  interface_cls)
             
         return result
         
@@ -1199,37 +1560,6 @@ class Controller(Loader):
         new_simulation = old_simulation.stamp(new_simulation)
         
         return new_simulation
-    
-    def _mask_after_level(self, simulation, level, force_masks=None):
-                        
-        # Remove all existing masks
-        self.unmask_states(simulation,
-                           no_merge=True)
-            
-        # Mask all output states after the given level
-        self.mask_states(simulation,
-                         mask_after=level,
-                         no_merge=True)
-        
-        # If a list of masks to force are given, mask them and then try to
-        # unmask the original given level again.        
-        if force_masks is not None:
-            
-            for mask in force_masks:
-                           
-                self.mask_states(simulation,
-                                 search_str=mask,
-                                 no_merge=True)
-                                 
-            self.unmask_states(simulation,
-                               search_str=level,
-                               no_merge=True)
-                               
-        # Update the merged state stored in the simulation
-        merged_state = self._merge_active_states(simulation)
-        simulation.set_merged_state(merged_state)
-                                                      
-        return
 
 
 def _copy_sim_class(simulation,
@@ -1269,6 +1599,78 @@ def _copy_all_sim_states(simulation):
     return all_states
 
 
+def _get_interface_cls(interface):
+    
+    if isinstance(interface, type): return interface
+    
+    return type(interface)
+
+
+def _get_state_data_ids(merged_state):
+    
+    if merged_state is None: return None
+    
+    state_data_ids = set(merged_state.get_identifiers())
+    
+    return state_data_ids
+
+
+def _get_input_status(all_inputs,
+                      optional_inputs,
+                      all_overwritten,
+                      state_data_ids=None):
+    
+    input_status = {}
+    
+    for input_id in all_inputs:
+        
+        if input_id in all_overwritten:
+            
+            if input_id in optional_inputs:
+                status = "overwritten_option"
+            else:
+                status = "overwritten"
+        
+        # The variable is satisfied if in the datastate
+        elif state_data_ids is not None and input_id in state_data_ids:
+            
+            status = "satisfied"
+            
+        elif input_id in optional_inputs:
+            
+            status = "optional"
+        
+        else:
+            
+            status = "required"
+        
+        input_status[input_id] = status
+    
+    return input_status
+
+
+def _get_output_status(output_declaration,
+                       exectuted_outputs=None,
+                       state_data_ids=None):
+    
+    if exectuted_outputs is None: exectuted_outputs = []
+    
+    output_status = {}
+    
+    for output_id in output_declaration:
+        
+        if state_data_ids is None or output_id not in state_data_ids:
+            status = "unavailable"
+        elif output_id in exectuted_outputs:
+            status = "overwritten"
+        else:
+            status = "satisfied"
+        
+        output_status[output_id] = status
+    
+    return output_status
+
+
 def _get_executed_outputs(completed_interfaces,
                           start_index,
                           end_index,
@@ -22,6 +22,8 @@ class Socket(Plugin):
 
         super(Socket, self).__init__()
         self._interface_classes = {}
+        self._revision = 0
+        self._variable_index = None
 
         return
 
@@ -34,31 +36,34 @@ class Socket(Plugin):
 
         cls_map = self._discover_plugins(package, super_cls, warn_import)
         self._interface_classes.update(cls_map)
+        self._revision += 1
 
         return
 
     def add_interface(self, interface_class):
 
         self._interface_classes[interface_class.__name__] = interface_class
+        self._revision += 1
 
         return
 
+    def get_revision(self):
+
+        '''Return a counter which is incremented whenever the discovered
+        interfaces change. Used to invalidate data derived from the
+        interfaces.'''
+
+        return self._revision
+
     def get_all_variables(self):
 
         '''Return a unique list of all valid variables available from the
         interfaces discovered.'''
 
-        all_vars = set()
-
-        # Work through the interfaces
-        for cls_name, cls_attr in self._interface_classes.iteritems():
-
-            inputs, _ =  cls_attr.get_inputs(True)
-            outputs = cls_attr.get_outputs()
+        providers, receivers = self._get_variable_index()
 
-            all_vars = set([])
-            all_vars = all_vars.union(set(inputs))
-            all_vars = all_vars.union(set(outputs))
+        all_vars = set(providers)
+        all_vars = all_vars.union(set(receivers))
 
         return list(all_vars)
 
@@ -69,16 +74,8 @@ class Socket(Plugin):
 
         Maybe this should output the interface types as well?'''
 
-        providing_interfaces = []
-
-        # Work through the interfaces
-        for cls_name, cls_attr in self._interface_classes.iteritems():
-
-            outputs = cls_attr.get_outputs()
-
-            if variable_id in outputs:
-
-                providing_interfaces.append(cls_name)
+        providers, _ = self._get_variable_index()
+        providing_interfaces = providers.get(variable_id, [])[:]
 
         return providing_interfaces
         
@@ -89,18 +86,30 @@ class Socket(Plugin):
 
         Maybe this should output the interface types as well?'''
 
-        receiving_interfaces = []
+        _, receivers = self._get_variable_index()
+        receiving_interfaces = receivers.get(variable_id, [])[:]
 
-        # Work through the interfaces
-        for cls_name, cls_attr in self._interface_classes.iteritems():
+        return receiving_interfaces
 
-            inputs, _ = cls_attr.get_inputs(True)
-                
-            for input_var in inputs:
-                
-                if variable_id == input_var:
-                    receiving_interfaces.append(cls_name)
-                    break
+    def get_bulk_providing_interfaces(self, variable_ids):
+
+        '''Return a dictionary of lists of interfaces which provide each of
+        the given variable identifiers as an output.'''
+
+        providers, _ = self._get_variable_index()
+        providing_interfaces = {var_id: providers.get(var_id, [])[:]
+                                                for var_id in variable_ids}
+
+        return providing_interfaces
+
+    def get_bulk_receiving_interfaces(self, variable_ids):
+
+        '''Return a dictionary of lists of interfaces that use each of the
+        given variable identifiers as an input.'''
+
+        _, receivers = self._get_variable_index()
+        receiving_interfaces = {var_id: receivers.get(var_id, [])[:]
+                                                for var_id in variable_ids}
 
         return receiving_interfaces
 
@@ -156,6 +165,41 @@ class Socket(Plugin):
             
         return names
         
+    def _get_variable_index(self):
+
+        '''Return dictionaries mapping variable identifiers to the
+        interfaces which provide them as outputs and receive them as inputs.
+        The index is built once for each change to the discovered
+        interfaces.'''
+
+        if (self._variable_index is not None and
+            self._variable_index[0] == self._revision):
+
+            return self._variable_index[1:]
+
+        log_msg = 'Indexing variables of {} interfaces'.format(
+                                                len(self._interface_classes))
+        module_logger.debug(log_msg)
+
+        providers = {}
+        receivers = {}
+
+        # Work through the interfaces
+        for cls_name, cls_attr in self._interface_classes.iteritems():
+
+            inputs, _ = cls_attr.get_inputs(True)
+            outputs = cls_attr.get_outputs()
+
+            for output_var in set(outputs):
+                providers.setdefault(output_var, []).append(cls_name)
+
+            for input_var in set(inputs):
+                receivers.setdefault(input_var, []).append(cls_name)
+
+        self._variable_index = (self._revision, providers, receivers)
+
+        return providers, receivers
+
     def _get_interface_class(self, interface_cls_name):
         
         cls_attr = self._interface_classes[interface_cls_name]
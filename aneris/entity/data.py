@@ -7,6 +7,7 @@ from copy import deepcopy
 from collections import OrderedDict, Sequence
 
 from ..utilities.identity import get_unique_id
+from ..utilities.misc import freeze_value
 
 class Frozen(object):
 
@@ -34,8 +35,14 @@ class Frozen(object):
 class MetaData(Frozen):
 
     '''Concrete MetaData class for storing metadata for a variable in memory.
-
+    
+    MetaData is immutable once initialised, including any lists or
+    dictionaries in its properties, so a single instance can be shared by
+    all users of a DataCatalog. Subclasses must set the default values of
+    their properties before calling this __init__ method.
     '''
+    
+    __locked = False
 
     def __init__(self, props_dict):
 
@@ -44,6 +51,7 @@ class MetaData(Frozen):
 
         self._freeze()
         self._set_properties(props_dict)
+        self._lock()
 
         return
 
@@ -67,9 +75,33 @@ class MetaData(Frozen):
         for key, value in props_dict.iteritems():
 
             private_key = "_{}".format(key)
-            setattr(self, private_key, value)
+            setattr(self, private_key, freeze_value(value))
 
         return
+    
+    def _lock(self):
+        
+        self.__locked = True
+        
+        return
+    
+    def __setattr__(self, key, value):
+        
+        if self.__locked:
+            msg = "Class '{}' is immutable".format(self.__class__.__name__)
+            raise AttributeError(msg)
+        
+        super(MetaData, self).__setattr__(key, value)
+        
+        return
+        
+    def __copy__(self):
+        
+        return self
+        
+    def __deepcopy__(self, *args):
+        
+        return self
 
 
 class DataCatalog(object):
@@ -79,11 +111,17 @@ class DataCatalog(object):
     entered data is validated against this catalog.
 
     The variable map links variable identifiers to metadata class objects.
+    
+    Indexes of the variables by the values of each metadata attribute are
+    built when the attribute is first filtered on, and are kept up to date
+    as metadata is added.
     '''
 
     def __init__(self):
 
         self._metadata_variable_map = OrderedDict()
+        self._attr_indexes = {}
+        self._var_positions = None
 
         return
 
@@ -95,11 +133,32 @@ class DataCatalog(object):
 
         return identities
 
+    def has_variable(self, variable_id):
+
+        '''Return True if the variable identifier is in the data catalog'''
+
+        return variable_id in self._metadata_variable_map
+
+    def get_missing_variables(self, variable_ids):
+
+        '''Return the given variable identifiers which are not in the data
+        catalog, in the order given and without duplicates'''
+
+        missing_ids = OrderedDict()
+
+        for variable_id in variable_ids:
+            if variable_id not in self._metadata_variable_map:
+                missing_ids[variable_id] = None
+
+        return missing_ids.keys()
+
     def set_metadata_maps(self, variable_map):
 
         '''Set the mapping of MetaData classes to the variable id'''
 
         self._metadata_variable_map = variable_map
+        self._attr_indexes = {}
+        self._var_positions = None
 
         return
 
@@ -120,6 +179,22 @@ class DataCatalog(object):
         '''Add a MetaData instance to the catalog'''
 
         var_key = metadata.identifier
+        
+        old_metadata = self._metadata_variable_map.get(var_key)
+        
+        for meta_attr, attr_index in self._attr_indexes.iteritems():
+            
+            if old_metadata is not None:
+                _remove_from_attr_index(attr_index,
+                                        meta_attr,
+                                        var_key,
+                                        old_metadata)
+            
+            _add_to_attr_index(attr_index, meta_attr, var_key, metadata)
+        
+        if (self._var_positions is not None and
+            var_key not in self._var_positions):
+            self._var_positions[var_key] = len(self._var_positions)
 
         self._metadata_variable_map[var_key] = metadata
 
@@ -127,7 +202,9 @@ class DataCatalog(object):
 
     def get_metadata(self, variable_id):
 
-        '''Get the MetaData for a given variable ID'''
+        '''Get the MetaData for a given variable ID. MetaData objects are
+        immutable, so the shared instance is returned. Other objects are
+        copied.'''
 
         try:
         
@@ -138,33 +215,184 @@ class DataCatalog(object):
             errStr = ("Metadata for variable {} not found in the data "
                       "catalog.").format(variable_id)
             raise KeyError(errStr)
+        
+        if isinstance(metadata, MetaData): return metadata
 
         return deepcopy(metadata)
         
     def filter_by_meta(self, meta_attr, value):
 
-        '''Get the MetaData with a given attribute and value'''
+        '''Get the MetaData with a given attribute and value. The MetaData
+        matches if the attribute equals the value or, if the attribute is a
+        sequence, contains it.'''
         
-        return_dict = OrderedDict()
+        return self.filter_by_meta_dict({meta_attr: value})
+    
+    def filter_by_meta_dict(self, meta_filters):
         
-        for var_id, meta in self._metadata_variable_map.iteritems():
-            
-            if not hasattr(meta, meta_attr): continue
-
-            meta_value = getattr(meta, meta_attr)
+        '''Get the MetaData matching all of the attribute and value pairs
+        in the meta_filters dictionary, as for filter_by_meta.'''
+        
+        var_ids = None
+        
+        for meta_attr, value in meta_filters.iteritems():
             
-            if meta_value is None: continue
+            attr_ids = self._get_attr_matches(meta_attr, value)
             
-            is_list = lambda x: (isinstance(x, Sequence) and
-                                 not isinstance(x, basestring))
+            if var_ids is None:
+                var_ids = attr_ids
+            else:
+                var_ids &= attr_ids
             
-            if ((is_list(meta_value) and value in meta_value) or
-                meta_value == value):
-                
-                return_dict[var_id] = meta
+            if not var_ids: break
+        
+        if var_ids is None: var_ids = set(self._metadata_variable_map)
+        
+        positions = self._get_var_positions()
+        return_dict = OrderedDict()
+        
+        for var_id in sorted(var_ids, key=positions.get):
+            return_dict[var_id] = self._metadata_variable_map[var_id]
                 
         return return_dict
+    
+    def _get_attr_matches(self, meta_attr, value):
+        
+        if meta_attr not in self._attr_indexes:
+            
+            attr_index = ({}, set(), set())
+            
+            for var_id, meta in self._metadata_variable_map.iteritems():
+                _add_to_attr_index(attr_index, meta_attr, var_id, meta)
+            
+            self._attr_indexes[meta_attr] = attr_index
         
+        value_map, unhashable_ids, mixed_ids = self._attr_indexes[meta_attr]
+        
+        # Values which can not be hashed can only match unhashable
+        # attributes, otherwise only lists with unhashable items are scanned
+        if _is_hashable(value):
+            var_ids = set(value_map.get(value, ()))
+            scan_ids = mixed_ids
+        else:
+            var_ids = set()
+            scan_ids = unhashable_ids
+        
+        for var_id in scan_ids:
+            
+            meta_value = getattr(self._metadata_variable_map[var_id],
+                                 meta_attr)
+            
+            if _is_meta_match(meta_value, value): var_ids.add(var_id)
+        
+        return var_ids
+    
+    def _get_var_positions(self):
+        
+        if self._var_positions is None:
+            self._var_positions = {var_id: i for i, var_id in
+                                enumerate(self._metadata_variable_map)}
+        
+        return self._var_positions
+    
+    def __setstate__(self, state):
+        
+        # Catalogs pickled before attribute indexes were added
+        state.setdefault("_attr_indexes", {})
+        state.setdefault("_var_positions", None)
+        self.__dict__.update(state)
+        
+        return
+        
+
+def _is_list(value):
+    
+    return isinstance(value, Sequence) and not isinstance(value, basestring)
+
+
+def _is_hashable(value):
+    
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    
+    return True
+
+
+def _is_meta_match(meta_value, value):
+    
+    if _is_list(meta_value) and value in meta_value: return True
+    
+    return meta_value == value
+
+
+def _get_attr_index_keys(meta_value):
+    
+    '''Return the keys under which a metadata attribute value is indexed,
+    whether the value is unhashable and whether it is a list with unhashable
+    items.'''
+    
+    keys = set()
+    unhashable = False
+    mixed = False
+    
+    if _is_hashable(meta_value):
+        keys.add(meta_value)
+    else:
+        unhashable = True
+    
+    if _is_list(meta_value):
+        
+        for item in meta_value:
+            
+            if _is_hashable(item):
+                keys.add(item)
+            else:
+                mixed = True
+    
+    return keys, unhashable, mixed
+
+
+def _add_to_attr_index(attr_index, meta_attr, var_id, metadata):
+    
+    meta_value = getattr(metadata, meta_attr, None)
+    if meta_value is None: return
+    
+    value_map, unhashable_ids, mixed_ids = attr_index
+    keys, unhashable, mixed = _get_attr_index_keys(meta_value)
+    
+    for key in keys:
+        value_map.setdefault(key, set()).add(var_id)
+    
+    if unhashable: unhashable_ids.add(var_id)
+    if mixed: mixed_ids.add(var_id)
+    
+    return
+
+
+def _remove_from_attr_index(attr_index, meta_attr, var_id, metadata):
+    
+    meta_value = getattr(metadata, meta_attr, None)
+    if meta_value is None: return
+    
+    value_map, unhashable_ids, mixed_ids = attr_index
+    keys, _, _ = _get_attr_index_keys(meta_value)
+    
+    for key in keys:
+        
+        key_ids = value_map.get(key)
+        if key_ids is None: continue
+        
+        key_ids.discard(var_id)
+        
+        if not key_ids: del value_map[key]
+    
+    unhashable_ids.discard(var_id)
+    mixed_ids.discard(var_id)
+    
+    return
+
 
 class DataPool(object):
     
@@ -177,23 +405,54 @@ class DataPool(object):
     
     The pool must track the number of links to each data object, so that
     only necessary copies are created.
+    
+    If the pool is content addressed, data added with a digest matching
+    existing data is not stored again and the index of the existing data is
+    returned instead. Links must still be created for the returned index.
+    
+    The pool records which indexes were added or replaced since they were
+    last serialised (the dirty indexes), the SerialBox and file path that
+    each clean index was last serialised to, and the same for indexes popped
+    since then. This allows only changed data to be saved again.
+    
+    A copy callback can be set, which is called with the pool before it is
+    deep copied. It is not copied or pickled with the pool.
     '''
     
-    def __init__(self):
+    def __init__(self, content_addressed=False):
         
         self._data_indexes = set()
         self._data = {}
         self._links = {}
+        self._content_addressed = content_addressed
+        self._digest_indexes = {}
+        self._index_digests = {}
+        self._dirty_indexes = set()
+        self._serial_records = {}
+        self._removed_records = {}
+        self._copy_callback = None
         
-    def add(self, data):
+    def is_content_addressed(self):
+        
+        return self._content_addressed
+        
+    def add(self, data, digest=None):
         
 #        print "\nadd:", self._data.keys()
 
+        if self._content_addressed and digest in self._digest_indexes:
+            return self._digest_indexes[digest]
+
         data_index = get_unique_id(self._data_indexes)
         
         self._data_indexes.add(data_index)
         self._data[data_index] = data
         self._links[data_index] = 0
+        self._dirty_indexes.add(data_index)
+        
+        if self._content_addressed and digest is not None:
+            self._digest_indexes[digest] = data_index
+            self._index_digests[data_index] = digest
         
         return data_index
         
@@ -205,6 +464,13 @@ class DataPool(object):
         
         return data
         
+    def get_digest(self, data_index):
+        
+        '''Return the content digest stored for the given index or None if
+        the data was added without one.'''
+        
+        return self._index_digests.get(data_index)
+        
     def copy(self, data_index):
         
 #        print "\ncopy:", self._data.keys()
@@ -217,12 +483,77 @@ class DataPool(object):
         
     def replace(self, data_index, data):
         
+        '''Replace the data stored at the given index. Any stored digest is
+        kept, so the replacement must hold equivalent content (for instance,
+        a SerialBox of the original data).'''
+        
 #        print "\nreplace:", self._data.keys()
 
         self._data[data_index] = data
+        self._dirty_indexes.add(data_index)
+        self._serial_records.pop(data_index, None)
         
         return
         
+    def set_serialised(self, data_index, serial_box, file_path):
+        
+        '''Replace the data stored at the given index with the SerialBox
+        it was serialised to, and mark the index as clean.'''
+        
+        self._data[data_index] = serial_box
+        self._dirty_indexes.discard(data_index)
+        self._serial_records[data_index] = (serial_box, file_path)
+        
+        return
+        
+    def set_deserialised(self, data_index, data, file_path):
+        
+        '''Replace the SerialBox stored at the given index with the data
+        it was deserialised to, and mark the index as clean.'''
+        
+        serial_box = self._data[data_index]
+        
+        self._data[data_index] = data
+        self._dirty_indexes.discard(data_index)
+        self._serial_records[data_index] = (serial_box, file_path)
+        
+        return
+        
+    def set_copy_callback(self, callback):
+        
+        '''Set a callable to be called with the pool before it is deep
+        copied, or remove it if callback is None.'''
+        
+        self._copy_callback = callback
+        
+        return
+        
+    def get_dirty_indexes(self):
+        
+        '''Return the indexes added or replaced since they were last
+        serialised.'''
+        
+        return set(self._dirty_indexes)
+        
+    def get_serial_record(self, data_index):
+        
+        '''Return the SerialBox and file path that a clean index was last
+        serialised to, or None if the index is dirty.'''
+        
+        if data_index in self._dirty_indexes: return None
+        
+        return self._serial_records.get(data_index)
+        
+    def pop_removed_records(self):
+        
+        '''Return and forget the SerialBox and file path that each index
+        popped since the last call was last serialised to.'''
+        
+        removed_records = self._removed_records
+        self._removed_records = {}
+        
+        return removed_records
+        
     def pop(self, data_index):
         
 #        print "\npop:", self._data.keys()
@@ -231,6 +562,15 @@ class DataPool(object):
         data = self._data.pop(data_index)
         self._links.pop(data_index)
         
+        digest = self._index_digests.pop(data_index, None)
+        if digest is not None: self._digest_indexes.pop(digest)
+        
+        self._dirty_indexes.discard(data_index)
+        serial_record = self._serial_records.pop(data_index, None)
+        
+        if serial_record is not None:
+            self._removed_records[data_index] = serial_record
+        
         return data
         
     def link(self, data_index):
@@ -281,6 +621,42 @@ class DataPool(object):
         
         return iter(self._data_indexes)
         
+    def __setstate__(self, state):
+        
+        # Pools pickled before content addressing was added
+        state.setdefault("_content_addressed", False)
+        state.setdefault("_digest_indexes", {})
+        state.setdefault("_index_digests", {})
+        
+        # Pools pickled before dirty tracking was added
+        if "_dirty_indexes" not in state:
+            state["_dirty_indexes"] = set(state["_data_indexes"])
+        
+        state.setdefault("_serial_records", {})
+        state.setdefault("_removed_records", {})
+        
+        self.__dict__.update(state)
+        self._copy_callback = None
+        
+        return
+        
+    def __getstate__(self):
+        
+        state = dict(self.__dict__)
+        state.pop("_copy_callback", None)
+        
+        return state
+        
+    def __deepcopy__(self, memo):
+        
+        if self._copy_callback is not None: self._copy_callback(self)
+        
+        new_pool = type(self).__new__(type(self))
+        memo[id(self)] = new_pool
+        new_pool.__setstate__(deepcopy(self.__getstate__(), memo))
+        
+        return new_pool
+        
 
 class BaseState(object):
     
@@ -427,12 +803,30 @@ class DataState(BaseState):
     Each data state can have a level which can be compared to other levels
     in the simulation or compared to datastates with the same level in
     other simulations.
+    
+    A version counter is increased whenever indexes are added or popped or
+    the mask is changed, so that indexes of the state can detect changes.
     '''
+    
+    # States pickled before versions were added start from zero
+    _version = 0
 
     def __init__(self, level=None, force_map=None):
 
         super(DataState, self).__init__(force_map, level)
         self._masked = False
+        self._version = 0
+        
+        return
+    
+    def get_version(self):
+        
+        return self._version
+    
+    def add_index(self, data_id, data_index):
+        
+        super(DataState, self).add_index(data_id, data_index)
+        self._version += 1
         
         return
         
@@ -445,12 +839,14 @@ class DataState(BaseState):
     def mask(self):
                 
         self._masked = True
+        self._version += 1
         
         return
         
     def unmask(self):
         
         self._masked = False
+        self._version += 1
         
         return
         
@@ -459,8 +855,11 @@ class DataState(BaseState):
         return self._masked
         
     def pop_index(self, data_id):
+        
+        data_index = self._data.pop(data_id)
+        self._version += 1
 
-        return self._data.pop(data_id)
+        return data_index
     
     def dump(self):
         
@@ -473,13 +872,15 @@ class DataState(BaseState):
 
 class Data(object):
 
-    '''Holds a unit of data in various formats.'''
+    '''Holds a unit of data in various formats. A digest of the content of
+    the data can be cached, as the data is not modified once stored.'''
 
-    def __init__(self, identifier, structure_name, data):
+    def __init__(self, identifier, structure_name, data, digest=None):
 
         self._id = identifier
         self._structure_name = structure_name
         self._data = data
+        self._digest = digest
 
         return
 
@@ -490,5 +891,26 @@ class Data(object):
     def get_structure_name(self):
         
         return self._structure_name
+    
+    def get_digest(self):
+        
+        '''Return the cached digest of the content, or None if it has not
+        been set.'''
+        
+        return self._digest
+    
+    def set_digest(self, digest):
+        
+        self._digest = digest
+        
+        return
+    
+    def __setstate__(self, state):
+        
+        # Data pickled before digests were cached
+        state.setdefault("_digest", None)
+        self.__dict__.update(state)
+        
+        return
 
 
@@ -120,22 +120,27 @@ class Hub(object):
           
          """
         
-        if interface_cls_name in self._scheduled_interface_map:
-            
-            obj = self._scheduled_interface_map[interface_cls_name]
-            
-        elif interface_cls_name in self._completed_interface_map:
-            
-            obj = self._completed_interface_map[interface_cls_name]
-            
-        else:
-            
-            errStr = ("Class {} not found in interface "
-                      "maps.").format(interface_cls_name)
-            raise KeyError(errStr)
+        obj = self._get_interface_obj(interface_cls_name)
         
         return deepcopy(obj)
         
+    def get_interface_cls(self, interface_cls_name):
+        
+        """Retrieve the class of an interface object, without copying the
+        object. Use for read-only queries of the interface declarations.
+        
+        Args:
+          interface_cls_name (str): The name of the interface class
+          
+        Returns:
+          aneris.boundary.interface.Interface subclass
+          
+         """
+        
+        obj = self._get_interface_obj(interface_cls_name)
+        
+        return type(obj)
+        
     def get_preceding_interfaces(self, interface_cls_name,
                                        ignore_completed=False):
                 
@@ -150,20 +155,42 @@ class Hub(object):
         
         else:
             
-            all_interfaces = self.get_interface_map()  
+            all_interfaces = self.get_interface_map()
+        
+        preceeding_interfaces = self._get_preceding_items(all_interfaces,
+                                                          interface_cls_name)
             
-        preceeding_interfaces = OrderedDict()
+        return preceeding_interfaces
+        
+    def get_preceding_cls_map(self, interface_cls_name,
+                                    ignore_completed=False):
+        
+        """Retrieve the classes of the interfaces preceding the given
+        interface, without copying any interface objects.
+          
+        Returns:
+          dict: aneris.boundary.interface.Interface subclasses keyed by their
+            class names
+          
+        """
+                
+        # If the hub has no ordering then return an empty dictionary
+        if not self.has_order:
             
-        if interface_cls_name in all_interfaces:
+            return {}
+        
+        elif ignore_completed:
+        
+            all_classes = self.get_scheduled_cls_map()  
+        
+        else:
             
-            interface_names = all_interfaces.keys()
-            interface_index = interface_names.index(interface_cls_name)
-
-            for i in interface_names[:interface_index]:
-                
-                preceeding_interfaces[i] = all_interfaces[i]
+            all_classes = self.get_interface_cls_map()
+        
+        preceeding_classes = self._get_preceding_items(all_classes,
+                                                       interface_cls_name)
             
-        return preceeding_interfaces
+        return preceeding_classes
         
     def get_upcoming_interfaces(self, interface_cls_name,
                                       ignore_sequenced=False):
@@ -248,6 +275,60 @@ class Hub(object):
         
         return unified_map
         
+    def get_scheduled_cls_map(self):
+        
+        """Retrieve the classes of all the scheduled (not completed)
+        interfaces in a dictionary, without copying any interface objects.
+          
+        Returns:
+          dict: aneris.boundary.interface.Interface subclasses keyed by their
+            class names
+          
+        """
+        
+        scheduled_cls_map = OrderedDict()
+        
+        for k, obj in self._scheduled_interface_map.iteritems():
+            scheduled_cls_map[k] = type(obj)
+        
+        return scheduled_cls_map
+        
+    def get_completed_cls_map(self):
+        
+        """Retrieve the classes of all the completed interfaces in a
+        dictionary, without copying any interface objects.
+          
+        Returns:
+          dict: aneris.boundary.interface.Interface subclasses keyed by their
+            class names
+          
+        """
+        
+        # Reverse the order
+        names = self.get_completed_cls_names()
+        completed_cls_map = OrderedDict()
+        
+        for k in names:
+            completed_cls_map[k] = type(self._completed_interface_map[k])
+        
+        return completed_cls_map
+        
+    def get_interface_cls_map(self):
+        
+        """Retrieve the classes of all the sequenced interfaces in a
+        dictionary, without copying any interface objects.
+          
+        Returns:
+          dict: aneris.boundary.interface.Interface subclasses keyed by their
+            class names
+          
+        """
+        
+        unified_cls_map = self.get_scheduled_cls_map()
+        unified_cls_map.update(self.get_completed_cls_map())
+        
+        return unified_cls_map
+        
     def get_next_scheduled(self):
         
         scheduled_keys = self._scheduled_interface_map.keys()
@@ -386,6 +467,40 @@ class Hub(object):
             
         return
 
+    def _get_interface_obj(self, interface_cls_name):
+        
+        if interface_cls_name in self._scheduled_interface_map:
+            
+            obj = self._scheduled_interface_map[interface_cls_name]
+            
+        elif interface_cls_name in self._completed_interface_map:
+            
+            obj = self._completed_interface_map[interface_cls_name]
+            
+        else:
+            
+            errStr = ("Class {} not found in interface "
+                      "maps.").format(interface_cls_name)
+            raise KeyError(errStr)
+        
+        return obj
+    
+    @classmethod
+    def _get_preceding_items(cls, all_items, interface_cls_name):
+            
+        preceeding_items = OrderedDict()
+            
+        if interface_cls_name in all_items:
+            
+            interface_names = all_items.keys()
+            interface_index = interface_names.index(interface_cls_name)
+
+            for i in interface_names[:interface_index]:
+                
+                preceeding_items[i] = all_items[i]
+            
+        return preceeding_items
+
     @classmethod
     def _last_dict_key(cls, ordered_dict):
         
@@ -9,12 +9,320 @@ import logging
 module_logger = logging.getLogger(__name__)
 
 from copy import deepcopy
+from collections import OrderedDict
+
+from .data import PseudoState
+from ..utilities.misc import OrderedSet
+
+class MergedIndex(object):
+    
+    '''Maintains the merged mapping of data identifiers to data indexes for
+    an ordered collection of states. A stack of contributing states is kept
+    for each identifier, so adding or removing a state only updates the
+    identifiers carried by that state. The last state in each stack provides
+    the data index and an index of None removes the identifier from the
+    merged map.
+    
+    The index assumes that its states are not changed while they are held.
+    The version and identifiers of each state are recorded when it is added,
+    so that it can still be removed after changing, and changes can be
+    detected by is_current, after which the index must be rebuilt.'''
+    
+    # Indexes pickled before versions were recorded are never current
+    _entries = None
+    
+    def __init__(self, states=None):
+        
+        self._stacks = {}
+        self._merged_map = {}
+        self._entries = []
+        
+        if states is None: return
+        
+        for state in states: self.push_state(state)
+        
+        return
+    
+    def push_state(self, state):
+        
+        '''Add a state above all other states in the index'''
+        
+        data_ids = state.get_identifiers()
+        self._entries.append((state, state.get_version(), data_ids))
+        
+        for data_id in data_ids:
+            
+            stack = self._stacks.setdefault(data_id, [])
+            stack.append(state)
+            self._update_identifier(data_id)
+        
+        return
+    
+    def insert_state(self, state, state_order):
+        
+        '''Add a state to the index at the position given by state_order, a
+        mapping of id(state) to a sortable position, which must include all
+        of the states in the index'''
+        
+        position = state_order[id(state)]
+        data_ids = state.get_identifiers()
+        self._entries.append((state, state.get_version(), data_ids))
+        
+        for data_id in data_ids:
+            
+            stack = self._stacks.setdefault(data_id, [])
+            i = len(stack)
+            
+            while i > 0 and state_order[id(stack[i - 1])] > position: i -= 1
+            
+            stack.insert(i, state)
+            self._update_identifier(data_id)
+        
+        return
+    
+    def remove_state(self, state):
+        
+        '''Remove a state from the index'''
+        
+        data_ids = state.get_identifiers()
+        entries = self._entries or []
+        
+        # Remove the identifiers recorded when the state was added, in case
+        # it has changed since
+        for i in xrange(len(entries) - 1, -1, -1):
+            
+            if entries[i][0] is state:
+                data_ids = entries[i][2]
+                del entries[i]
+                break
+        
+        for data_id in data_ids:
+            
+            if data_id not in self._stacks: continue
+            
+            stack = self._stacks[data_id]
+            
+            # Search from the top, as the last state is removed most often
+            for i in xrange(len(stack) - 1, -1, -1):
+                
+                if stack[i] is state:
+                    del stack[i]
+                    break
+            
+            if not stack: del self._stacks[data_id]
+            
+            self._update_identifier(data_id)
+        
+        return
+    
+    def mirror_map(self):
+        
+        return self._merged_map.copy()
+    
+    def is_current(self, states):
+        
+        '''Return True if the index holds exactly the given states, and none
+        of them have changed since they were added'''
+        
+        if self._entries is None: return False
+        if len(states) != len(self._entries): return False
+        
+        versions = {id(state): version for state, version, _ in self._entries}
+        
+        for state in states:
+            if versions.get(id(state)) != state.get_version(): return False
+        
+        return True
+    
+    def _update_identifier(self, data_id):
+        
+        data_index = None
+        
+        if data_id in self._stacks:
+            
+            state = self._stacks[data_id][-1]
+            
+            # States changed in place are caught by is_current
+            if state.has_index(data_id): data_index = state.get_index(data_id)
+        
+        if data_index is None:
+            self._merged_map.pop(data_id, None)
+        else:
+            self._merged_map[data_id] = data_index
+        
+        return
+
+
+class LevelHistory(object):
+    
+    '''Index of the data indexes held by a list of active states, built in
+    a single forward pass. For any level, the data index of an identifier is
+    given as it would be found in the merged state after masking all the
+    states following the last state of that level, without copying or
+    modifying the original states. States are not masked for levels which
+    are also redo levels. If force_masks is given, states with levels
+    matching any of the masks are also masked, unless their level matches
+    the requested level.
+    
+    Args:
+      active_states (list): The active DataState objects, in order
+      redo_levels (list): The levels of the redo states
+      force_masks (list, optional): Search strings for states which should
+        also be masked, unless they match the requested level
+    
+    '''
+    
+    def __init__(self, active_states,
+                       redo_levels,
+                       force_masks=None):
+        
+        self._levels = []
+        self._history = {}
+        self._redo_levels = set(redo_levels)
+        self._force_masks = force_masks
+        self._level_masks = {}
+        
+        for position, state in enumerate(active_states):
+            
+            self._levels.append(state.get_level())
+            
+            for data_id in state.get_identifiers():
+                
+                data_index = state.get_index(data_id)
+                history = self._history.setdefault(data_id, [])
+                history.append((position, data_index))
+        
+        return
+    
+    def get_levels(self):
+        
+        '''Return the unique levels of the active states, in order'''
+        
+        levels = OrderedSet(level for level in self._levels
+                                                    if level is not None)
+        
+        return levels
+    
+    def get_index(self, data_id, level):
+        
+        '''Return the data index of the identifier at the given level or
+        None if no data is available'''
+        
+        if data_id not in self._history: return None
+        
+        level_masks = self._get_level_masks(level)
+        
+        for position, data_index in reversed(self._history[data_id]):
+            
+            if level_masks[position]: continue
+            
+            return data_index
+        
+        return None
+    
+    def get_level_map(self, level):
+        
+        '''Return the mapping of identifier to data index for all the data
+        available at the given level'''
+        
+        level_map = {}
+        
+        for data_id in self._history:
+            
+            data_index = self.get_index(data_id, level)
+            
+            if data_index is None: continue
+            
+            level_map[data_id] = data_index
+        
+        return level_map
+    
+    def get_level_indexes(self, data_id, levels=None):
+        
+        '''Return an ordered mapping of level to data index for the given
+        identifier. Levels with no data available are not included.'''
+        
+        if levels is None: levels = self.get_levels()
+        
+        level_indexes = OrderedDict()
+        
+        for level in levels:
+            
+            data_index = self.get_index(data_id, level)
+            
+            if data_index is None: continue
+            
+            level_indexes[level] = data_index
+        
+        return level_indexes
+    
+    def get_bulk_indexes(self, data_ids, levels=None):
+        
+        '''Return an ordered mapping of identifier to the result of
+        get_level_indexes for each of the given identifiers'''
+        
+        if levels is None: levels = self.get_levels()
+        
+        bulk_indexes = OrderedDict()
+        
+        for data_id in data_ids:
+            bulk_indexes[data_id] = self.get_level_indexes(data_id, levels)
+        
+        return bulk_indexes
+    
+    def _get_level_masks(self, level):
+        
+        if level not in self._level_masks:
+            self._level_masks[level] = self._make_level_masks(level)
+        
+        return self._level_masks[level]
+    
+    def _make_level_masks(self, level):
+        
+        # Without a level all states are masked, unless forced masks are
+        # given, in which case all states are unmasked again.
+        if level is None:
+            masked = self._force_masks is None
+            return [masked] * len(self._levels)
+        
+        # Mask the states after the last appearance of the level, unless the
+        # level also appears in the redo states
+        mask_after_position = None
+        
+        if level not in self._redo_levels and level in self._levels:
+            mask_after_position = len(self._levels) - 1 - \
+                                        self._levels[::-1].index(level)
+        
+        level_masks = []
+        
+        for position, state_level in enumerate(self._levels):
+            
+            masked = (mask_after_position is not None and
+                      position > mask_after_position)
+            
+            # Forced masks are applied and then states matching the level
+            # are unmasked
+            if self._force_masks is not None and state_level is not None:
+                
+                if any(mask in state_level for mask in self._force_masks):
+                    masked = True
+                
+                if level.lower() in state_level: masked = False
+            
+            level_masks.append(masked)
+        
+        return level_masks
+
 
 class Simulation(object):
     
     '''The main class is the simulation which holds all of the information
     about the system.'''
     
+    # Simulations pickled before the merged index was added will rebuild it
+    # on first use
+    _merged_index = None
+    
     def __init__(self, title=None):
         
         self._title = title
@@ -22,6 +330,7 @@ class Simulation(object):
         self._active_states = []
         self._redo_states = []
         self._merged_state = None
+        self._merged_index = MergedIndex()
         
         log_msg = 'Created new Simulation'
         if title is not None: log_msg += ' with title "{}"'.format(title)
@@ -63,6 +372,53 @@ class Simulation(object):
         
         return self._merged_state
     
+    def mirror_merged_map(self):
+        
+        '''Return the merged mapping of data identifiers to data indexes for
+        the unmasked active states. Later states take precedence and
+        identifiers with an index of None are removed.'''
+        
+        merged_index = self._get_merged_index()
+        
+        return merged_index.mirror_map()
+    
+    def get_level_history(self, force_masks=None):
+        
+        '''Return a LevelHistory of the active states, for retrieving the
+        data indexes available at each level'''
+        
+        # Copy the state lists in case they are modified during indexing
+        active_states = self._active_states[:]
+        redo_levels = [state.get_level() for state in self._redo_states[:]]
+        level_history = LevelHistory(active_states,
+                                     redo_levels,
+                                     force_masks)
+        
+        return level_history
+    
+    def get_level_view(self, level, force_masks=None):
+        
+        '''Return a read-only PseudoState holding the data available at the
+        given level, as found after masking all states following the level.
+        The simulation is not copied and the masks of its states are not
+        modified.'''
+        
+        level_history = self.get_level_history(force_masks)
+        level_map = level_history.get_level_map(level)
+        level_view = PseudoState(level_map, level)
+        
+        return level_view
+    
+    def reset_merged_index(self):
+        
+        '''Discard the merged index, so that it is rebuilt from the active
+        states when next required. Must be called if the active states are
+        replaced directly.'''
+        
+        self._merged_index = None
+        
+        return
+    
     def mirror_active_states(self):
         
         """This is a dangerous action if the datastates are stored without
@@ -89,18 +445,36 @@ class Simulation(object):
         
         return state_count
     
+    def count_active_states(self):
+        
+        '''Count the number of active datastates in the simulation'''
+        
+        return len(self._active_states)
+    
     def add_state(self, datastate,
                         overwrite=False):
         
-        '''Add a datastate to the simulation'''
+        '''Add a datastate to the simulation. Active states which are
+        changed in place, rather than through the methods of the simulation,
+        cause the merged index to be rebuilt when it is next used, so callers
+        which change many states should call reset_merged_index instead.'''
+        
+        merged_index = self._merged_index
         
         if overwrite:
             
+            old_state = self._active_states[-1]
             self._active_states[-1] = datastate
             
+            if merged_index is not None and not old_state.ismasked():
+                merged_index.remove_state(old_state)
+            
         else:
         
             self._active_states.append(datastate)
+        
+        if merged_index is not None and not datastate.ismasked():
+            merged_index.push_state(datastate)
             
         # Reset the redo list and return the removed list
         removed_states = self._redo_states[:]
@@ -137,6 +511,13 @@ class Simulation(object):
             redo_start = 0
             
         mask_count = 0
+        
+        # Record the unmasked active states for updating the merged index
+        if self._merged_index is not None:
+            unmasked_states = [state for state in self._active_states
+                                                if not state.ismasked()]
+        else:
+            unmasked_states = []
             
         if active_observed and not redo_observed and active_start is not None:                                                
         
@@ -165,6 +546,9 @@ class Simulation(object):
                                                   list_reversed=True)
                                                 
             mask_count += local_count
+        
+        for state in unmasked_states:
+            if state.ismasked(): self._merged_index.remove_state(state)
 
         if mask_count > 0: self._merged_state = None
         
@@ -176,6 +560,7 @@ class Simulation(object):
         otherwise unmask all states'''
         
         unmask_count = 0
+        unmasked_states = []
         
         for state in self._active_states:
             
@@ -196,6 +581,7 @@ class Simulation(object):
                                    
                 state.unmask()
                 unmask_count += 1
+                unmasked_states.append(state)
                 
         for state in self._redo_states:
             
@@ -217,6 +603,14 @@ class Simulation(object):
                 state.unmask()
                 unmask_count += 1
                 
+        if unmasked_states and self._merged_index is not None:
+            
+            state_order = {id(state): i
+                                for i, state in enumerate(self._active_states)}
+            
+            for state in unmasked_states:
+                self._merged_index.insert_state(state, state_order)
+                
         if unmask_count > 0: self._merged_state = None
         
         return unmask_count
@@ -247,7 +641,10 @@ class Simulation(object):
         
         last_state = self._active_states.pop()
         self._redo_states.append(last_state)
-        self._merged_state = None     
+        self._merged_state = None
+        
+        if self._merged_index is not None and not last_state.ismasked():
+            self._merged_index.remove_state(last_state)
         
         return
     
@@ -261,6 +658,9 @@ class Simulation(object):
         self._active_states.append(next_state)
         self._merged_state = None
         
+        if self._merged_index is not None and not next_state.ismasked():
+            self._merged_index.push_state(next_state)
+        
         return
     
     def clear_states(self):
@@ -268,6 +668,7 @@ class Simulation(object):
         self._active_states = []
         self._redo_states = []
         self._merged_state = None
+        self._merged_index = MergedIndex()
         
         return
     
@@ -317,6 +718,18 @@ class Simulation(object):
         
         return simulation
     
+    def _get_merged_index(self):
+        
+        unmasked_states = [state for state in self._active_states
+                                                if not state.ismasked()]
+        
+        # Rebuild the index if states were changed in place
+        if (self._merged_index is None or
+            not self._merged_index.is_current(unmasked_states)):
+            self._merged_index = MergedIndex(unmasked_states)
+        
+        return self._merged_index
+    
     def _get_start_index(self,
                          state_list,
                          mask_after,
@@ -41,16 +41,18 @@ def get_variable_network(controller,
         optional_records = []
         output_records = []
     
-        interface_obj = controller.get_interface_obj(simulation,
+        interface_cls = controller.get_interface_cls(simulation,
                                                      hub_id,
                                                      interface_name)
         
         (input_declaration,
-         optional_inputs) = interface_obj.get_inputs()
+         optional_inputs) = interface_cls.get_inputs()
         
-        all_inputs = controller._get_active_inputs(pool,
-                                                   simulation,
-                                                   input_declaration)
+        all_inputs = controller._get_active_inputs(
+                                        pool,
+                                        simulation,
+                                        input_declaration,
+                                        interface_cls=interface_cls)
                                                                                           
         for var_id in all_inputs:
             
@@ -118,7 +120,7 @@ def get_variable_network(controller,
                                              interface_name,
                                              var_id))
                                         
-        all_outputs = interface_obj.get_outputs()
+        all_outputs = interface_cls.get_outputs()
         
         for var_id in all_outputs:
             
@@ -179,14 +181,14 @@ def get_interface_variables(controller,
                             hub_id,
                             interface_name):
 
-    interface_obj = controller.get_interface_obj(simulation,
+    interface_cls = controller.get_interface_cls(simulation,
                                                  hub_id,
                                                  interface_name)
     
     (input_declaration,
-     optional_inputs) = interface_obj.get_inputs(True)
+     optional_inputs) = interface_cls.get_inputs(True)
     
-    all_outputs = interface_obj.get_outputs()
+    all_outputs = interface_cls.get_outputs()
     
     inputs_raw = {"variable id": [],
                   "variable name": [],
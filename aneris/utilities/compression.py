@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Compression codecs for serialised data files.
+
+Each codec is provided by a standard library module which reads and writes
+compressed files as streams, so that values can be pickled into and out of
+them without holding the whole compressed payload in memory. The zlib codec
+uses the gzip file format. The lzma codec is only available if the lzma
+module, or its backport for Python 2, is installed.
+"""
+
+import bz2
+import gzip
+from collections import OrderedDict
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+CODEC_EXTENSIONS = OrderedDict([("zlib", ".gz"),
+                                ("bz2", ".bz2"),
+                                ("lzma", ".xz")])
+
+
+def get_codecs():
+
+    '''Return the names of the codecs available in this environment.'''
+
+    codecs = [codec for codec in CODEC_EXTENSIONS
+                                    if codec != "lzma" or lzma is not None]
+
+    return codecs
+
+
+def get_extension(codec):
+
+    '''Return the file extension used for files compressed with the given
+    codec.'''
+
+    _check_codec(codec)
+
+    return CODEC_EXTENSIONS[codec]
+
+
+def infer_codec(file_path):
+
+    '''Return the codec used to compress the given file from its extension,
+    or None if the file is not compressed.'''
+
+    for codec, extension in CODEC_EXTENSIONS.iteritems():
+        if file_path.endswith(extension): return codec
+
+    return None
+
+
+def open_compressed(file_path, mode="rb", codec=None, fileobj=None):
+
+    '''Open a file for streaming through the given codec. If codec is None,
+    it is inferred from the file extension and uncompressed files are opened
+    as normal. If fileobj is given, the compressed stream is written to it
+    rather than to a new file, and file_path is only used to infer the codec
+    and to name the gzip header. File objects can only be used for
+    writing.'''
+
+    if codec is None: codec = infer_codec(file_path)
+
+    if fileobj is not None and "r" in mode:
+
+        errStr = "File objects can only be opened for writing"
+        raise ValueError(errStr)
+
+    if codec is None:
+        if fileobj is not None: return fileobj
+        return open(file_path, mode)
+
+    _check_codec(codec)
+
+    if codec == "zlib":
+        fstream = gzip.GzipFile(file_path,
+                                mode,
+                                compresslevel=6,
+                                fileobj=fileobj)
+    elif codec == "bz2":
+        if fileobj is None:
+            fstream = bz2.BZ2File(file_path, mode)
+        else:
+            fstream = _BZ2Writer(fileobj)
+    elif fileobj is None:
+        fstream = lzma.LZMAFile(file_path, mode)
+    else:
+        fstream = lzma.LZMAFile(fileobj, mode)
+
+    return fstream
+
+
+class _BZ2Writer(object):
+
+    '''Compress a stream into a file object in bz2 format, as
+    bz2.BZ2File can not write to file objects in Python 2.'''
+
+    def __init__(self, fileobj):
+
+        self._fileobj = fileobj
+        self._compressor = bz2.BZ2Compressor()
+
+        return
+
+    def write(self, data):
+
+        compressed = self._compressor.compress(data)
+        if compressed: self._fileobj.write(compressed)
+
+        return
+
+    def close(self):
+
+        if self._compressor is None: return
+
+        self._fileobj.write(self._compressor.flush())
+        self._compressor = None
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+        return
+
+
+def _check_codec(codec):
+
+    if codec not in CODEC_EXTENSIONS:
+
+        errStr = ("Codec '{}' is not recognised. Valid codecs are: "
+                  "{}").format(codec, ", ".join(CODEC_EXTENSIONS))
+        raise ValueError(errStr)
+
+    if codec not in get_codecs():
+
+        errStr = ("Codec '{}' is not available. Install the lzma module "
+                  "or backports.lzma to enable it").format(codec)
+        raise ValueError(errStr)
+
+    return
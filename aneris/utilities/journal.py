@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Delta encoded journals for storing a sequence of state dumps in a single
+JSON file.
+
+The first state in a journal is stored in full. Each following state is
+stored as the identifiers added or changed, and the identifiers removed,
+relative to the state before it, along with its type, level and mask. The
+entries must therefore be decoded in order, which is done when the journal
+is read.
+"""
+
+import json
+
+JOURNAL_FORMAT = "aneris-state-journal"
+JOURNAL_VERSION = 1
+
+
+class JournalWriter(object):
+
+    '''Append state dumps to a journal, which is written when closed.'''
+
+    def __init__(self, file_path):
+
+        self.file_path = file_path
+        self._fstream = open(file_path, "wb")
+        self._entries = []
+        self._last_data = None
+
+        return
+
+    def append(self, dump_dict):
+
+        '''Append a state dump, as returned by the dump method of the
+        states, returning its entry number.'''
+
+        entry = {key: value for key, value in dump_dict.iteritems()
+                                                            if key != "data"}
+        data = dump_dict["data"]
+
+        if self._last_data is None:
+
+            entry["data"] = dict(data)
+
+        else:
+
+            entry["set"] = {data_id: data_index
+                                for data_id, data_index in data.iteritems()
+                                    if data_id not in self._last_data or
+                                    self._last_data[data_id] != data_index}
+            entry["remove"] = [data_id for data_id in self._last_data
+                                                    if data_id not in data]
+
+        self._entries.append(entry)
+        self._last_data = dict(data)
+
+        return len(self._entries) - 1
+
+    def close(self):
+
+        if self._fstream.closed: return
+
+        journal_dict = {"format": JOURNAL_FORMAT,
+                        "version": JOURNAL_VERSION,
+                        "entries": self._entries}
+
+        try:
+            json.dump(journal_dict, self._fstream)
+        finally:
+            self._fstream.close()
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+        return
+
+
+def read_journal(file_path):
+
+    '''Return the list of state dumps stored in a journal, in the order
+    they were appended.'''
+
+    with open(file_path, 'rb') as json_file:
+        journal_dict = json.load(json_file)
+
+    if (journal_dict.get("format") != JOURNAL_FORMAT or
+        journal_dict.get("version") != JOURNAL_VERSION):
+
+        errStr = "File {} is not a supported state journal".format(file_path)
+        raise IOError(errStr)
+
+    dump_dicts = []
+    data = None
+
+    for entry in journal_dict["entries"]:
+
+        if "data" in entry:
+
+            data = dict(entry["data"])
+
+        elif data is None:
+
+            errStr = ("First entry of state journal {} is not stored in "
+                      "full").format(file_path)
+            raise IOError(errStr)
+
+        else:
+
+            data = dict(data)
+            data.update(entry["set"])
+            for data_id in entry["remove"]: data.pop(data_id)
+
+        dump_dict = {key: value for key, value in entry.iteritems()
+                                    if key not in ("data", "set", "remove")}
+        dump_dict["data"] = data
+
+        dump_dicts.append(dump_dict)
+
+    return dump_dicts
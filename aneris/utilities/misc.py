@@ -120,6 +120,75 @@ class OrderedSet(MutableSet):
         return set(self) == set(other)
 
 
+def _immutable(self, *args, **kwargs):
+    
+    msg = "Class '{}' is immutable".format(self.__class__.__name__)
+    raise TypeError(msg)
+
+
+class FrozenList(list):
+    
+    '''List which can not be altered after initialisation. As it can not
+    change, copies return the same object.'''
+    
+    append = extend = insert = remove = pop = reverse = sort = _immutable
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _immutable
+    __iadd__ = __imul__ = _immutable
+    
+    def __reduce__(self):
+        
+        return (self.__class__, (list(self),))
+    
+    def __copy__(self):
+        
+        return self
+        
+    def __deepcopy__(self, *args):
+        
+        return self
+
+
+class FrozenDict(dict):
+    
+    '''Dictionary which can not be altered after initialisation. As it can
+    not change, copies return the same object.'''
+    
+    clear = pop = popitem = setdefault = update = _immutable
+    __setitem__ = __delitem__ = _immutable
+    
+    def __reduce__(self):
+        
+        return (self.__class__, (dict(self),))
+    
+    def __copy__(self):
+        
+        return self
+        
+    def __deepcopy__(self, *args):
+        
+        return self
+
+
+def freeze_value(value):
+    
+    '''Return an immutable equivalent of the given value, converting lists
+    and dictionaries, including those nested in tuples, lists and
+    dictionaries, to FrozenList and FrozenDict objects.'''
+    
+    if isinstance(value, (FrozenList, FrozenDict)): return value
+    
+    if isinstance(value, list):
+        return FrozenList(freeze_value(x) for x in value)
+    
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze_value(v)) for k, v in value.iteritems())
+    
+    if type(value) is tuple:
+        return tuple(freeze_value(x) for x in value)
+    
+    return value
+
+
 def safe_update(dst_dict, src_dict, allow_none=False):
     
     '''Update the dst_dict using the src_dict, but only the keys contained
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only pack files for storing many serialised payloads in a single
+file.
+
+Each record in a pack file is a fixed size header, followed by a key and a
+payload. The header holds a marker and the lengths of the key and payload,
+so that the records can be indexed by scanning the file. Payloads are read
+back using the offset and length returned when they were appended, through
+a memory map of the file.
+"""
+
+import os
+import uuid
+import mmap
+import struct
+import tempfile
+import weakref
+import threading
+from collections import OrderedDict
+
+RECORD_MARKER = b"ANPK"
+RECORD_HEADER = struct.Struct("<4sHQ")
+
+# Open readers, which are closed before their pack file is replaced
+_open_readers = weakref.WeakSet()
+_readers_lock = threading.Lock()
+
+
+class PackWriter(object):
+
+    '''Append records to a pack file, creating it if necessary. If truncate
+    is True, the records are written to a new file which replaces the pack
+    file when the writer is closed, so that the payloads of the old file
+    remain readable until then.'''
+
+    def __init__(self, file_path, truncate=False):
+
+        self.file_path = file_path
+
+        if truncate:
+            pack_dir = os.path.dirname(os.path.abspath(file_path))
+            fd, self._write_path = tempfile.mkstemp(suffix=".tmp",
+                                                    dir=pack_dir)
+            self._fstream = os.fdopen(fd, "wb")
+        else:
+            self._write_path = file_path
+            self._fstream = open(file_path, "ab")
+
+        return
+
+    def append(self, key, payload):
+
+        '''Append a payload to the pack, returning its offset and length.'''
+
+        key_bytes = key.encode("utf-8")
+        header = RECORD_HEADER.pack(RECORD_MARKER,
+                                    len(key_bytes),
+                                    len(payload))
+
+        self._fstream.seek(0, os.SEEK_END)
+        record_offset = self._fstream.tell()
+
+        self._fstream.write(header)
+        self._fstream.write(key_bytes)
+        self._fstream.write(payload)
+
+        offset = record_offset + RECORD_HEADER.size + len(key_bytes)
+
+        return offset, len(payload)
+
+    def close(self):
+
+        if self._fstream.closed: return
+
+        self._fstream.close()
+
+        if self._write_path != self.file_path:
+            _replace_file(self._write_path, self.file_path)
+
+        return
+
+    def discard(self):
+
+        '''Close the writer, leaving the pack file unchanged if it was to
+        be truncated.'''
+
+        if self._fstream.closed: return
+
+        self._fstream.close()
+
+        if self._write_path != self.file_path: os.remove(self._write_path)
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+        return
+
+
+class PackReader(object):
+
+    '''Read records from a pack file through a memory map. Readers are
+    closed if their pack file is replaced by a PackWriter.'''
+
+    def __init__(self, file_path):
+
+        self.file_path = file_path
+        self._fstream = open(file_path, "rb")
+
+        if os.path.getsize(file_path) > 0:
+            self._map = mmap.mmap(self._fstream.fileno(),
+                                  0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self._map = None
+
+        with _readers_lock:
+            _open_readers.add(self)
+
+        return
+
+    @property
+    def closed(self):
+
+        return self._fstream.closed
+
+    def read(self, offset, length):
+
+        '''Return the payload stored at the given offset.'''
+
+        if self.closed:
+
+            errStr = "Reader of pack file {} is closed".format(self.file_path)
+            raise IOError(errStr)
+
+        if self._map is None or offset + length > len(self._map):
+
+            errStr = ("Payload at offset {} with length {} is outside of "
+                      "pack file {}").format(offset, length, self.file_path)
+            raise IOError(errStr)
+
+        payload = self._map[offset:offset + length]
+
+        return payload
+
+    def get_index(self):
+
+        '''Return an ordered dictionary of (offset, length) tuples for the
+        payloads in the pack, keyed by their keys. If a key was appended more
+        than once the last payload is given.'''
+
+        index = OrderedDict()
+
+        if self._map is None: return index
+
+        record_offset = 0
+        pack_size = len(self._map)
+
+        while record_offset < pack_size:
+
+            header_end = record_offset + RECORD_HEADER.size
+
+            if header_end > pack_size:
+
+                errStr = ("Truncated record found at offset {} of pack "
+                          "file {}").format(record_offset, self.file_path)
+                raise IOError(errStr)
+
+            (marker,
+             key_length,
+             length) = RECORD_HEADER.unpack(
+                                    self._map[record_offset:header_end])
+
+            if marker != RECORD_MARKER:
+
+                errStr = ("Corrupt record found at offset {} of pack file "
+                          "{}").format(record_offset, self.file_path)
+                raise IOError(errStr)
+
+            key = self._map[header_end:header_end + key_length]
+            offset = header_end + key_length
+
+            index[key.decode("utf-8")] = (offset, length)
+
+            record_offset = offset + length
+
+        return index
+
+    def close(self):
+
+        if self._map is not None: self._map.close()
+        self._fstream.close()
+
+        with _readers_lock:
+            _open_readers.discard(self)
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+        return
+
+
+class PackReaderCache(object):
+
+    '''Read payloads from many pack files, opening and mapping each pack
+    once. The readers are kept until the cache is closed.
+
+    When pickled, for instance to send load tasks to worker processes, the
+    cache is unpickled as an empty cache which is shared by all copies of
+    it in the same process. The readers of such copies are closed when the
+    process exits. Readers closed as their pack file was replaced are
+    opened again.'''
+
+    def __init__(self, token=None):
+
+        if token is None: token = uuid.uuid4().hex
+
+        self._token = token
+        self._readers = {}
+        self._lock = threading.Lock()
+
+        return
+
+    def read(self, file_path, offset, length):
+
+        '''Return the payload stored at the given offset of a pack file.'''
+
+        file_path = os.path.abspath(file_path)
+
+        with self._lock:
+
+            reader = self._readers.get(file_path)
+
+            if reader is None or reader.closed:
+                reader = PackReader(file_path)
+                self._readers[file_path] = reader
+
+        return reader.read(offset, length)
+
+    def close(self):
+
+        with self._lock:
+
+            for reader in self._readers.itervalues():
+                reader.close()
+
+            self._readers = {}
+
+        return
+
+    def __reduce__(self):
+
+        return _get_process_cache, (self._token,)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+        return
+
+
+_process_caches = {}
+
+
+def _get_process_cache(token):
+
+    '''Return the PackReaderCache of this process with the given token,
+    creating it if necessary.'''
+
+    cache = _process_caches.get(token)
+
+    if cache is None:
+        cache = PackReaderCache(token)
+        _process_caches[token] = cache
+
+    return cache
+
+
+def _replace_file(temp_path, dst_path):
+
+    '''Move a file to dst_path, replacing any existing file there. Open
+    readers of the existing file are closed first, as mapped files can not
+    be removed on Windows.'''
+
+    _close_readers(dst_path)
+
+    if os.path.isfile(dst_path) and os.name == "nt": os.remove(dst_path)
+
+    os.rename(temp_path, dst_path)
+
+    return
+
+
+def _close_readers(file_path):
+
+    '''Close the open readers of a pack file in this process.'''
+
+    file_path = os.path.abspath(file_path)
+
+    with _readers_lock:
+        readers = [reader for reader in _open_readers
+                            if os.path.abspath(reader.file_path) == file_path]
+
+    for reader in readers: reader.close()
+
+    return
+
+
+def read_payload(file_path, offset, length):
+
+    '''Read a single payload from a pack file.'''
+
+    with PackReader(file_path) as reader:
+        payload = reader.read(offset, length)
+
+    return payload
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the compression codecs used by Structure.save_value.
+
+For a set of representative payloads, each available codec is used to save
+and load the value, and the write throughput, read throughput and
+compression ratio are reported. Throughputs are given in MB/s of pickled
+data. Run with:
+
+    python benchmarks/bench_codecs.py [repeats]
+"""
+
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from aneris.boundary.data import Structure
+from aneris.utilities.compression import get_codecs
+
+
+class BenchStructure(Structure):
+
+    def get_data(self, raw, meta_data):
+
+        return raw
+
+    def get_value(self, data):
+
+        return data
+
+
+def get_payloads():
+
+    '''Return representative payloads, keyed by name.'''
+
+    rng = np.random.RandomState(0)
+
+    # Gridded bathymetry with repeated depths
+    depths = np.round(rng.uniform(-50, -10, (50, 50)), 1)
+    bathymetry = pd.DataFrame({"x": np.repeat(np.arange(500.), 500),
+                               "y": np.tile(np.arange(500.), 500),
+                               "z": np.tile(depths.ravel(), 100)})
+
+    # Hourly time series with a periodic signal
+    index = pd.date_range("2000-01-01", periods=200000, freq="H")
+    signal = np.sin(np.arange(200000) * 2 * np.pi / 12.42).round(3)
+    time_series = pd.Series(signal, index=index)
+
+    # Incompressible random values
+    random = rng.standard_normal(500000)
+
+    payloads = [("bathymetry", bathymetry),
+                ("time series", time_series),
+                ("random", random)]
+
+    return payloads
+
+
+def bench_codec(structure, value, work_dir, repeats=3):
+
+    '''Return the best write and read times, and the file size, for saving
+    and loading the value.'''
+
+    root_path = os.path.join(work_dir, "bench")
+    write_time = read_time = None
+
+    for _ in xrange(repeats):
+
+        start = time.time()
+        file_path = structure.save_value(value, root_path)
+        elapsed = time.time() - start
+        write_time = elapsed if write_time is None else min(write_time,
+                                                            elapsed)
+
+        start = time.time()
+        structure.load_data(file_path)
+        elapsed = time.time() - start
+        read_time = elapsed if read_time is None else min(read_time, elapsed)
+
+        file_size = os.path.getsize(file_path)
+        os.remove(file_path)
+
+    return write_time, read_time, file_size
+
+
+def main(repeats=3):
+
+    structure = BenchStructure()
+    work_dir = tempfile.mkdtemp()
+    row = "{:<12} {:<6} {:>10} {:>10} {:>8}"
+
+    print(row.format("payload", "codec", "write MB/s", "read MB/s", "ratio"))
+
+    try:
+
+        for name, value in get_payloads():
+
+            size_mb = len(pickle.dumps(value, -1)) / 1e6
+
+            for codec in [None] + get_codecs():
+
+                structure.codec = codec
+                write_time, read_time, file_size = bench_codec(structure,
+                                                               value,
+                                                               work_dir,
+                                                               repeats)
+
+                print(row.format(name,
+                                 codec or "none",
+                                 "{:.1f}".format(size_mb / write_time),
+                                 "{:.1f}".format(size_mb / read_time),
+                                 "{:.2f}".format(size_mb * 1e6 / file_size)))
+
+    finally:
+
+        shutil.rmtree(work_dir)
+
+    return
+
+
+if __name__ == "__main__":
+
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    main(repeats)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark DataCatalog.get_metadata on large catalogs.
+
+The time to retrieve the metadata of every variable in a catalog of shared
+immutable MetaData objects is compared to deep copying equivalent mutable
+objects, as get_metadata did previously. Run with:
+
+    python benchmarks/bench_metadata.py [n_variables]
+"""
+
+import sys
+import time
+from copy import deepcopy
+
+from aneris.entity.data import DataCatalog, MetaData
+
+
+class BenchMetaData(MetaData):
+
+    def __init__(self, props_dict):
+
+        self._title = None
+        self._types = None
+        self._units = None
+        self._tables = None
+
+        super(BenchMetaData, self).__init__(props_dict)
+
+        return
+
+
+class LegacyMetaData(object):
+
+    '''Mutable equivalent of BenchMetaData.'''
+
+    def __init__(self, props_dict):
+
+        for key, value in props_dict.iteritems():
+            setattr(self, "_{}".format(key), deepcopy(value))
+
+        return
+
+
+def get_props(n_variables):
+
+    for i in xrange(n_variables):
+
+        yield {"identifier": "bench:variable:{}".format(i),
+               "structure": "TableData",
+               "title": "Variable {}".format(i),
+               "types": ["float", "int", "str"],
+               "units": ["m", "s", None],
+               "tables": ["table_{}".format(i % 10), "shared"]}
+
+
+def main(n_variables=10000):
+
+    catalog = DataCatalog()
+    legacy_map = {}
+
+    for props in get_props(n_variables):
+        catalog.add_metadata(BenchMetaData(props))
+        legacy_map[props["identifier"]] = LegacyMetaData(props)
+
+    var_ids = catalog.get_variable_identifiers()
+
+    start = time.time()
+    for var_id in var_ids: deepcopy(legacy_map[var_id])
+    legacy_time = time.time() - start
+
+    start = time.time()
+    for var_id in var_ids: catalog.get_metadata(var_id)
+    shared_time = time.time() - start
+
+    print("variables:          {}".format(n_variables))
+    print("deep copy (s):      {:.4f}".format(legacy_time))
+    print("shared (s):         {:.4f}".format(shared_time))
+    print("speed up:           {:.0f}x".format(legacy_time / shared_time))
+
+    return
+
+
+if __name__ == "__main__":
+
+    n_variables = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    main(n_variables)
@@ -114,6 +114,7 @@ setup(name='aneris',
                         'xlrd<2',
                         'xlwt'
                         ],
+      extras_require={'lzma': ['backports.lzma']},
       entry_points={
           'console_scripts':
               [
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains interfaces with masked and optional inputs, which
+mirror those of the demo module without requiring the dtocean_dummy
+package.
+
+Note:
+  The function decorators (such as "@classmethod", etc) must not be removed.
+
+.. module:: mask
+   :platform: Windows
+   :synopsis: Aneris interfaces with masked inputs for testing
+"""
+
+
+from aneris.boundary.interface import MapInterface, MaskVariable
+
+class MaskInterface(MapInterface):
+
+    '''Class of interfaces for the purposes of this test.
+    '''
+
+
+class MaskedTableInterface(MaskInterface):
+
+    '''Interface with inputs masked by a trigger variable, providing a table
+    of numbers.
+
+    '''
+
+    @classmethod
+    def get_name(cls):
+
+        return "Masked Table Interface"
+
+    @classmethod
+    def declare_inputs(cls):
+
+        '''Declare all the variables required as inputs by this interface.
+
+         Returns:
+            list: List of internal variables names required as inputs.
+
+        '''
+
+        input_list  =  [MaskVariable('demo:demo:low',
+                                     'trigger.bool',
+                                     [True]),
+                        MaskVariable('demo:demo:high',
+                                     'trigger.bool',
+                                     [True]),
+                        'demo:demo:rows'
+                        ]
+
+        return input_list
+
+    @classmethod
+    def declare_outputs(cls):
+
+        '''Declare all the variables provided as outputs by this interface.
+
+        Returns:
+            list: List of internal variables names provided as outputs.
+        '''
+
+        output_list =  ['demo:demo:table',
+                        ]
+
+        return output_list
+
+    @classmethod
+    def declare_optional(cls):
+
+        optional_list  =  ['demo:demo:low',
+                           'demo:demo:high',
+                          ]
+
+        return optional_list
+
+    @classmethod
+    def declare_id_map(cls):
+
+        id_map = {'low': 'demo:demo:low',
+                  'high': 'demo:demo:high',
+                  'rows': 'demo:demo:rows',
+                  'table': 'demo:demo:table'}
+
+        return id_map
+
+    def connect(self):
+
+        low = 0 if self.data.low is None else self.data.low
+        high = 1 if self.data.high is None else self.data.high
+        step = float(high - low) / max(self.data.rows, 1)
+
+        self.data.table = {"Random": [low + i * step
+                                          for i in range(self.data.rows)]}
+
+        return
+
+class MaskedLaterInterface(MaskInterface):
+
+    '''Interface to test outputs generated later than masked table
+    interface
+
+    '''
+
+    @classmethod
+    def get_name(cls):
+
+        return "Masked Later Interface"
+
+    @classmethod
+    def declare_inputs(cls):
+
+        input_list = ['demo:demo:rows']
+
+        return input_list
+
+    @classmethod
+    def declare_outputs(cls):
+
+        output_list =  ['demo:demo:table',
+                        ]
+
+        return output_list
+
+    @classmethod
+    def declare_optional(cls):
+
+        return None
+
+    @classmethod
+    def declare_id_map(cls):
+
+        id_map = {'rows': 'demo:demo:rows',
+                  'table': 'demo:demo:table'}
+
+        return id_map
+
+    def connect(self):
+
+        return
@@ -5,7 +5,17 @@ Created on Tue Sep 25 15:11:50 2018
 @author: Mathew Topper
 """
 
+import os
+import pickle
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
 from aneris.boundary.data import Structure
+from aneris.utilities.compression import get_codecs
 
 
 class ConcreteStructure(Structure):
@@ -19,6 +29,15 @@ class ConcreteStructure(Structure):
         return
 
 
+class MemoryMapStructure(ConcreteStructure):
+    
+    memory_map = True
+    
+    def get_value(self, data):
+        
+        return data
+
+
 def test_structure_load_data_importerror(monkeypatch):
     
     def mockerror(path):
@@ -50,3 +69,224 @@ def test_structure_not_equals():
     x = test.equals(1, 2)
     
     assert not x
+
+
+
+def test_structure_get_digest():
+    
+    test = ConcreteStructure()
+    
+    assert test.get_digest([1, 2]) == test.get_digest([1, 2])
+    assert test.get_digest([1, 2]) != test.get_digest([2, 1])
+
+
+def test_structure_get_digest_pickle():
+    
+    test = ConcreteStructure()
+    data = {"a": [1, 2], "b": "three"}
+    expected = hashlib.sha1(pickle.dumps(data, -1)).hexdigest()
+    
+    assert test.get_digest(data) == expected
+
+
+def test_structure_get_digest_array(tmpdir, monkeypatch):
+    
+    test = ConcreteStructure()
+    
+    value = np.arange(12.).reshape(3, 4)
+    file_path = str(tmpdir.join("value.npy"))
+    np.save(file_path, value)
+    mapped = np.load(file_path, mmap_mode="r")
+    
+    def no_dumps(*args, **kwargs):
+        raise AssertionError("Array was pickled")
+    
+    monkeypatch.setattr(pickle, "dumps", no_dumps)
+    monkeypatch.setattr(pickle.Pickler, "dump", no_dumps)
+    
+    digest = test.get_digest(value)
+    
+    assert test.get_digest(np.asfortranarray(value)) == digest
+    assert test.get_digest(mapped) == digest
+    assert test.get_digest(value.reshape(4, 3)) != digest
+    assert test.get_digest(value.astype(np.float32)) != digest
+
+
+def test_structure_load_value():
+    
+    test = ConcreteStructure()
+    payload = test.dump_value([1, 2])
+    
+    assert test.load_value(payload) is None
+    assert test.load_value(pickle.dumps([1, 2], -1)) == [1, 2]
+
+
+def test_structure_load_value_importerror(monkeypatch):
+    
+    def mockerror(payload):
+        raise ImportError
+    
+    def mockreturn(path):
+        return os.path.isfile(path)
+    
+    monkeypatch.setattr("pickle.loads", mockerror)
+    monkeypatch.setattr("pandas.read_pickle", mockreturn)
+    
+    test = ConcreteStructure()
+    x = test.load_value("payload")
+    
+    assert x
+
+
+def test_structure_save_value_array(tmpdir):
+    
+    test = MemoryMapStructure()
+    value = np.arange(12.).reshape(3, 4)
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(value, root_path)
+    
+    assert file_path == root_path + ".npy"
+    
+    x = test.load_data(file_path)
+    
+    assert isinstance(x, np.memmap)
+    assert not x.flags.writeable
+    assert (x == value).all()
+
+
+@pytest.mark.parametrize("value", [
+    pd.DataFrame({"a": [1., 2.], "b": [3., 4.]}, index=["x", "y"]),
+    pd.Series([1, 2, 3], name="test")])
+def test_structure_save_value_pandas(tmpdir, value):
+    
+    test = MemoryMapStructure()
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(value, root_path)
+    
+    assert file_path == root_path + ".npyd"
+    assert os.path.isdir(file_path)
+    
+    x = test.load_data(file_path)
+    
+    assert type(x) is type(value)
+    assert x.equals(value)
+    assert not x.values.flags.writeable
+
+
+@pytest.mark.parametrize("value", [
+    np.arange(12.).reshape(3, 4),
+    pd.DataFrame({"a": [1., 2.], "b": [3., 4.]}, index=["x", "y"])])
+def test_structure_save_value_mapped_twice(tmpdir, value):
+    
+    test = MemoryMapStructure()
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(value, root_path)
+    x = test.load_data(file_path)
+    
+    new_path = test.save_value(x, root_path)
+    
+    assert new_path != file_path
+    
+    y = test.load_data(new_path)
+    
+    assert (np.asarray(x) == np.asarray(value)).all()
+    assert (np.asarray(y) == np.asarray(value)).all()
+    assert os.listdir(str(tmpdir)) == [os.path.basename(new_path)]
+    
+    # The original path is used again once it is free
+    assert test.save_value(y, root_path) == file_path
+    assert os.listdir(str(tmpdir)) == [os.path.basename(file_path)]
+
+
+@pytest.mark.parametrize("value", [
+    np.arange(12.).reshape(3, 4),
+    pd.DataFrame({"a": [1., 2.], "b": [3., 4.]}, index=["x", "y"])])
+def test_structure_save_value_mapped_locked(tmpdir, monkeypatch, value):
+    
+    # Mapped files can not be removed on Windows
+    test = MemoryMapStructure()
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(value, root_path)
+    x = test.load_data(file_path)
+    
+    locked_paths = set([os.path.abspath(file_path)])
+    real_remove = os.remove
+    real_rmtree = shutil.rmtree
+    
+    def locked_remove(path):
+        if os.path.abspath(path) in locked_paths: raise OSError(path)
+        real_remove(path)
+    
+    def locked_rmtree(path, *args, **kwargs):
+        if os.path.abspath(path) in locked_paths: raise OSError(path)
+        real_rmtree(path, *args, **kwargs)
+    
+    monkeypatch.setattr(os, "remove", locked_remove)
+    monkeypatch.setattr(shutil, "rmtree", locked_rmtree)
+    
+    new_path = test.save_value(x, root_path)
+    y = test.load_data(new_path)
+    
+    assert new_path != file_path
+    assert (np.asarray(x) == np.asarray(value)).all()
+    assert (np.asarray(y) == np.asarray(value)).all()
+    assert sorted(os.listdir(str(tmpdir))) == sorted([
+                                            os.path.basename(file_path),
+                                            os.path.basename(new_path)])
+    
+    # The old file is removed by a later save, once it is released
+    del x
+    locked_paths.clear()
+    
+    other_path = test.save_value(value, os.path.join(str(tmpdir), "other"))
+    
+    assert sorted(os.listdir(str(tmpdir))) == sorted([
+                                            os.path.basename(new_path),
+                                            os.path.basename(other_path)])
+
+
+@pytest.mark.parametrize("value", [
+    np.array(["a", "b"]),
+    pd.DataFrame({"a": [1., 2.], "b": ["c", "d"]}),
+    [1, 2]])
+def test_structure_save_value_array_pickled(tmpdir, value):
+    
+    test = MemoryMapStructure()
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(value, root_path)
+    
+    assert file_path == root_path + ".pkl"
+
+
+def test_structure_save_value_no_memory_map(tmpdir):
+    
+    test = MemoryMapStructure()
+    test.memory_map = False
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(np.arange(3.), root_path)
+    
+    assert file_path == root_path + ".pkl"
+
+
+@pytest.mark.parametrize("codec", get_codecs())
+def test_structure_save_value_codec(tmpdir, codec):
+    
+    test = MemoryMapStructure()
+    test.memory_map = False
+    test.codec = codec
+    value = pd.Series(range(100))
+    root_path = os.path.join(str(tmpdir), "test")
+    
+    file_path = test.save_value(value, root_path)
+    
+    assert file_path.startswith(root_path + ".pkl.")
+    
+    x = test.load_data(file_path)
+    
+    assert x.equals(value)
@@ -8,12 +8,18 @@
 
 import os
 #import sys
+import time
 import shutil
 import pickle
+import threading
 from copy import deepcopy
 
+import numpy as np
+import pandas as pd
 import pytest
 
+import aneris.control.data
+from aneris.utilities import pack
 from aneris.boundary.data import SerialBox
 from aneris.control.data import (DataValidation,
                                  DataStorage,
@@ -23,6 +29,7 @@ from aneris.entity.data import DataCatalog, DataPool, DataState, Data
 #from polite.paths import user_data_dir, module_dir
 
 import data_plugins as data
+from data_plugins.definitions import Simple
 import user_plugins as user_data
 
 
@@ -80,6 +87,163 @@ def test_get_valid_variables():
 
     assert 'my:test:variable' in valid_vars
     
+def test_update_data_catalog_cache(tmpdir, mocker):
+
+    cache_path = str(tmpdir.join("catalog.pkl"))
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data,
+                                                    cache_path=cache_path)
+
+    assert os.path.isfile(cache_path)
+
+    spy = mocker.spy(validation, "obj_list_from_metadef_list")
+
+    cached = DataCatalog()
+    validation.update_data_catalog_from_definitions(cached,
+                                                    data,
+                                                    cache_path=cache_path)
+
+    assert not spy.called
+    assert cached.get_variable_identifiers() == \
+                                            catalog.get_variable_identifiers()
+
+    for var_id in catalog.get_variable_identifiers():
+        assert cached.get_metadata(var_id).name == \
+                                            catalog.get_metadata(var_id).name
+
+
+def test_update_data_catalog_cache_stale(tmpdir, mocker, monkeypatch):
+
+    cache_path = str(tmpdir.join("catalog.pkl"))
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data,
+                                                    cache_path=cache_path)
+
+    get_path_stamp = aneris.control.data._get_path_stamp
+    monkeypatch.setattr(aneris.control.data,
+                        "_get_path_stamp",
+                        lambda path: get_path_stamp(path)[:1] + (-1,))
+    spy = mocker.spy(validation, "obj_list_from_metadef_list")
+
+    rebuilt = DataCatalog()
+    validation.update_data_catalog_from_definitions(rebuilt,
+                                                    data,
+                                                    cache_path=cache_path)
+
+    assert spy.called
+    assert rebuilt.get_variable_identifiers() == \
+                                            catalog.get_variable_identifiers()
+
+    spy.reset_mock()
+
+    cached = DataCatalog()
+    validation.update_data_catalog_from_definitions(cached,
+                                                    data,
+                                                    cache_path=cache_path)
+
+    assert not spy.called
+
+
+def test_update_data_catalog_cache_corrupt(tmpdir):
+
+    cache_path = tmpdir.join("catalog.pkl")
+    cache_path.write("not a catalog")
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data,
+                                                    cache_path=str(cache_path))
+
+    assert 'my:test:variable' in catalog.get_variable_identifiers()
+    assert cache_path.read() != "not a catalog"
+
+    
+def test_update_data_catalog_workers():
+
+    validation = DataValidation(meta_cls=data.MyMetaData)
+
+    serial = DataCatalog()
+    validation.update_data_catalog_from_definitions(serial, data)
+
+    parallel = DataCatalog()
+    validation.update_data_catalog_from_definitions(parallel,
+                                                    data,
+                                                    workers=2)
+
+    assert parallel.get_variable_identifiers() == \
+                                            serial.get_variable_identifiers()
+
+    for var_id in serial.get_variable_identifiers():
+        assert parallel.get_metadata(var_id).name == \
+                                            serial.get_metadata(var_id).name
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_update_data_catalog_workers_override(tmpdir, mocker, workers):
+
+    yaml_template = ("---\n"
+                     "- identifier: 'my:test:variable'\n"
+                     "  name: '{}'\n"
+                     "  structure: 'UnitData'\n")
+    yaml_paths = []
+
+    for name in ["First", "Second", "Third"]:
+        yaml_path = tmpdir.join("{}.yaml".format(name))
+        yaml_path.write(yaml_template.format(name))
+        yaml_paths.append(str(yaml_path))
+
+    mocker.patch.object(data.testDefinition,
+                        "get_yaml_paths",
+                        return_value=yaml_paths)
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data,
+                                                    workers=workers)
+
+    assert catalog.get_metadata('my:test:variable').name == "Third"
+
+    
+def test_get_invalid_variables():
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+
+    all_vars = ['bad:variable:1', 'my:test:variable', 'bad:variable:2']
+    invalid_vars = DataStorage.get_invalid_variables(catalog, all_vars)
+
+    assert invalid_vars == ['bad:variable:1', 'bad:variable:2']
+    assert DataStorage.is_valid(catalog, 'my:test:variable')
+    assert not DataStorage.is_valid(catalog, 'bad:variable:1')
+
+
+def test_check_valid_variables():
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+
+    DataStorage.check_valid_variables(catalog, ['my:test:variable'])
+
+    with pytest.raises(ValueError) as excinfo:
+        DataStorage.check_valid_variables(catalog,
+                                          ['bad:variable:1',
+                                           'my:test:variable',
+                                           'bad:variable:2'])
+
+    assert 'bad:variable:1' in str(excinfo.value)
+    assert 'bad:variable:2' in str(excinfo.value)
+
+    
 def test_create_new_datastate():
     
     catalog = DataCatalog()
@@ -186,6 +350,67 @@ def test_remove_none_data_from_state():
     assert len(pool) == 0
 
 
+def test_create_new_data_content_addressed():
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool(content_addressed=True)
+    state = data_store.create_new_datastate("test")
+    other_state = data_store.create_new_datastate("other")
+
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    data_store.create_new_data(pool, other_state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    assert other_state.get_index("Technology:Common:DeviceType") == data_index
+    assert len(pool) == 1
+    assert pool._links[data_index] == 2
+    
+    data_store.create_new_data(pool, other_state, catalog, "Wave", metadata)
+    
+    assert other_state.get_index("Technology:Common:DeviceType") != data_index
+    assert len(pool) == 2
+    assert pool._links[data_index] == 1
+    
+    
+def test_remove_data_from_state_content_addressed():
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool(content_addressed=True)
+    state = data_store.create_new_datastate("test")
+    other_state = data_store.create_new_datastate("other")
+
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    data_store.create_new_data(pool, other_state, catalog, "Tidal", metadata)
+    data_store.remove_data_from_state(pool,
+                                      state,
+                                      "Technology:Common:DeviceType")
+    
+    assert len(pool) == 1
+    
+    data_store.remove_data_from_state(pool,
+                                      other_state,
+                                      "Technology:Common:DeviceType")
+    
+    assert len(pool) == 0
+    
+    # The digest of the removed data must be forgotten
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    assert len(pool) == 1
+    assert pool._links[data_index] == 1
+
 def test_copy_datastate():
     
     catalog = DataCatalog()
@@ -315,6 +540,73 @@ def test_import_datastate_from_new():
     assert pool._links[data_index] == 1
 
 
+@pytest.mark.parametrize("confirm_digest", [False, True])
+def test_import_datastate_digest(mocker, confirm_digest):
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = data_store.create_new_datastate("test")
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    structure = data_store.get_structure(metadata.structure)
+    structure.confirm_digest = confirm_digest
+    
+    src_pool = deepcopy(pool)
+    changed_pool = deepcopy(pool)
+    changed_pool.replace(data_index,
+                         Data("Technology:Common:DeviceType",
+                              metadata.structure,
+                              "Wave"))
+    
+    spy = mocker.spy(data_store, "_get_value")
+    
+    new_state = data_store.import_datastate(src_pool, pool, state)
+    
+    assert new_state.get_index("Technology:Common:DeviceType") == data_index
+    assert pool.get(data_index).get_digest() is not None
+    assert spy.call_count == (2 if confirm_digest else 0)
+    
+    spy.reset_mock()
+    
+    new_state = data_store.import_datastate(changed_pool, pool, state)
+    new_index = new_state.get_index("Technology:Common:DeviceType")
+    
+    assert new_index != data_index
+    assert pool.get(new_index)._data == "Wave"
+    assert spy.call_count == 0
+
+
+def test_deserialise_data_digest(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    digest = data_store._get_content_digest(pool.get(data_index))
+    
+    data_store.serialise_pool(pool, str(tmpdir))
+    
+    assert pool.get(data_index).load_dict["digest"] == digest
+    
+    data_store.deserialise_pool(catalog, pool)
+    
+    assert pool.get(data_index).get_digest() == digest
+
+
 def test_serialise_data(tmpdir):
 
     catalog = DataCatalog()
@@ -532,6 +824,43 @@ def test_deserialise_pool(tmpdir):
     assert new_data._data == "Tidal"
 
 
+@pytest.mark.parametrize("var_id, structure_name, raw", [
+    ("Technology:Common:DeviceType", "UnitData", np.arange(10.)),
+    ("demo:demo:table", "TableData", {"a": [1., 2.], "b": [3., 4.]})])
+def test_serialise_pool_memory_map_twice(tmpdir,
+                                         var_id,
+                                         structure_name,
+                                         raw):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    data_store.get_structure(structure_name).memory_map = True
+    
+    metadata = catalog.get_metadata(var_id)
+    data_store.create_new_data(pool, state, catalog, raw, metadata)
+    
+    data_index = state.get_index(var_id)
+    expected = data_store.get_data_value(pool, state, var_id)
+    
+    data_store.serialise_pool(pool, str(tmpdir))
+    data_store.deserialise_pool(catalog, pool)
+    data_store.serialise_pool(pool, str(tmpdir))
+    
+    data_box = pool.get(data_index)
+    
+    assert isinstance(data_box, SerialBox)
+    
+    data_store.deserialise_pool(catalog, pool)
+    value = data_store.get_data_value(pool, state, var_id)
+    
+    assert (np.asarray(value) == np.asarray(expected)).all()
+
+
 def test_deserialise_pool_warn_missing(tmpdir):
 
     catalog = DataCatalog()
@@ -589,6 +918,1039 @@ def test_deserialise_pool_warn_unpickle(tmpdir, mocker):
     assert True
 
 
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_serialise_pool_workers(tmpdir, use_processes):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave", "Tidal Fixed", "Wave Floating"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              workers=2,
+                              use_processes=use_processes)
+    
+    for data_index in data_indexes:
+        
+        data_box = pool.get(data_index)
+        
+        assert isinstance(data_box, SerialBox)
+        assert data_box.load_dict["file_path"].startswith(
+                                    os.path.join(str(tmpdir), data_index))
+    
+    data_store.deserialise_pool(catalog,
+                                pool,
+                                workers=2,
+                                use_processes=use_processes)
+    
+    for data_index, value in zip(data_indexes, values):
+        
+        new_data = pool.get(data_index)
+        
+        assert isinstance(new_data, Data)
+        assert new_data._data == value
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_serialise_pool_pack(tmpdir, workers):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              workers=workers,
+                              pack_name="data.pack")
+    
+    assert os.listdir(str(tmpdir)) == ["data.pack"]
+    
+    for data_index in data_indexes:
+        
+        data_box = pool.get(data_index)
+        
+        assert isinstance(data_box, SerialBox)
+        assert data_box.load_dict["file_path"] == "data.pack"
+        assert "offset" in data_box.load_dict
+    
+    data_store.deserialise_pool(catalog,
+                                pool,
+                                root_dir=str(tmpdir),
+                                workers=workers)
+    
+    for data_index, value in zip(data_indexes, values):
+        
+        new_data = pool.get(data_index)
+        
+        assert isinstance(new_data, Data)
+        assert new_data._data == value
+
+
+def _make_pack_pool(data_store, catalog, values):
+    
+    pool = DataPool()
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    return pool, data_indexes
+
+
+@pytest.mark.parametrize("workers, use_processes", [(None, False),
+                                                    (2, False),
+                                                    (2, True)])
+def test_deserialise_pool_pack_opened_once(tmpdir,
+                                           monkeypatch,
+                                           workers,
+                                           use_processes):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    data_store.discover_structures(data)
+    
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    pool, data_indexes = _make_pack_pool(data_store, catalog, values)
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    opened = []
+    
+    class CountedReader(pack.PackReader):
+        
+        def __init__(self, file_path):
+            opened.append(file_path)
+            super(CountedReader, self).__init__(file_path)
+    
+    monkeypatch.setattr(pack, "PackReader", CountedReader)
+    
+    data_store.deserialise_pool(catalog,
+                                pool,
+                                root_dir=str(tmpdir),
+                                workers=workers,
+                                use_processes=use_processes)
+    
+    for data_index, value in zip(data_indexes, values):
+        assert pool.get(data_index)._data == value
+    
+    # Worker processes open their own readers
+    if not use_processes: assert len(opened) == 1
+
+
+def test_serialise_pool_pack_twice(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    data_store.discover_structures(data)
+    
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    pool, data_indexes = _make_pack_pool(data_store, catalog, values)
+    pack_path = str(tmpdir.join("data.pack"))
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    pack_size = os.path.getsize(pack_path)
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    assert os.path.getsize(pack_path) == pack_size
+    assert os.listdir(str(tmpdir)) == ["data.pack"]
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    for data_index, value in zip(data_indexes, values):
+        assert pool.get(data_index)._data == value
+
+
+def test_serialise_pool_pack_lazy(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    data_store.discover_structures(data)
+    
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    pool, data_indexes = _make_pack_pool(data_store, catalog, values)
+    pack_path = str(tmpdir.join("data.pack"))
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    data_store.deserialise_pool(catalog,
+                                pool,
+                                root_dir=str(tmpdir),
+                                lazy=True)
+    
+    reader = pack.PackReader(pack_path)
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    assert reader.closed
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    for data_index, value in zip(data_indexes, values):
+        assert pool.get(data_index)._data == value
+
+
+def test_serialise_data_pack_copies_unsaved(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    data_store.discover_structures(data)
+    
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    pool, data_indexes = _make_pack_pool(data_store, catalog, values)
+    pack_path = str(tmpdir.join("data.pack"))
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    pack_size = os.path.getsize(pack_path)
+    
+    # The first index is saved, the second is copied and the third was
+    # loaded from the old pack file, so must be saved again
+    data_store.deserialise_data(catalog,
+                                pool,
+                                [data_indexes[0], data_indexes[2]],
+                                root_dir=str(tmpdir))
+    data_store.serialise_data(pool,
+                              data_indexes[:1],
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    assert os.path.getsize(pack_path) < pack_size
+    assert isinstance(pool.get(data_indexes[1]), SerialBox)
+    assert isinstance(pool.get(data_indexes[2]), Data)
+    assert pool.get_dirty_indexes() == set([data_indexes[2]])
+    
+    data_store.serialise_data(pool,
+                              data_indexes[2:],
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack",
+                              incremental=True)
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    for data_index, value in zip(data_indexes, values):
+        assert pool.get(data_index)._data == value
+
+
+class LegacySimple(Simple):
+    
+    def load_data(self, file_path):
+        
+        value = super(LegacySimple, self).load_data(file_path)
+        
+        return "{} (legacy)".format(value)
+
+
+@pytest.mark.parametrize("queue_size", [None, 2])
+def test_serialise_pool_pack_load_data(tmpdir, queue_size):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    data_store.discover_structures(data)
+    data_store._structures["Simple"] = LegacySimple()
+    
+    pool, data_indexes = _make_pack_pool(data_store, catalog, ["Tidal"])
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack",
+                              queue_size=queue_size)
+    
+    data_box = pool.get(data_indexes[0])
+    
+    assert "offset" not in data_box.load_dict
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    assert pool.get(data_indexes[0])._data == "Tidal (legacy)"
+
+
+@pytest.mark.parametrize("queue_size", [None, 2])
+def test_serialise_pool_pack_memory_map(tmpdir, queue_size):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    data_store.get_structure("TableData").memory_map = True
+    
+    var_id = "demo:demo:table"
+    raw = {"a": [1., 2.], "b": [3., 4.]}
+    metadata = catalog.get_metadata(var_id)
+    data_store.create_new_data(pool, state, catalog, raw, metadata)
+    data_index = state.get_index(var_id)
+    expected = data_store.get_data_value(pool, state, var_id)
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack",
+                              queue_size=queue_size)
+    
+    data_box = pool.get(data_index)
+    
+    assert "offset" not in data_box.load_dict
+    assert data_box.load_dict["file_path"] == "{}.npyd".format(data_index)
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    value = data_store.get_data_value(pool, state, var_id)
+    
+    assert (np.asarray(value) == np.asarray(expected)).all()
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+@pytest.mark.parametrize("pack_name", [None, "data.pack"])
+def test_serialise_pool_pipeline(tmpdir, workers, pack_name):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    progress = []
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              workers=workers,
+                              pack_name=pack_name,
+                              progress_callback=progress.append,
+                              queue_size=1)
+    
+    assert [x.completed for x in progress] == [1, 2, 3]
+    assert set(x.total for x in progress) == set([3])
+    assert 0 < progress[0].nbytes < progress[-1].nbytes
+    assert progress[-1].throughput >= 0
+    
+    for data_index in data_indexes:
+        assert isinstance(pool.get(data_index), SerialBox)
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    for data_index, value in zip(data_indexes, values):
+        assert pool.get(data_index)._data == value
+
+
+class TrackedPayload(str):
+    
+    counts = {"live": 0, "peak": 0}
+    lock = threading.Lock()
+    
+    def __new__(cls, value):
+        
+        obj = str.__new__(cls, value)
+        
+        with cls.lock:
+            cls.counts["live"] += 1
+            cls.counts["peak"] = max(cls.counts["peak"], cls.counts["live"])
+        
+        return obj
+    
+    def __del__(self):
+        
+        with self.lock:
+            self.counts["live"] -= 1
+
+
+@pytest.mark.parametrize("workers", [None, 3])
+@pytest.mark.parametrize("queue_size", [1, 2])
+@pytest.mark.parametrize("pack_name", [None, "data.pack"])
+def test_serialise_data_pipeline_live_buffers(tmpdir,
+                                              monkeypatch,
+                                              workers,
+                                              queue_size,
+                                              pack_name):
+    
+    dump_value = aneris.control.data._dump_value
+    write = aneris.control.data._WriterThread._write
+    
+    def tracked_dump_value(save_task):
+        payload, checksum, error = dump_value(save_task)
+        return TrackedPayload(payload), checksum, error
+    
+    def slow_write(self, data_index, file_path, payload):
+        time.sleep(0.01)
+        return write(self, data_index, file_path, payload)
+    
+    monkeypatch.setattr(aneris.control.data,
+                        "_dump_value",
+                        tracked_dump_value)
+    monkeypatch.setattr(aneris.control.data._WriterThread,
+                        "_write",
+                        slow_write)
+    monkeypatch.setattr(TrackedPayload,
+                        "counts",
+                        {"live": 0, "peak": 0})
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    
+    for i in range(12):
+        state = DataState("test")
+        data_store.create_new_data(pool,
+                                   state,
+                                   catalog,
+                                   "Tidal {}".format(i),
+                                   metadata)
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              workers=workers,
+                              pack_name=pack_name,
+                              queue_size=queue_size)
+    
+    assert TrackedPayload.counts["live"] == 0
+    assert 0 < TrackedPayload.counts["peak"] <= queue_size
+
+
+@pytest.mark.parametrize("queue_size", [0, -1])
+def test_serialise_data_pipeline_bad_queue_size(tmpdir, queue_size):
+    
+    data_store = DataStorage(data)
+    pool = DataPool()
+    
+    with pytest.raises(ValueError):
+        data_store.serialise_pool(pool, str(tmpdir), queue_size=queue_size)
+
+
+def test_serialise_data_pipeline_codec(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    data_store.get_structure(metadata.structure).codec = "zlib"
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    data_store.serialise_data(pool,
+                              [data_index],
+                              str(tmpdir),
+                              queue_size=2)
+    
+    assert pool.get(data_index).load_dict["file_path"].endswith(".pkl.gz")
+    
+    data_store.deserialise_pool(catalog, pool)
+    
+    assert pool.get(data_index)._data == "Tidal"
+
+
+def test_serialise_data_pipeline_warns(tmpdir, monkeypatch):
+    
+    def mockerror(a, b):
+        raise Exception
+        
+    monkeypatch.setattr("aneris.boundary.data.Structure.dump_value",
+                        mockerror)
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+
+    data_store.serialise_data(pool,
+                              [data_index],
+                              str(tmpdir),
+                              queue_size=1)
+    
+    assert isinstance(pool.get(data_index), Data)
+    assert not os.listdir(str(tmpdir))
+    
+    with pytest.raises(Exception):
+        data_store.serialise_data(pool,
+                                  [data_index],
+                                  str(tmpdir),
+                                  warn_save=False,
+                                  queue_size=1)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+@pytest.mark.parametrize("queue_size", [None, 1])
+def test_verify_pool(tmpdir, workers, queue_size):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              queue_size=queue_size)
+    
+    for data_index in data_indexes:
+        assert "checksum" in pool.get(data_index).load_dict
+    
+    assert data_store.verify_pool(pool,
+                                  str(tmpdir),
+                                  workers=workers) == ([], [])
+    
+    missing_box = pool.get(data_indexes[0])
+    os.remove(os.path.join(str(tmpdir), missing_box.load_dict["file_path"]))
+    
+    corrupt_box = pool.get(data_indexes[2])
+    
+    with open(os.path.join(str(tmpdir), corrupt_box.load_dict["file_path"]),
+              "ab") as fstream:
+        fstream.write("corrupt")
+    
+    test = data_store.verify_pool(pool, str(tmpdir), workers=workers)
+    
+    assert test == ([data_indexes[0]], [data_indexes[2]])
+
+
+def test_verify_pool_pack(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              pack_name="data.pack")
+    
+    assert data_store.verify_pool(pool, str(tmpdir)) == ([], [])
+    
+    pack_path = str(tmpdir.join("data.pack"))
+    corrupt_box = pool.get(data_indexes[1])
+    
+    with open(pack_path, "r+b") as fstream:
+        fstream.seek(corrupt_box.load_dict["offset"])
+        fstream.write("X")
+    
+    assert data_store.verify_pool(pool, str(tmpdir)) == \
+                                                    ([], [data_indexes[1]])
+    
+    os.remove(pack_path)
+    
+    missing_indexes, corrupt_indexes = data_store.verify_pool(pool,
+                                                              str(tmpdir))
+    
+    assert set(missing_indexes) == set(data_indexes)
+    assert not corrupt_indexes
+
+
+def test_verify_pool_unchecked(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    data_store.serialise_pool(pool, str(tmpdir))
+    data_box = pool.get(data_index)
+    data_box.load_dict.pop("checksum")
+    
+    with open(data_box.load_dict["file_path"], "ab") as fstream:
+        fstream.write("corrupt")
+    
+    assert data_store.verify_pool(pool) == ([], [])
+    
+    os.remove(data_box.load_dict["file_path"])
+    
+    assert data_store.verify_pool(pool) == ([data_index], [])
+
+
+@pytest.mark.parametrize("codec, memory_map, value", [
+    (None, False, "Tidal"),
+    ("zlib", False, "Tidal"),
+    ("bz2", False, "Tidal"),
+    (None, True, np.arange(10.)),
+    (None, True, pd.DataFrame({"a": [1., 2.], "b": [3., 4.]})),
+    (None, True, "Tidal")])
+def test_save_value_checksum(tmpdir, mocker, codec, memory_map, value):
+    
+    data_store = DataStorage(data)
+    data_store.discover_structures(data)
+    
+    structure = data_store.get_structure("UnitData")
+    structure.codec = codec
+    structure.memory_map = memory_map
+    
+    root_path = os.path.join(str(tmpdir), "test")
+    spy = mocker.spy(aneris.control.data, "_get_path_checksum")
+    
+    (file_path,
+     nbytes,
+     checksum,
+     error) = aneris.control.data._save_value((structure, value, root_path))
+    
+    assert error is None
+    assert not spy.called
+    assert (nbytes, checksum) == \
+                        aneris.control.data._get_path_checksum(file_path)
+
+
+def test_get_path_checksum_dir(tmpdir):
+    
+    dir_path = tmpdir.mkdir("test.npyd")
+    dir_path.join("header.pkl").write("header")
+    dir_path.join("values.npy").write("values")
+    
+    nbytes, checksum = aneris.control.data._get_path_checksum(str(dir_path))
+    
+    assert nbytes == 12
+    
+    dir_path.join("values.npy").write("VALUES")
+    
+    assert aneris.control.data._get_path_checksum(str(dir_path)) != \
+                                                            (nbytes, checksum)
+
+
+def test_serialise_data_workers_warns(tmpdir, monkeypatch):
+    
+    def mockerror(a, b):
+        raise Exception
+        
+    monkeypatch.setattr("aneris.boundary.data.Structure.save_value", mockerror)
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+
+    data_store.serialise_data(pool,
+                              [data_index],
+                              str(tmpdir),
+                              workers=2)
+                                     
+    still_data = pool.get(data_index)
+
+    assert isinstance(still_data, Data)
+    
+    with pytest.raises(Exception):
+        data_store.serialise_data(pool,
+                                  [data_index],
+                                  str(tmpdir),
+                                  warn_save=False,
+                                  workers=2)
+
+
+def test_deserialise_pool_lazy(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir.mkdir("first")))
+    data_store.deserialise_pool(catalog, pool, lazy=True)
+    
+    assert data_store.is_lazy(pool)
+    assert isinstance(pool.get(data_index), SerialBox)
+    
+    value = data_store.get_data_value(pool,
+                                      state,
+                                      "Technology:Common:DeviceType")
+    
+    assert value == "Tidal"
+    assert isinstance(pool.get(data_index), Data)
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir.mkdir("second")))
+    
+    assert not data_store.is_lazy(pool)
+    assert "second" in pool.get(data_index).load_dict["file_path"]
+
+
+def test_prefetch_data(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    
+    assert data_store.prefetch_data(pool, [data_index]) is None
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir))
+    data_store.deserialise_pool(catalog, pool, lazy=True)
+    
+    thread = data_store.prefetch_data(pool, [data_index])
+    thread.join()
+    
+    new_data = pool.get(data_index)
+
+    assert isinstance(new_data, Data)
+    assert new_data._data == "Tidal"
+
+
+def _make_lazy_pool(tmpdir, n_values=10):
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal {}".format(i) for i in range(n_values)]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    data_store.serialise_pool(pool, str(tmpdir.mkdir("first")))
+    data_store.deserialise_pool(catalog, pool, lazy=True)
+    
+    return data_store, pool, data_indexes, values
+
+
+def test_prefetch_data_serialise(tmpdir, monkeypatch):
+    
+    load_value = aneris.control.data._load_value
+    
+    def slow_load_value(load_task):
+        time.sleep(0.01)
+        return load_value(load_task)
+    
+    monkeypatch.setattr(aneris.control.data, "_load_value", slow_load_value)
+    
+    data_store, pool, data_indexes, _ = _make_lazy_pool(tmpdir)
+    second_dir = str(tmpdir.mkdir("second"))
+    
+    thread = data_store.prefetch_data(pool, data_indexes)
+    data_store.serialise_pool(pool, second_dir)
+    
+    assert not thread.is_alive()
+    
+    for data_index in data_indexes:
+        data_box = pool.get(data_index)
+        assert isinstance(data_box, SerialBox)
+        assert "second" in data_box.load_dict["file_path"]
+
+
+def test_deepcopy_lazy_pool(tmpdir):
+    
+    data_store, pool, data_indexes, values = _make_lazy_pool(tmpdir, 3)
+    
+    pool_copy = deepcopy(pool)
+    
+    for data_index, value in zip(data_indexes, values):
+        assert isinstance(pool_copy.get(data_index), Data)
+        assert pool_copy.get(data_index)._data == value
+    
+    assert not data_store.is_lazy(pool_copy)
+    assert pickle.loads(pickle.dumps(pool)).count() == 3
+
+
+@pytest.mark.parametrize("copy_func", [
+    lambda x: pickle.loads(pickle.dumps(x, -1)),
+    deepcopy])
+def test_datastorage_copy_lazy(tmpdir, copy_func):
+    
+    data_store, pool, data_indexes, values = _make_lazy_pool(tmpdir, 3)
+    
+    assert data_store.is_lazy(pool)
+    
+    test = copy_func(data_store)
+    
+    assert not test.is_lazy(pool)
+    assert sorted(test._structures) == sorted(data_store._structures)
+    assert data_store.is_lazy(pool)
+    
+    data_store.hydrate_data(pool)
+    
+    for data_index, value in zip(data_indexes, values):
+        assert pool.get(data_index)._data == value
+
+
+def test_serialise_pool_incremental(tmpdir, mocker):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave", "Tidal Fixed"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    assert pool.get_dirty_indexes() == set(data_indexes)
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              incremental=True)
+    
+    assert not pool.get_dirty_indexes()
+    assert len(os.listdir(str(tmpdir))) == 3
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    assert not pool.get_dirty_indexes()
+    
+    new_data = Data("Technology:Common:DeviceType",
+                    pool.get(data_indexes[0]).get_structure_name(),
+                    "Wave Floating")
+    pool.replace(data_indexes[0], new_data)
+    pool.pop(data_indexes[2])
+    
+    assert pool.get_dirty_indexes() == set([data_indexes[0]])
+    
+    spy = mocker.spy(aneris.control.data, "_save_value")
+    
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              incremental=True)
+    
+    assert spy.call_count == 1
+    assert not pool.get_dirty_indexes()
+    assert len(os.listdir(str(tmpdir))) == 2
+    
+    for data_index in data_indexes[:2]:
+        assert isinstance(pool.get(data_index), SerialBox)
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    
+    assert pool.get(data_indexes[0])._data == "Wave Floating"
+    assert pool.get(data_indexes[1])._data == "Wave"
+
+
+def test_serialise_pool_full_clears_removed(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    values = ["Tidal", "Wave"]
+    data_indexes = []
+    
+    for value in values:
+        
+        state = DataState("test")
+        data_store.create_new_data(pool, state, catalog, value, metadata)
+        data_indexes.append(state.get_index("Technology:Common:DeviceType"))
+    
+    data_store.serialise_pool(pool, str(tmpdir), root_dir=str(tmpdir))
+    data_store.deserialise_pool(catalog, pool, root_dir=str(tmpdir))
+    pool.pop(data_indexes[1])
+    
+    data_store.serialise_pool(pool, str(tmpdir), root_dir=str(tmpdir))
+    
+    # Data popped before a full save is not removed by later incremental
+    # saves
+    data_store.serialise_pool(pool,
+                              str(tmpdir),
+                              root_dir=str(tmpdir),
+                              incremental=True)
+    
+    assert len(os.listdir(str(tmpdir))) == 2
+
+
+def test_serialise_pool_incremental_moved(tmpdir):
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog, data)
+    data_store = DataStorage(data)
+    pool = DataPool()
+    state = DataState("test")
+    data_store.discover_structures(data)
+    
+    metadata = catalog.get_metadata("Technology:Common:DeviceType")
+    data_store.create_new_data(pool, state, catalog, "Tidal", metadata)
+    
+    data_index = state.get_index("Technology:Common:DeviceType")
+    first_dir = str(tmpdir.mkdir("first"))
+    second_dir = str(tmpdir.mkdir("second"))
+    
+    data_store.serialise_pool(pool, first_dir)
+    data_store.deserialise_pool(catalog, pool, lazy=True)
+    data_store.serialise_pool(pool, first_dir, incremental=True)
+    
+    assert isinstance(pool.get(data_index), SerialBox)
+    assert len(os.listdir(first_dir)) == 1
+    
+    data_store.deserialise_pool(catalog, pool)
+    
+    assert not pool.get_dirty_indexes()
+    
+    data_store.serialise_pool(pool,
+                              second_dir,
+                              root_dir=second_dir,
+                              incremental=True)
+    
+    assert len(os.listdir(second_dir)) == 1
+    
+    data_store.deserialise_pool(catalog, pool, root_dir=second_dir)
+    
+    assert pool.get(data_index)._data == "Tidal"
+
+
 def test_serialise_pool_root(tmpdir):
 
     catalog = DataCatalog()
@@ -44,6 +44,30 @@ def test_get_providing_interfaces():
 
     assert 'SPTInterface' in providers
     
+def test_get_bulk_interfaces():
+    
+    test_vars = ['early:dummy:data', 'later:dummy:data', 'not:a:variable']
+    
+    interface = NamedSocket("DummyInterface")
+    interface.discover_interfaces(interface_plugins)
+    providers = interface.get_bulk_providing_interfaces(test_vars)
+    receivers = interface.get_bulk_receiving_interfaces(test_vars)
+    
+    assert providers == {'early:dummy:data': ['EarlyInterface'],
+                         'later:dummy:data': ['LaterInterface'],
+                         'not:a:variable': []}
+    assert receivers == {'early:dummy:data': ['LaterInterface'],
+                         'later:dummy:data': [],
+                         'not:a:variable': []}
+    
+def test_get_all_variables_all_interfaces():
+    
+    interface = NamedSocket("DummyInterface")
+    interface.discover_interfaces(interface_plugins)
+    all_vars = interface.get_all_variables()
+    
+    assert set(all_vars) == set(['early:dummy:data', 'later:dummy:data'])
+    
 def test_get_interface_object():
     
     '''Test whether an interface instance can be provided'''
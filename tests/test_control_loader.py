@@ -5,6 +5,9 @@ Created on Wed Jan 21 17:28:04 2015
 @author: Mathew Topper
 """
 
+import pickle
+from copy import deepcopy
+
 import pytest
 
 from aneris.entity import Simulation
@@ -39,6 +42,17 @@ def controller():
     return control
 
 
+@pytest.fixture(scope="module")
+def mask_controller():
+    
+    data_store = DataStorage(data_plugins)
+    sequencer = Sequencer(["MaskInterface"],
+                          interfaces)
+    control = Controller(data_store, sequencer)  
+    
+    return control
+
+
 @pytest.fixture(scope="module")
 def catalog():
 
@@ -187,3 +201,398 @@ def test_create_merged_state_not_existing(loader, controller, catalog):
     
     assert existing != result
 
+
+
+def test_prefetch_merged_state(tmpdir, controller, catalog):
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    test_inputs = {'demo:demo:high': 2,
+                   'demo:demo:rows': 5}
+                                               
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input1",
+                             catalog,
+                             test_inputs.keys(),
+                             test_inputs.values())
+    
+    assert controller.prefetch_merged_state(pool, new_sim) is None
+    
+    controller._store.serialise_pool(pool, str(tmpdir))
+    controller._store.deserialise_pool(catalog, pool, lazy=True)
+    
+    thread = controller.prefetch_merged_state(pool, new_sim)
+    thread.join()
+    
+    for data_index in pool:
+        assert pool.get(data_index).get_id() in test_inputs
+    
+    assert controller.get_data_value(pool, new_sim, 'demo:demo:rows') == 5
+
+
+def test_resolve_inputs(mocker, loader, mask_controller, catalog):
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    mask_controller.create_new_hub(new_sim, "MaskInterface", "mask_hub")
+    mask_controller.sequence_interface(new_sim,
+                                       "mask_hub",
+                                       "Masked Table Interface")
+    
+    interface = mask_controller.get_interface_obj(new_sim,
+                                                  "mask_hub",
+                                                  "Masked Table Interface")
+    
+    input_values = loader.resolve_inputs(pool, new_sim, interface)
+    
+    assert input_values == {'demo:demo:rows': None}
+    assert not loader.can_load(pool, new_sim, interface)
+    
+    mask_controller.add_datastate(pool,
+                                  new_sim,
+                                  "input",
+                                  catalog,
+                                  ['demo:demo:rows', 'demo:demo:low'],
+                                  [5, 1])
+    
+    spy = mocker.spy(loader, "create_merged_state")
+    input_values = loader.resolve_inputs(pool, new_sim, interface)
+    
+    assert spy.call_count == 1
+    assert input_values.keys() == ['demo:demo:rows']
+    assert input_values['demo:demo:rows'] == 5
+    assert loader.can_load(pool, new_sim, interface)
+    assert not loader.input_available(pool,
+                                      new_sim,
+                                      interface,
+                                      'demo:demo:low')
+    
+    mask_controller.add_datastate(pool,
+                                  new_sim,
+                                  "input",
+                                  catalog,
+                                  ['trigger.bool'],
+                                  [True])
+    
+    input_values = loader.resolve_inputs(pool, new_sim, interface)
+    
+    assert input_values == {'demo:demo:low': 1,
+                            'demo:demo:high': None,
+                            'demo:demo:rows': 5}
+    assert loader.can_load(pool, new_sim, interface)
+    assert loader.input_available(pool,
+                                  new_sim,
+                                  interface,
+                                  'demo:demo:high')
+    
+    input_values = loader.resolve_inputs(pool,
+                                         new_sim,
+                                         interface,
+                                         skip_vars=['demo:demo:rows'])
+    
+    assert 'demo:demo:rows' not in input_values
+
+
+def test_load_interface_resolved(loader, mask_controller, catalog):
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    mask_controller.create_new_hub(new_sim, "MaskInterface", "mask_hub")
+    mask_controller.sequence_interface(new_sim,
+                                       "mask_hub",
+                                       "Masked Table Interface")
+    
+    interface = mask_controller.get_interface_obj(new_sim,
+                                                  "mask_hub",
+                                                  "Masked Table Interface")
+    
+    with pytest.raises(ValueError):
+        loader.load_interface(pool, new_sim, interface)
+    
+    mask_controller.add_datastate(pool,
+                                  new_sim,
+                                  "input",
+                                  catalog,
+                                  ['demo:demo:rows',
+                                   'demo:demo:low',
+                                   'trigger.bool'],
+                                  [4, 2, True])
+    
+    interface = loader.load_interface(pool, new_sim, interface)
+    interface.connect()
+    
+    assert interface.data.low == 2
+    assert interface.data.high is None
+    assert interface.data.table == {"Random": [2., 1.75, 1.5, 1.25]}
+
+
+def test_active_inputs_cached(mocker, catalog):
+    
+    data_store = DataStorage(data_plugins)
+    sequencer = Sequencer(["MaskInterface"],
+                          interfaces)
+    controller = Controller(data_store, sequencer)
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    controller.create_new_hub(new_sim, "MaskInterface", "mask_hub")
+    controller.sequence_interface(new_sim,
+                                  "mask_hub",
+                                  "Masked Table Interface")
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['trigger.bool'],
+                             [False])
+    
+    spy = mocker.spy(controller, "_evaluate_active_inputs")
+    
+    input_status = controller.get_input_status(pool,
+                                               new_sim,
+                                               "mask_hub",
+                                               "Masked Table Interface")
+    
+    assert input_status.keys() == ['demo:demo:rows']
+    assert spy.call_count == 1
+    
+    # Changing data other than the trigger uses the cache
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['demo:demo:rows'],
+                             [5])
+    
+    input_status = controller.get_input_status(pool,
+                                               new_sim,
+                                               "mask_hub",
+                                               "Masked Table Interface")
+    
+    assert input_status.keys() == ['demo:demo:rows']
+    assert spy.call_count == 1
+    
+    # Changing the trigger invalidates the cache
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['trigger.bool'],
+                             [True])
+    
+    input_status = controller.get_input_status(pool,
+                                               new_sim,
+                                               "mask_hub",
+                                               "Masked Table Interface")
+    
+    assert set(input_status.keys()) == set(['demo:demo:low',
+                                            'demo:demo:high',
+                                            'demo:demo:rows'])
+    assert spy.call_count == 2
+
+
+def test_active_inputs_cached_per_pool(mocker, catalog):
+    
+    data_store = DataStorage(data_plugins)
+    sequencer = Sequencer(["MaskInterface"],
+                          interfaces)
+    controller = Controller(data_store, sequencer)
+    
+    new_sim = Simulation("Hello World!")
+    
+    controller.create_new_hub(new_sim, "MaskInterface", "mask_hub")
+    controller.sequence_interface(new_sim,
+                                  "mask_hub",
+                                  "Masked Table Interface")
+    
+    spy = mocker.spy(controller, "_evaluate_active_inputs")
+    
+    pool = DataPool()
+    other_pool = DataPool()
+    
+    for test_pool in [pool, other_pool, pool]:
+        controller.get_input_status(test_pool,
+                                    new_sim,
+                                    "mask_hub",
+                                    "Masked Table Interface")
+    
+    assert spy.call_count == 2
+    assert len(controller._active_inputs_cache) == 2
+    
+    # Entries are dropped with their pools
+    spy.reset_mock()
+    del other_pool
+    
+    assert len(controller._active_inputs_cache) == 1
+
+
+@pytest.mark.parametrize("copy_func", [
+    lambda x: pickle.loads(pickle.dumps(x, -1)),
+    deepcopy])
+def test_controller_copy(catalog, copy_func):
+    
+    data_store = DataStorage(data_plugins)
+    sequencer = Sequencer(["MaskInterface"],
+                          interfaces)
+    controller = Controller(data_store, sequencer)
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    controller.create_new_hub(new_sim, "MaskInterface", "mask_hub")
+    controller.sequence_interface(new_sim,
+                                  "mask_hub",
+                                  "Masked Table Interface")
+    controller.get_input_status(pool,
+                                new_sim,
+                                "mask_hub",
+                                "Masked Table Interface")
+    
+    assert len(controller._active_inputs_cache) == 1
+    
+    test = copy_func(controller)
+    
+    assert len(test._active_inputs_cache) == 0
+    
+    input_status = test.get_input_status(pool,
+                                         new_sim,
+                                         "mask_hub",
+                                         "Masked Table Interface")
+    
+    assert input_status.keys() == ['demo:demo:rows']
+    assert len(test._active_inputs_cache) == 1
+
+
+def _check_hub_status(controller, pool, simulation, hub_id):
+    
+    (hub_input_status,
+     hub_output_status) = controller.get_hub_status(pool, simulation, hub_id)
+    
+    assert set(hub_input_status.keys()) == set(["Masked Table Interface",
+                                                "Masked Later Interface"])
+    
+    for interface_name in hub_input_status:
+        
+        input_status = controller.get_input_status(pool,
+                                                   simulation,
+                                                   hub_id,
+                                                   interface_name)
+        output_status = controller.get_output_status(simulation,
+                                                     hub_id,
+                                                     interface_name)
+        
+        assert hub_input_status[interface_name] == input_status
+        assert hub_output_status[interface_name] == output_status
+    
+    return hub_input_status, hub_output_status
+
+
+def test_get_hub_status(mask_controller, catalog):
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    mask_controller.create_new_pipeline(new_sim,
+                                        "MaskInterface",
+                                        "mask_pipe")
+    mask_controller.sequence_interface(new_sim,
+                                       "mask_pipe",
+                                       "Masked Table Interface")
+    mask_controller.sequence_interface(new_sim,
+                                       "mask_pipe",
+                                       "Masked Later Interface")
+    
+    hub_input_status, hub_output_status = _check_hub_status(mask_controller,
+                                                            pool,
+                                                            new_sim,
+                                                            "mask_pipe")
+    
+    assert hub_input_status["Masked Table Interface"] == \
+                                            {'demo:demo:rows': "required"}
+    assert hub_input_status["Masked Later Interface"] == \
+                                            {'demo:demo:rows': "overwritten"}
+    assert hub_output_status["Masked Table Interface"] == \
+                                            {'demo:demo:table': "unavailable"}
+    
+    mask_controller.add_datastate(pool,
+                                  new_sim,
+                                  "input",
+                                  catalog,
+                                  ['trigger.bool', 'demo:demo:rows'],
+                                  [True, 5])
+    
+    hub_input_status, _ = _check_hub_status(mask_controller,
+                                            pool,
+                                            new_sim,
+                                            "mask_pipe")
+    
+    assert hub_input_status["Masked Table Interface"] == \
+                                        {'demo:demo:low': "optional",
+                                         'demo:demo:high': "optional",
+                                         'demo:demo:rows': "satisfied"}
+    
+    mask_controller.add_datastate(pool,
+                                  new_sim,
+                                  "executed",
+                                  catalog,
+                                  ['demo:demo:table'],
+                                  [{"Random": [0.5]}])
+    mask_controller.set_interface_completed(new_sim,
+                                            "mask_pipe",
+                                            "Masked Table Interface")
+    
+    hub_input_status, hub_output_status = _check_hub_status(mask_controller,
+                                                            pool,
+                                                            new_sim,
+                                                            "mask_pipe")
+    
+    assert set(hub_input_status["Masked Table Interface"].values()) == \
+                                                        set(["unavailable"])
+    assert hub_input_status["Masked Later Interface"] == \
+                                            {'demo:demo:rows': "satisfied"}
+    assert hub_output_status["Masked Table Interface"] == \
+                                            {'demo:demo:table': "satisfied"}
+    
+    mask_controller.set_interface_completed(new_sim,
+                                            "mask_pipe",
+                                            "Masked Later Interface")
+    
+    _, hub_output_status = _check_hub_status(mask_controller,
+                                             pool,
+                                             new_sim,
+                                             "mask_pipe")
+    
+    assert hub_output_status["Masked Table Interface"] == \
+                                            {'demo:demo:table': "overwritten"}
+
+
+def test_get_hub_status_force_completed(mask_controller, catalog):
+    
+    pool = DataPool()
+    new_sim = Simulation("Hello World!")
+    
+    mask_controller.create_new_pipeline(new_sim,
+                                        "MaskInterface",
+                                        "mask_pipe")
+    mask_controller.sequence_interface(new_sim,
+                                       "mask_pipe",
+                                       "Masked Table Interface")
+    mask_controller.sequence_interface(new_sim,
+                                       "mask_pipe",
+                                       "Masked Later Interface")
+    
+    new_sim.get_hub("mask_pipe").force_completed = True
+    
+    hub_input_status, _ = _check_hub_status(mask_controller,
+                                            pool,
+                                            new_sim,
+                                            "mask_pipe")
+    
+    for input_status in hub_input_status.values():
+        assert set(input_status.values()) == set(["unavailable"])
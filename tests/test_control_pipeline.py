@@ -46,3 +46,35 @@ def test_complete(sequencer):
     
     assert sequencer.get_next_name(pipeline) == 'Later Interface'
 
+    
+def test_get_interface_name(sequencer):
+    
+    pipeline = sequencer.create_new_pipeline("DummyInterface")
+    
+    assert sequencer.get_interface_name(pipeline, 'EarlyInterface') == \
+                                                            "Early Interface"
+    assert sequencer.get_interface_name(pipeline, 'NotAnInterface') is None
+    
+def test_add_interface_registry():
+    
+    from interface_plugins.dummy import EarlyInterface
+    
+    class NewInterface(EarlyInterface):
+        
+        @classmethod
+        def get_name(cls):
+            
+            return "New Interface"
+    
+    sequencer = Sequencer(["DummyInterface"],
+                          interfaces)
+    pipeline = sequencer.create_new_pipeline("DummyInterface")
+    
+    assert not sequencer.is_available(pipeline, "New Interface")
+    
+    socket = sequencer.get_socket("DummyInterface")
+    socket.add_interface(NewInterface)
+    
+    assert sequencer.is_available(pipeline, "New Interface")
+    assert sequencer.get_cls_name(pipeline, "New Interface") == \
+                                                            'NewInterface'
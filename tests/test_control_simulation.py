@@ -20,7 +20,11 @@ from aneris.control.pipeline import Sequencer
 from aneris.control.data import DataValidation, DataStorage
 from aneris.control.sockets import NamedSocket
 from aneris.entity import Simulation
-from aneris.entity.data import Data, DataCatalog, DataPool, DataState
+from aneris.entity.data import (Data,
+                                DataCatalog,
+                                DataPool,
+                                DataState,
+                                PseudoState)
 from aneris.utilities.data import check_integrity
 
 import aneris.test.interfaces as interfaces
@@ -95,6 +99,32 @@ def test_add_datastate(controller):
     assert len(series) == 64
     
     
+def test_add_datastate_invalid(controller):
+    
+    pool = DataPool()
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data_plugins.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data_plugins)
+    
+    new_sim = Simulation("Hello World!")
+    
+    with pytest.raises(ValueError) as excinfo:
+        controller.add_datastate(pool,
+                                 new_sim,
+                                 "executed",
+                                 catalog,
+                                 ['bad:variable:1',
+                                  'site:wave:dir',
+                                  'bad:variable:2'],
+                                 [None, None, None])
+    
+    assert 'bad:variable:1' in str(excinfo.value)
+    assert 'bad:variable:2' in str(excinfo.value)
+    assert len(pool) == 0
+    
+    
 def test_add_datastate_obj(controller):
     
     '''Test adding data to a data state using existing Data objects.'''
@@ -623,6 +653,121 @@ def test_deserialise_states(controller, tmpdir):
     
     assert isinstance(new_data, Data)
         
+def test_deserialise_states_pack(controller, tmpdir):
+    
+    pool = DataPool()
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data_plugins.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data_plugins)
+    
+    new_sim = Simulation("Hello World!")
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['site:wave:dir'],
+                             [[1]])
+    controller.add_datastate(pool,
+                             new_sim,
+                             "executed",
+                             catalog,
+                             ['site:wave:freqs'],
+                             [[2]])
+    
+    controller.serialise_states(new_sim,
+                                str(tmpdir),
+                                str(tmpdir),
+                                pack_name="states.pack")
+    
+    assert os.listdir(str(tmpdir)) == ["states.pack"]
+    
+    for state_box in new_sim._active_states:
+        
+        assert isinstance(state_box, SerialBox)
+        assert state_box.load_dict["file_path"] == "states.pack"
+    
+    controller.deserialise_states(new_sim, str(tmpdir))
+    
+    assert [state.get_level() for state in new_sim._active_states] == \
+                                                        ["input", "executed"]
+    test = controller.get_data_value(pool, new_sim, 'site:wave:dir')
+    
+    assert test.tolist() == [1]
+    
+    test = controller.get_data_value(pool, new_sim, 'site:wave:freqs')
+    
+    assert test.tolist() == [2]
+        
+def test_deserialise_states_journal(controller, tmpdir):
+    
+    pool = DataPool()
+
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data_plugins.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data_plugins)
+    
+    new_sim = Simulation("Hello World!")
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['site:wave:dir'],
+                             [[1]])
+    controller.add_datastate(pool,
+                             new_sim,
+                             "executed",
+                             catalog,
+                             ['site:wave:dir', 'site:wave:freqs'],
+                             [[3], [2]])
+    controller.add_datastate(pool,
+                             new_sim,
+                             "redo",
+                             catalog,
+                             ['site:wave:freqs'],
+                             [[4]])
+    
+    new_sim.undo_state()
+    new_sim.mask_states("input")
+    new_sim.set_merged_state(controller.create_merged_state(new_sim))
+    
+    all_states = new_sim._active_states + new_sim._redo_states
+    expected = [(type(state), state.dump()) for state in all_states]
+    expected_merged = new_sim._merged_state.dump()
+    
+    controller.serialise_states(new_sim,
+                                str(tmpdir),
+                                str(tmpdir),
+                                journal_name="states.json")
+    
+    assert os.listdir(str(tmpdir)) == ["states.json"]
+    
+    controller.deserialise_states(new_sim, str(tmpdir))
+    
+    all_states = new_sim._active_states + new_sim._redo_states
+    
+    assert [(type(state), state.dump()) for state in all_states] == expected
+    assert isinstance(new_sim._merged_state, PseudoState)
+    assert new_sim._merged_state.dump() == expected_merged
+    
+    test = controller.get_data_value(pool, new_sim, 'site:wave:dir')
+    
+    assert test.tolist() == [3]
+
+
+def test_serialise_states_pack_journal(controller, tmpdir):
+    
+    new_sim = Simulation("Hello World!")
+    
+    with pytest.raises(ValueError):
+        controller.serialise_states(new_sim,
+                                    str(tmpdir),
+                                    pack_name="states.pack",
+                                    journal_name="states.json")
+
+
 def test_save_simulation(controller, tmpdir):
     
     '''Test pickling a simulation.'''
@@ -1207,3 +1352,148 @@ def test_compact_none_states(controller):
     
     assert len(test) == 5
     assert all_levels == [None, "level1", None, "level2", None]
+
+
+
+def test_get_level_values(controller):
+    
+    pool = DataPool()
+    
+    var1 = 'site:wave:dir'
+    var2 = 'site:wave:freqs'
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data_plugins.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data_plugins)
+    
+    new_sim = Simulation("Hello World!")
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level1",
+                             catalog,
+                             [var1, var2],
+                             [[1], [1]])
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level2",
+                             catalog,
+                             [var1],
+                             [[2]])
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level3",
+                             catalog,
+                             [var2],
+                             [None])
+    
+    test = controller.get_level_values(pool, new_sim, var1)
+    
+    assert test.keys() == ["level1", "level2", "level3"]
+    assert [x.tolist() for x in test.values()] == [[1], [2], [2]]
+    
+    test = controller.get_level_values(pool, new_sim, var2)
+    
+    assert test.keys() == ["level1", "level2"]
+    
+    test = controller.get_level_values(pool,
+                                       new_sim,
+                                       var1,
+                                       force_masks=["level2"])
+    
+    assert [x.tolist() for x in test.values()] == [[1], [2], [1]]
+    
+    # The simulation is not modified
+    assert new_sim.get_merged_state().get_index(var1) == \
+                                new_sim._active_states[1].get_index(var1)
+    assert not any(state.ismasked() for state in new_sim._active_states)
+
+
+def test_get_bulk_level_values(controller):
+    
+    pool = DataPool()
+    
+    var1 = 'site:wave:dir'
+    var2 = 'site:wave:freqs'
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data_plugins.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data_plugins)
+    
+    new_sim = Simulation("Hello World!")
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level1",
+                             catalog,
+                             [var1],
+                             [[1]])
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level2",
+                             catalog,
+                             [var2],
+                             [[2]])
+    
+    test = controller.get_bulk_level_values(pool,
+                                            new_sim,
+                                            [var1, var2],
+                                            levels=["level2"])
+    
+    assert test.keys() == [var1, var2]
+    assert test[var1]["level2"].tolist() == [1]
+    assert test[var2]["level2"].tolist() == [2]
+
+
+
+def test_get_data_value_level(controller):
+    
+    pool = DataPool()
+    
+    var1 = 'site:wave:dir'
+    var2 = 'site:wave:freqs'
+    
+    catalog = DataCatalog()
+    validation = DataValidation(meta_cls=data_plugins.MyMetaData)
+    validation.update_data_catalog_from_definitions(catalog,
+                                                    data_plugins)
+    
+    new_sim = Simulation("Hello World!")
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level1",
+                             catalog,
+                             [var1],
+                             [[1]])
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "level2",
+                             catalog,
+                             [var1, var2],
+                             [[2], [2]])
+    
+    controller.mask_states(new_sim, "level2")
+    
+    test = controller.get_data_value(pool, new_sim, var1, level="level1")
+    
+    assert test.tolist() == [1]
+    
+    test = controller.get_data_value(pool, new_sim, var1, level="level2")
+    
+    assert test.tolist() == [2]
+    
+    test = controller.get_data_value(pool,
+                                     new_sim,
+                                     var2,
+                                     level="level1",
+                                     check_identity=True)
+    
+    assert test is None
+    assert new_sim._active_states[-1].ismasked()
@@ -8,6 +8,8 @@ Created on Wed Jan 21 17:28:04 2015
 import pytest
 pytest.importorskip("dtocean_dummy")
 
+import pandas as pd
+
 from aneris.control.simulation import Controller, Loader
 from aneris.control.sockets import NamedSocket
 from aneris.control.pipeline import Sequencer
@@ -122,6 +124,85 @@ def test_input_status_overwritten(controller):
     assert "overwritten" in input_status_values
     
 
+def test_get_hub_status(catalog, controller):
+    
+    def check_hub_status(simulation):
+        
+        (hub_input_status,
+         hub_output_status) = controller.get_hub_status(pool,
+                                                        simulation,
+                                                        "demo_pipe")
+        
+        assert set(hub_input_status.keys()) == set(["Spreadsheet Generator",
+                                                    "Later Interface"])
+        
+        for interface_name in hub_input_status:
+            
+            input_status = controller.get_input_status(pool,
+                                                       simulation,
+                                                       "demo_pipe",
+                                                       interface_name)
+            output_status = controller.get_output_status(simulation,
+                                                         "demo_pipe",
+                                                         interface_name)
+            
+            assert hub_input_status[interface_name] == input_status
+            assert hub_output_status[interface_name] == output_status
+        
+        return hub_input_status, hub_output_status
+    
+    pool = DataPool()
+
+    new_sim = Simulation("Hello World!")
+    controller.create_new_pipeline(new_sim, "DemoInterface", "demo_pipe")
+                                                  
+    controller.sequence_interface(new_sim,
+                                  "demo_pipe",
+                                  "Spreadsheet Generator")
+                                                
+    controller.sequence_interface(new_sim,
+                                  "demo_pipe",
+                                  "Later Interface")
+    
+    hub_input_status, _ = check_hub_status(new_sim)
+    
+    assert hub_input_status["Later Interface"]['demo:demo:rows'] == \
+                                                                "overwritten"
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['trigger.bool', 'demo:demo:rows'],
+                             [True, 5])
+    
+    hub_input_status, _ = check_hub_status(new_sim)
+    
+    assert hub_input_status["Spreadsheet Generator"]['demo:demo:rows'] == \
+                                                                "satisfied"
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "executed",
+                             catalog,
+                             ['demo:demo:table'],
+                             [pd.DataFrame({"Random": [0.5]})])
+    controller.set_interface_completed(new_sim,
+                                       "demo_pipe",
+                                       "Spreadsheet Generator")
+    
+    check_hub_status(new_sim)
+    
+    controller.set_interface_completed(new_sim,
+                                       "demo_pipe",
+                                       "Later Interface")
+    
+    _, hub_output_status = check_hub_status(new_sim)
+    
+    assert hub_output_status["Spreadsheet Generator"]['demo:demo:table'] == \
+                                                                "overwritten"
+    
+
 def test_input_status_trigger(catalog, controller):
     
     pool = DataPool()
@@ -149,6 +230,63 @@ def test_input_status_trigger(catalog, controller):
 
     assert set(['required', 'optional']) == status                 
 
+def test_resolve_inputs(catalog, loader, controller):
+    
+    pool = DataPool()
+
+    new_sim = Simulation("Hello World!")
+    controller.create_new_hub(new_sim, "DemoInterface", "demo_hub")
+                                                  
+    controller.sequence_interface(new_sim,
+                                  "demo_hub",
+                                  "Spreadsheet Generator")
+
+    f_interface = controller.get_interface_obj(new_sim,
+                                               "demo_hub",
+                                               "Spreadsheet Generator")
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['demo:demo:rows', 'demo:demo:low'],
+                             [5, 1])
+    
+    input_values = loader.resolve_inputs(pool, new_sim, f_interface)
+    
+    assert input_values.keys() == ['demo:demo:rows']
+    assert input_values['demo:demo:rows'] == 5
+    assert loader.can_load(pool, new_sim, f_interface)
+    assert not loader.input_available(pool,
+                                      new_sim,
+                                      f_interface,
+                                      'demo:demo:low')
+    
+    controller.add_datastate(pool,
+                             new_sim,
+                             "input",
+                             catalog,
+                             ['trigger.bool'],
+                             [True])
+    
+    input_values = loader.resolve_inputs(pool, new_sim, f_interface)
+    
+    assert input_values == {'demo:demo:low': 1,
+                            'demo:demo:high': None,
+                            'demo:demo:rows': 5}
+    assert loader.can_load(pool, new_sim, f_interface)
+    assert loader.input_available(pool,
+                                  new_sim,
+                                  f_interface,
+                                  'demo:demo:high')
+    
+    input_values = loader.resolve_inputs(pool,
+                                         new_sim,
+                                         f_interface,
+                                         skip_vars=['demo:demo:rows'])
+    
+    assert 'demo:demo:rows' not in input_values
+
 def test_demo_status(catalog, loader, controller):
     
     pool = DataPool()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""py.test tests on entity.data module
+"""
+
+# pylint: disable=protected-access
+
+import pickle
+from copy import deepcopy
+
+import pytest
+
+from aneris.entity.data import (DataCatalog,
+                                DataPool,
+                                MetaData,
+                                _remove_from_attr_index)
+
+from data_plugins import MyMetaData
+
+
+@pytest.fixture
+def metadata():
+    
+    props = {"identifier": "test:var",
+             "structure": "SimpleList",
+             "name": "Test",
+             "types": ["float", "int"]}
+    
+    return MyMetaData(props)
+
+
+def test_metadata_immutable(metadata):
+    
+    with pytest.raises(AttributeError):
+        metadata._name = "New"
+    
+    with pytest.raises(TypeError):
+        metadata.types.append("str")
+    
+    assert metadata.types == ["float", "int"]
+
+
+def test_metadata_copies(metadata):
+    
+    assert deepcopy(metadata) is metadata
+    
+    test = pickle.loads(pickle.dumps(metadata, -1))
+    
+    assert test.identifier == "test:var"
+    assert test.types == ["float", "int"]
+    
+    with pytest.raises(AttributeError):
+        test._name = "New"
+
+
+def test_get_metadata_shared(metadata):
+    
+    catalog = DataCatalog()
+    catalog.add_metadata(metadata)
+    
+    assert catalog.get_metadata("test:var") is metadata
+
+
+def test_get_metadata_not_metadata():
+    
+    class Mutable(object):
+        
+        identifier = "test:var"
+    
+    metadata = Mutable()
+    
+    catalog = DataCatalog()
+    catalog.add_metadata(metadata)
+    
+    test = catalog.get_metadata("test:var")
+    
+    assert test is not metadata
+    assert test.identifier == "test:var"
+
+
+def test_get_metadata_missing():
+    
+    catalog = DataCatalog()
+    
+    with pytest.raises(KeyError):
+        catalog.get_metadata("test:var")
+
+
+@pytest.fixture
+def catalog():
+    
+    props_list = [{"identifier": "a", "structure": "S1", "types": ["x"]},
+                  {"identifier": "b", "structure": "S2", "types": ["x", "y"]},
+                  {"identifier": "c", "structure": "S1", "types": None},
+                  {"identifier": "d", "structure": "S1", "units": "m"},
+                  {"identifier": "e",
+                   "structure": "S2",
+                   "types": [["x", "y"], "z"]}]
+    
+    catalog = DataCatalog()
+    
+    for props in props_list:
+        
+        props["name"] = props["identifier"]
+        catalog.add_metadata(MyMetaData(props))
+    
+    return catalog
+
+
+def _brute_filter(catalog, meta_attr, value):
+    
+    var_ids = []
+    
+    for var_id in catalog.get_variable_identifiers():
+        
+        meta_value = getattr(catalog.get_metadata(var_id), meta_attr, None)
+        if meta_value is None: continue
+        
+        if ((isinstance(meta_value, list) and value in meta_value) or
+            meta_value == value): var_ids.append(var_id)
+    
+    return var_ids
+
+
+@pytest.mark.parametrize("meta_attr, value", [
+    ("structure", "S1"),
+    ("structure", "S3"),
+    ("types", "x"),
+    ("types", "z"),
+    ("types", ["x", "y"]),
+    ("types", ["x"]),
+    ("units", "m"),
+    ("missing", "x")])
+def test_filter_by_meta(catalog, meta_attr, value):
+    
+    test = catalog.filter_by_meta(meta_attr, value)
+    
+    assert test.keys() == _brute_filter(catalog, meta_attr, value)
+
+
+def test_filter_by_meta_add_metadata(catalog):
+    
+    assert catalog.filter_by_meta("types", "y").keys() == ["b"]
+    
+    catalog.add_metadata(MyMetaData({"identifier": "b",
+                                     "structure": "S2",
+                                     "name": "b",
+                                     "types": ["x"]}))
+    catalog.add_metadata(MyMetaData({"identifier": "f",
+                                     "structure": "S2",
+                                     "name": "f",
+                                     "types": ["y"]}))
+    
+    assert catalog.filter_by_meta("types", "y").keys() == ["f"]
+    assert catalog.filter_by_meta("types", "x").keys() == ["a", "b"]
+
+
+@pytest.mark.parametrize("old_types, new_types", [
+    ([["x", "y"], "z"], ["x"]),
+    ([["x", "y"], "z"], [["x", "y"]]),
+    ({"x": "y"}, ["z"])])
+def test_filter_by_meta_replace_unhashable(catalog, old_types, new_types):
+    
+    catalog.add_metadata(MyMetaData({"identifier": "f",
+                                     "structure": "S2",
+                                     "name": "f",
+                                     "types": old_types}))
+    
+    for value in ("x", "z", ["x", "y"], {"x": "y"}):
+        assert (catalog.filter_by_meta("types", value).keys() ==
+                                    _brute_filter(catalog, "types", value))
+    
+    catalog.add_metadata(MyMetaData({"identifier": "f",
+                                     "structure": "S2",
+                                     "name": "f",
+                                     "types": new_types}))
+    
+    for value in ("x", "z", ["x", "y"], {"x": "y"}):
+        assert (catalog.filter_by_meta("types", value).keys() ==
+                                    _brute_filter(catalog, "types", value))
+
+
+def test_remove_from_attr_index_missing_key(metadata):
+    
+    attr_index = ({"float": set(["test:var"])}, set(), set())
+    
+    _remove_from_attr_index(attr_index, "types", "test:var", metadata)
+    
+    assert attr_index == ({}, set(), set())
+
+
+def test_filter_by_meta_set_metadata_maps(catalog):
+    
+    assert catalog.filter_by_meta("structure", "S1").keys() == ["a",
+                                                                "c",
+                                                                "d"]
+    
+    metadata = MyMetaData({"identifier": "g",
+                           "structure": "S1",
+                           "name": "g"})
+    catalog.set_metadata_maps({"g": metadata})
+    
+    assert catalog.filter_by_meta("structure", "S1").keys() == ["g"]
+
+
+def test_filter_by_meta_dict(catalog):
+    
+    test = catalog.filter_by_meta_dict({"structure": "S2", "types": "x"})
+    
+    assert test.keys() == ["b"]
+    
+    test = catalog.filter_by_meta_dict({"structure": "S1", "types": "y"})
+    
+    assert not test
+
+
+def test_has_variable(catalog):
+    
+    assert catalog.has_variable("a")
+    assert not catalog.has_variable("z")
+
+
+def test_get_missing_variables(catalog):
+    
+    missing = catalog.get_missing_variables(["y", "a", "z", "y", "c"])
+    
+    assert missing == ["y", "z"]
+
+
+def test_datapool_copy_callback():
+    
+    calls = []
+    
+    pool = DataPool()
+    pool.add("a")
+    pool.set_copy_callback(calls.append)
+    
+    pool_copy = deepcopy(pool)
+    
+    assert calls == [pool]
+    assert pool_copy.count() == 1
+    assert pool_copy._copy_callback is None
+    assert pickle.loads(pickle.dumps(pool))._copy_callback is None
@@ -53,3 +53,49 @@ def test_rollback(sequencer):
     
     assert not pipeline.is_completed('EarlyInterface')
 
+    
+def test_get_interface_cls(sequencer):
+    
+    pipeline = sequencer.create_new_pipeline("DummyInterface")
+    sequencer.sequence(pipeline, "Early Interface")
+    
+    interface_cls = pipeline.get_interface_cls('EarlyInterface')
+    interface_obj = pipeline.get_interface_obj('EarlyInterface')
+    
+    assert isinstance(interface_obj, interface_cls)
+    assert interface_cls.get_name() == "Early Interface"
+    
+def test_get_interface_cls_map(sequencer):
+    
+    pipeline = sequencer.create_new_pipeline("DummyInterface")
+    sequencer.sequence(pipeline, "Early Interface")
+    sequencer.sequence(pipeline, "Later Interface")
+    
+    pipeline.set_completed('EarlyInterface')
+    
+    interface_map = pipeline.get_interface_map()
+    interface_cls_map = pipeline.get_interface_cls_map()
+    
+    assert interface_cls_map.keys() == interface_map.keys()
+    assert pipeline.get_scheduled_cls_map().keys() == ['LaterInterface']
+    assert pipeline.get_completed_cls_map().keys() == ['EarlyInterface']
+    
+    for cls_name, interface_obj in interface_map.iteritems():
+        assert interface_cls_map[cls_name] is type(interface_obj)
+    
+def test_get_preceding_cls_map(sequencer):
+    
+    pipeline = sequencer.create_new_pipeline("DummyInterface")
+    sequencer.sequence(pipeline, "Early Interface")
+    sequencer.sequence(pipeline, "Later Interface")
+    
+    preceding_map = pipeline.get_preceding_cls_map('LaterInterface')
+    
+    assert preceding_map.keys() == ['EarlyInterface']
+    
+    pipeline.set_completed('EarlyInterface')
+    
+    preceding_map = pipeline.get_preceding_cls_map('LaterInterface',
+                                                   ignore_completed=True)
+    
+    assert not preceding_map
@@ -13,12 +13,30 @@ from aneris.control.simulation import Controller
 from aneris.control.pipeline import Sequencer
 from aneris.control.data import DataValidation, DataStorage
 from aneris.entity import Simulation
-from aneris.entity.data import DataCatalog, DataPool
+from aneris.entity.data import DataCatalog, DataPool, DataState
 
 import data_plugins
 import interface_plugins as interfaces
 
 
+def _merge_states(simulation):
+    
+    merged_map = {}
+    
+    for state in simulation._active_states:
+        
+        if state.ismasked(): continue
+        
+        for data_id, data_index in state.mirror_map().iteritems():
+            
+            if data_index is None:
+                merged_map.pop(data_id, None)
+            else:
+                merged_map[data_id] = data_index
+    
+    return merged_map
+
+
 @pytest.fixture(scope="module")
 def controller():
     
@@ -174,3 +192,134 @@ def test_clear_states(controller):
     new_sim.clear_states()
     
     assert new_sim.count_states() == 0
+
+
+
+def test_mirror_merged_map():
+    
+    new_sim = Simulation("Hello World!")
+    
+    assert new_sim.mirror_merged_map() == {}
+    
+    new_sim.add_state(DataState("input", {"a": "1", "b": "2"}))
+    new_sim.add_state(DataState("middle", {"a": "3", "c": "4"}))
+    new_sim.add_state(DataState("output", {"b": None, "c": "5"}))
+    
+    assert new_sim.mirror_merged_map() == {"a": "3", "c": "5"}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+    
+    new_sim.mask_states("middle")
+    
+    assert new_sim.mirror_merged_map() == {"a": "1", "c": "5"}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+    
+    new_sim.mask_states(mask_after="input")
+    
+    assert new_sim.mirror_merged_map() == {"a": "1", "b": "2"}
+    
+    new_sim.unmask_states("middle")
+    
+    assert new_sim.mirror_merged_map() == {"a": "3", "b": "2", "c": "4"}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+    
+    new_sim.unmask_states()
+    new_sim.undo_state()
+    
+    assert new_sim.mirror_merged_map() == {"a": "3", "b": "2", "c": "4"}
+    
+    new_sim.redo_state()
+    
+    assert new_sim.mirror_merged_map() == {"a": "3", "c": "5"}
+    
+    new_sim.add_state(DataState("final", {"b": "6"}), overwrite=True)
+    
+    assert new_sim.mirror_merged_map() == {"a": "3", "b": "6", "c": "4"}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+    
+    new_sim.mask_states("middle")
+    new_sim.pop_masked_states()
+    
+    assert new_sim.mirror_merged_map() == {"a": "1", "b": "6"}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+
+
+def test_mirror_merged_map_reset():
+    
+    new_sim = Simulation("Hello World!")
+    new_sim.add_state(DataState("input", {"a": "1", "b": "2"}))
+    new_sim.add_state(DataState("output", {"b": None}))
+    new_sim.reset_merged_index()
+    
+    assert new_sim.mirror_merged_map() == {"a": "1"}
+
+
+def test_mirror_merged_map_state_changed():
+    
+    new_sim = Simulation("Hello World!")
+    input_state = DataState("input", {"a": "1", "b": "2"})
+    output_state = DataState("output", {"c": "3"})
+    new_sim.add_state(input_state)
+    new_sim.add_state(output_state)
+    
+    assert new_sim.mirror_merged_map() == {"a": "1", "b": "2", "c": "3"}
+    
+    # States changed in place are detected
+    output_state.add_index("a", "4")
+    input_state.pop_index("b")
+    
+    assert new_sim.mirror_merged_map() == {"a": "4", "c": "3"}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+    
+    output_state.pop_index("c")
+    new_sim.undo_state()
+    
+    assert new_sim.mirror_merged_map() == {"a": "1"}
+    
+    input_state.mask()
+    
+    assert new_sim.mirror_merged_map() == {}
+    assert new_sim.mirror_merged_map() == _merge_states(new_sim)
+
+
+
+def test_level_history():
+    
+    new_sim = Simulation("Hello World!")
+    new_sim.add_state(DataState("input", {"a": "1", "b": "2"}))
+    new_sim.add_state(DataState("middle", {"a": "3", "c": "4"}))
+    new_sim.add_state(DataState("output", {"b": None, "c": "5"}))
+    new_sim.add_state(DataState("later", {"a": "6"}))
+    new_sim.undo_state()
+    
+    history = new_sim.get_level_history()
+    
+    assert list(history.get_levels()) == ["input", "middle", "output"]
+    assert history.get_index("a", "input") == "1"
+    assert history.get_index("b", "output") is None
+    assert history.get_index("a", "later") == "3"
+    assert history.get_level_indexes("c") == {"middle": "4", "output": "5"}
+    
+    history = new_sim.get_level_history(force_masks=["middle"])
+    bulk = history.get_bulk_indexes(["a", "c"])
+    
+    assert bulk["a"] == {"input": "1", "middle": "3", "output": "1"}
+    assert bulk["c"] == {"middle": "4", "output": "5"}
+
+
+
+def test_get_level_view():
+    
+    new_sim = Simulation("Hello World!")
+    new_sim.add_state(DataState("input", {"a": "1", "b": "2"}))
+    new_sim.add_state(DataState("output", {"b": None, "c": "3"}))
+    new_sim.mask_states("input")
+    
+    view = new_sim.get_level_view("input")
+    
+    assert view.get_level() == "input"
+    assert view.mirror_map() == {"a": "1", "b": "2"}
+    
+    view = new_sim.get_level_view("output")
+    
+    assert view.mirror_map() == {"a": "1", "c": "3"}
+    assert new_sim._active_states[0].ismasked()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""py.test tests on utilities.compression module
+"""
+
+import pickle
+
+import pytest
+
+import aneris.utilities.compression
+from aneris.utilities.compression import (get_codecs,
+                                          get_extension,
+                                          infer_codec,
+                                          open_compressed)
+
+
+@pytest.mark.parametrize("codec", get_codecs())
+def test_open_compressed(tmpdir, codec):
+    
+    value = range(1000) * 10
+    file_path = str(tmpdir.join("test.pkl" + get_extension(codec)))
+    
+    with open_compressed(file_path, "wb", codec) as fstream:
+        pickle.dump(value, fstream, -1)
+    
+    assert infer_codec(file_path) == codec
+    
+    with open_compressed(file_path) as fstream:
+        
+        assert pickle.load(fstream) == value
+    
+    with open(file_path, "rb") as fstream:
+        
+        assert len(fstream.read()) < len(pickle.dumps(value, -1))
+
+
+@pytest.mark.parametrize("codec", get_codecs())
+def test_open_compressed_fileobj(tmpdir, codec):
+    
+    value = range(1000) * 10
+    file_path = str(tmpdir.join("test.pkl" + get_extension(codec)))
+    
+    with open(file_path, "wb") as fileobj:
+        with open_compressed(file_path, "wb", fileobj=fileobj) as fstream:
+            pickle.dump(value, fstream, -1)
+    
+    with open_compressed(file_path) as fstream:
+        
+        assert pickle.load(fstream) == value
+
+
+def test_open_compressed_fileobj_read(tmpdir):
+    
+    file_path = str(tmpdir.join("test.pkl.gz"))
+    
+    with open(file_path, "wb") as fileobj:
+        with pytest.raises(ValueError):
+            open_compressed(file_path, "rb", fileobj=fileobj)
+
+
+def test_open_compressed_uncompressed(tmpdir):
+    
+    file_path = str(tmpdir.join("test.pkl"))
+    
+    with open_compressed(file_path, "wb") as fstream:
+        pickle.dump([1, 2], fstream, -1)
+    
+    assert infer_codec(file_path) is None
+    
+    with open(file_path, "rb") as fstream:
+        
+        assert pickle.load(fstream) == [1, 2]
+
+
+def test_get_extension_unknown():
+    
+    with pytest.raises(ValueError):
+        get_extension("zip")
+
+
+def test_get_codecs_no_lzma(monkeypatch):
+    
+    monkeypatch.setattr(aneris.utilities.compression, "lzma", None)
+    
+    assert get_codecs() == ["zlib", "bz2"]
+    
+    with pytest.raises(ValueError):
+        open_compressed("test.pkl.xz", "wb")
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+from aneris.utilities.journal import JournalWriter, read_journal
+
+
+def test_journal_roundtrip(tmpdir):
+    
+    journal_path = str(tmpdir.join("states.json"))
+    dump_dicts = [{"type": "DataState",
+                   "level": "first",
+                   "masked": False,
+                   "data": {"a": "1", "b": "2"}},
+                  {"type": "DataState",
+                   "level": None,
+                   "masked": True,
+                   "data": {"a": "3", "b": "2", "c": None}},
+                  {"type": "PseudoState",
+                   "level": "merged",
+                   "data": {"c": "4"}}]
+    
+    with JournalWriter(journal_path) as writer:
+        entries = [writer.append(dump_dict) for dump_dict in dump_dicts]
+    
+    assert entries == [0, 1, 2]
+    assert read_journal(journal_path) == dump_dicts
+
+
+def test_journal_deltas(tmpdir):
+    
+    journal_path = str(tmpdir.join("states.json"))
+    data = {str(x): str(x) for x in range(100)}
+    
+    with JournalWriter(journal_path) as writer:
+        
+        writer.append({"type": "BaseState", "level": None, "data": data})
+        
+        data = dict(data)
+        data["0"] = "new"
+        data.pop("1")
+        
+        writer.append({"type": "BaseState", "level": None, "data": data})
+    
+    with open(journal_path, "rb") as json_file:
+        entries = json.load(json_file)["entries"]
+    
+    assert len(entries[0]["data"]) == 100
+    assert entries[1]["set"] == {"0": "new"}
+    assert entries[1]["remove"] == ["1"]
+
+
+def test_read_journal_not_journal(tmpdir):
+    
+    journal_path = str(tmpdir.join("states.json"))
+    
+    with open(journal_path, "wb") as json_file:
+        json.dump({"type": "BaseState", "level": None, "data": {}},
+                  json_file)
+    
+    with pytest.raises(IOError):
+        read_journal(journal_path)
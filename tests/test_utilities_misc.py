@@ -5,7 +5,16 @@ Created on Wed Jan 21 17:28:04 2015
 @author: Mathew Topper
 """
 
-from aneris.utilities.misc import safe_update
+import pickle
+from copy import deepcopy
+
+import pytest
+
+from aneris.utilities.misc import (FrozenDict,
+                                   FrozenList,
+                                   freeze_value,
+                                   safe_update)
+
 
 def test_safe_update():
     
@@ -17,4 +26,38 @@ def test_safe_update():
     assert result.keys() == ['a', 'b', 'd']
     assert result['b'] == 3
     assert result['d'] == 1
-    
\ No newline at end of file
+    
+
+def test_freeze_value():
+    
+    value = {"a": [1, {"b": [2]}], "c": ([3],)}
+    
+    result = freeze_value(value)
+    
+    assert result == value
+    assert isinstance(result, FrozenDict)
+    assert isinstance(result["a"], FrozenList)
+    assert isinstance(result["a"][1], FrozenDict)
+    assert isinstance(result["c"][0], FrozenList)
+    
+    with pytest.raises(TypeError):
+        result["d"] = 1
+    
+    with pytest.raises(TypeError):
+        result["a"].append(1)
+    
+    with pytest.raises(TypeError):
+        result["a"][1]["b"][0] = 1
+
+
+def test_frozen_copies():
+    
+    result = freeze_value([1, {"a": [2]}])
+    
+    assert deepcopy(result) is result
+    
+    test = pickle.loads(pickle.dumps(result, -1))
+    
+    assert test == result
+    assert isinstance(test, FrozenList)
+    assert isinstance(test[1], FrozenDict)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+
+import pytest
+
+from aneris.utilities import pack
+from aneris.utilities.pack import (PackWriter,
+                                   PackReader,
+                                   PackReaderCache,
+                                   read_payload)
+
+
+def test_pack_read(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+        second_range = writer.append("second", "World!")
+    
+    assert first_range[1] == 5
+    assert second_range[1] == 6
+    
+    with PackReader(pack_path) as reader:
+        assert reader.read(*first_range) == "Hello"
+        assert reader.read(*second_range) == "World!"
+    
+    assert read_payload(pack_path, *second_range) == "World!"
+
+
+def test_pack_append(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+    
+    with PackWriter(pack_path) as writer:
+        second_range = writer.append("first", "World!")
+    
+    assert read_payload(pack_path, *first_range) == "Hello"
+    assert read_payload(pack_path, *second_range) == "World!"
+
+
+def test_pack_get_index(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+        second_range = writer.append("second", "World!")
+    
+    with PackReader(pack_path) as reader:
+        index = reader.get_index()
+    
+    assert index.keys() == ["first", "second"]
+    assert index["first"] == first_range
+    assert index["second"] == second_range
+
+
+def test_pack_get_index_empty(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    PackWriter(pack_path).close()
+    
+    with PackReader(pack_path) as reader:
+        index = reader.get_index()
+    
+    assert not index
+
+
+def test_pack_get_index_corrupt(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        writer.append("first", "Hello")
+    
+    with open(pack_path, "ab") as fstream:
+        fstream.write("garbage")
+    
+    with PackReader(pack_path) as reader:
+        with pytest.raises(IOError):
+            reader.get_index()
+
+
+def test_pack_read_outside(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        offset, _ = writer.append("first", "Hello")
+    
+    with pytest.raises(IOError):
+        read_payload(pack_path, offset, 100)
+
+
+def test_pack_truncate(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+    
+    with PackWriter(pack_path, truncate=True) as writer:
+        
+        # The old payloads are readable until the writer is closed
+        assert read_payload(pack_path, *first_range) == "Hello"
+        
+        second_range = writer.append("second", "World!")
+    
+    with PackReader(pack_path) as reader:
+        assert reader.get_index().keys() == ["second"]
+        assert reader.read(*second_range) == "World!"
+    
+    assert os.listdir(str(tmpdir)) == ["test.pack"]
+
+
+def test_pack_truncate_open_readers(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+    
+    reader = PackReader(pack_path)
+    readers = PackReaderCache()
+    
+    assert readers.read(pack_path, *first_range) == "Hello"
+    
+    with PackWriter(pack_path, truncate=True) as writer:
+        second_range = writer.append("second", "World!")
+    
+    assert reader.closed
+    
+    with pytest.raises(IOError):
+        reader.read(*first_range)
+    
+    assert readers.read(pack_path, *second_range) == "World!"
+    
+    readers.close()
+
+
+def test_pack_truncate_discard(tmpdir):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+    
+    writer = PackWriter(pack_path, truncate=True)
+    writer.append("second", "World!")
+    writer.discard()
+    writer.close()
+    
+    assert read_payload(pack_path, *first_range) == "Hello"
+    assert os.listdir(str(tmpdir)) == ["test.pack"]
+
+
+def test_pack_reader_cache(tmpdir, monkeypatch):
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+        second_range = writer.append("second", "World!")
+    
+    opened = []
+    
+    class CountedReader(PackReader):
+        
+        def __init__(self, file_path):
+            opened.append(file_path)
+            super(CountedReader, self).__init__(file_path)
+    
+    monkeypatch.setattr(pack, "PackReader", CountedReader)
+    
+    with PackReaderCache() as readers:
+        assert readers.read(pack_path, *first_range) == "Hello"
+        assert readers.read(pack_path, *second_range) == "World!"
+    
+    assert len(opened) == 1
+
+
+def test_pack_reader_cache_pickle(tmpdir, monkeypatch):
+    
+    monkeypatch.setattr(pack, "_process_caches", {})
+    
+    pack_path = str(tmpdir.join("test.pack"))
+    
+    with PackWriter(pack_path) as writer:
+        first_range = writer.append("first", "Hello")
+    
+    readers = PackReaderCache()
+    readers.read(pack_path, *first_range)
+    
+    copy_one = pickle.loads(pickle.dumps(readers))
+    copy_two = pickle.loads(pickle.dumps(readers))
+    
+    assert copy_one is copy_two
+    assert copy_one is not readers
+    assert copy_one.read(pack_path, *first_range) == "Hello"
+    
+    readers.close()
+    copy_one.close()